@@ -1,126 +1,388 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-import sqlite3, os
+from flask import (
+    Blueprint, Flask, render_template, stream_template, request, redirect, url_for,
+    session, flash, jsonify, get_flashed_messages
+)
+import os
+import sys
+from datetime import datetime
 
-app = Flask(__name__)
-app.secret_key = 'admin_secret'
+# common/ (shared SQLite access) lives next to the app directories
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import db, config, listing_query, metrics, periods, search
 
-STUDENT_DB = r'C:\Users\Admin\Desktop\chs\users.db'
-BUSINESS_DB = r'C:\Users\Admin\Desktop\chb\users.db'
-LISTINGS_DB = r'C:\Users\Admin\Desktop\chb\listings.db'
-REVIEWS_PATH = r'C:\Users\Admin\Desktop\chb\reviews.txt'
-CHATLOG_DIR = r'C:\Users\Admin\Desktop\chb'
+# Routes live on a blueprint so wsgi.py can mount admin next to chs and
+# chb in one process; create_app() at the bottom serves it on its own.
+bp = Blueprint('admin', __name__, template_folder='templates')
+
+# The other apps' databases, see common/config.py
+STUDENT_DB = config.CHS_USERS_DB
+BUSINESS_DB = config.CHB_USERS_DB
+LISTINGS_DB = config.LISTINGS_DB  # also holds reviews and chat_events
 
 def connect_db(path):
-    conn = sqlite3.connect(path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db.get_connection(path)
 
-@app.route('/')
+@bp.route('/')
 def home():
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/login', methods=['GET','POST'])
+@bp.route('/login', methods=['GET','POST'])
 def login():
     if request.method == 'POST':
         if request.form['username'] == 'admin' and request.form['password'] == 'admin123':
             session['admin'] = True
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('.dashboard'))
         flash("Invalid credentials.")
-    return render_template('login.html')
+    return render_template('admin/login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
-    if not session.get('admin'): return redirect(url_for('login'))
+    if not session.get('admin'): return redirect(url_for('.login'))
+    # Users and listings are paged in from the JSON API below
+    return render_template('admin/dashboard.html')
+
+# ——— JSON API (keyset pagination) ———
+
+USER_DBS = {'student': STUDENT_DB, 'business': BUSINESS_DB}
+USER_PAGE_SIZE = 50
+
+@bp.route('/api/users/<kind>')
+def api_users(kind):
+    if not session.get('admin'):
+        return jsonify({"error": "login required"}), 401
+    if kind not in USER_DBS:
+        return jsonify({"error": "kind must be student or business"}), 404
+    after = request.args.get('cursor', 0, type=int)
+    limit = min(request.args.get('limit', USER_PAGE_SIZE, type=int), listing_query.MAX_LIMIT)
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    conn = connect_db(USER_DBS[kind])
+    rows = conn.execute(
+        "SELECT id, username FROM users WHERE id > ? ORDER BY id LIMIT ?", (after, limit + 1)
+    ).fetchall()
+    conn.close()
+    users = [{"id": r['id'], "username": r['username']} for r in rows[:limit]]
+    next_cursor = users[-1]['id'] if len(rows) > limit else None
+    return jsonify({"users": users, "next_cursor": next_cursor})
+
+@bp.route('/api/listings')
+def api_listings():
+    if not session.get('admin'):
+        return jsonify({"error": "login required"}), 401
+    conn = connect_db(LISTINGS_DB)
+    try:
+        page = listing_query.query_listings(conn, request.args, listing_query.ADMIN_COLUMNS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        conn.close()
+    return jsonify(page)
+
+@bp.route('/api/search/reviews')
+def api_search_reviews():
+    if not session.get('admin'):
+        return jsonify({"error": "login required"}), 401
+    conn = connect_db(LISTINGS_DB)
+    page = search.search_reviews(
+        conn, request.args.get('q', ''),
+        limit=request.args.get('limit', search.DEFAULT_LIMIT, type=int),
+        listing=request.args.get('listing') or None
+    )
+    conn.close()
+    return jsonify(page)
 
-    student_users = connect_db(STUDENT_DB).execute("SELECT * FROM users").fetchall()
-    business_users = connect_db(BUSINESS_DB).execute("SELECT * FROM users").fetchall()
-    listings = connect_db(LISTINGS_DB).execute("SELECT * FROM listings").fetchall()
+# ——— Paginated viewers ———
+# Reviews and chat logs are shown newest first, VIEW_PAGE_SIZE rows at a
+# time, with keyset "older" links. Rows are streamed from the cursor
+# through the template to the client and never collected in a list, so a
+# page costs O(page) memory however long the history grows.
 
-    return render_template('dashboard.html', 
-        student_users=student_users,
-        business_users=business_users,
-        listings=listings
+VIEW_PAGE_SIZE = 100
+
+# Served by idx_reviews_time, or idx_reviews_listing_time per listing
+REVIEWS_SQL = """
+    SELECT id, listing, review, rating, created_at FROM reviews
+    {where}
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+"""
+
+# One row per listing, day (or compacted month) and intent. SQLite
+# flattens the UNION ALL into a merge of two index-ordered scans.
+CHATLOGS_SQL = """
+    SELECT id, listing, day, intent, n FROM (
+        SELECT rowid AS id, listing, day, intent, n FROM chat_daily
+        UNION ALL
+        SELECT rowid AS id, listing, month AS day, intent, n FROM chat_monthly
     )
+    {where}
+    ORDER BY day DESC, id DESC
+    LIMIT ?
+"""
+
+def reviews_where(filters):
+    where, params = [], []
+    if filters['listing']:
+        where.append("listing = ?")
+        params.append(filters['listing'])
+    if filters['from']:
+        where.append("created_at >= ?")
+        params.append(filters['from'])
+    if filters['to']:
+        where.append("created_at < date(?, '+1 day')")
+        params.append(filters['to'])
+    if filters['rating']:
+        where.append("rating = ?")
+        params.append(f"{filters['rating']} Stars")
+    return where, params
 
-@app.route('/reviews')
+def chatlogs_where(filters, horizon):
+    # Days before the horizon only exist as month totals keyed "YYYY-MM"
+    # (see common/periods.py), so dates are compared as the rollup key
+    # they fall under: a compacted month is shown whole or not at all.
+    where, params = [], []
+    if filters['listing']:
+        where.append("listing = ?")
+        params.append(filters['listing'])
+    if filters['from']:
+        where.append("day >= ?")
+        params.append(periods.bucket(filters['from'], horizon))
+    if filters['to']:
+        where.append("day <= ?")
+        params.append(periods.bucket(filters['to'], horizon))
+    if filters['intent']:
+        where.append("intent = ?")
+        params.append(filters['intent'])
+    return where, params
+
+def build_view_sql(sql, where, params, key, after=None):
+    """
+    (sql, params) for one page of a viewer: rows older than `after`, the
+    (key, id) of the last row shown, or the newest. Fetches one row past
+    the page to spot more.
+    """
+    where, params = list(where), list(params)
+    if after is not None:
+        where.append(f"{key} <= ? AND ({key} < ? OR id < ?)")
+        params += [after[0], after[0], after[1]]
+    sql = sql.format(where=f"WHERE {' AND '.join(where)}" if where else "")
+    return sql, params + [VIEW_PAGE_SIZE + 1]
+
+def _stream_rows(conn, sql, params):
+    try:
+        yield from conn.execute(sql, params)
+    finally:
+        conn.close()
+
+def _view_filters(extra):
+    """Validated listing / date-range filters plus the view's own ones."""
+    filters = {
+        'listing': request.args.get('listing', '').strip(),
+        'from': _day(request.args.get('from', '').strip(), "from") or '',
+        'to': _day(request.args.get('to', '').strip(), "to") or '',
+    }
+    for name in extra:
+        filters[name] = request.args.get(name, '').strip()
+    return filters
+
+def _stream_view(template, view, filters, sql, where, params, key, **context):
+    """Stream one page; rows are fetched one past the page to spot more."""
+    cursor = request.args.get('cursor', '')
+    after = None
+    if cursor:
+        try:
+            after = listing_query.decode_cursor(cursor, view, "desc")
+            if not isinstance(after[0], str):
+                raise ValueError("invalid cursor")
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for('.' + view, **filters))
+    sql, params = build_view_sql(sql, where, params, key, after)
+    conn = connect_db(LISTINGS_DB)
+    rows = _stream_rows(conn, sql, params)
+
+    def older_url(row):
+        token = listing_query.encode_cursor(view, "desc", row[key], row['id'])
+        return url_for('.' + view, cursor=token, **{k: v for k, v in filters.items() if v})
+
+    # Flashes are read now: once streaming starts the session is already sent
+    return stream_template(template, rows=rows, filters=filters, page_size=VIEW_PAGE_SIZE,
+                           older_url=older_url, messages=get_flashed_messages(),
+                           first_page=not cursor, **context)
+
+@bp.route('/reviews')
 def reviews():
-    if not session.get('admin'): return redirect(url_for('login'))
-    if os.path.exists(REVIEWS_PATH):
-        with open(REVIEWS_PATH, 'r', encoding='utf-8') as f:
-            data = f.read()
-    else:
-        data = "No reviews found."
-    return render_template('reviews.html', content=data)
-
-@app.route('/chatlogs')
+    if not session.get('admin'): return redirect(url_for('.login'))
+    try:
+        filters = _view_filters(['rating'])
+        if filters['rating'] not in ('', '1', '2', '3', '4', '5'):
+            raise ValueError("rating must be 1 to 5")
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('.reviews'))
+
+    where, params = reviews_where(filters)
+    return _stream_view('admin/reviews.html', 'reviews', filters, REVIEWS_SQL, where, params,
+                        'created_at')
+
+@bp.route('/chatlogs')
 def chatlogs():
-    if not session.get('admin'): return redirect(url_for('login'))
-    logs = []
-    for fname in os.listdir(CHATLOG_DIR):
-        if fname.endswith(".txt") and fname != "reviews.txt":
-            with open(os.path.join(CHATLOG_DIR, fname), 'r', encoding='utf-8') as f:
-                logs.append((fname, f.read()))
-    return render_template('chatlogs.html', logs=logs)
+    if not session.get('admin'): return redirect(url_for('.login'))
+    try:
+        filters = _view_filters(['intent'])
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('.chatlogs'))
+
+    conn = connect_db(LISTINGS_DB)
+    horizon = periods.horizon(conn)
+    conn.close()
+    where, params = chatlogs_where(filters, horizon)
+    return _stream_view('admin/chatlogs.html', 'chatlogs', filters, CHATLOGS_SQL, where, params,
+                        'day', horizon=horizon)
 
 
 # Delete a student user
-@app.route('/delete_student/<int:user_id>', methods=['POST'])
+@bp.route('/delete_student/<int:user_id>', methods=['POST'])
 def delete_student(user_id):
     if not session.get('admin'):
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     conn = connect_db(STUDENT_DB)
     conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
     conn.commit()
     conn.close()
     flash("Student user deleted.")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
 
 # Delete a business user
-@app.route('/delete_business/<int:user_id>', methods=['POST'])
+@bp.route('/delete_business/<int:user_id>', methods=['POST'])
 def delete_business(user_id):
     if not session.get('admin'):
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     conn = connect_db(BUSINESS_DB)
     conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
     conn.commit()
     conn.close()
     flash("Business user deleted.")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
+
+# ——— Review moderation ———
+# Reviews are addressed by their stable id, never by position. Each
+# moderation action is one DELETE in one write transaction: triggers take
+# the rows out of the search index, ratings and analytics rollups in the
+# same transaction, and chs inserting reviews meanwhile simply waits on
+# the busy timeout, so no concurrent review is lost.
+
+MAX_MODERATION_IDS = 1000
+
+def _day(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
 
-# Delete a review line by line
-@app.route('/delete_review', methods=['POST'])
+def _review_ids(values):
+    try:
+        return [int(v) for v in values]
+    except ValueError:
+        raise ValueError("review ids must be integers")
+
+def delete_reviews(conn, ids=(), listing=None, date_from=None, date_to=None):
+    """Delete reviews matching every given criterion; returns the count."""
+    where, params = [], []
+    if ids:
+        if len(ids) > MAX_MODERATION_IDS:
+            raise ValueError(f"at most {MAX_MODERATION_IDS} reviews at once")
+        where.append(f"id IN ({','.join('?' * len(ids))})")
+        params += ids
+    if listing:
+        where.append("listing = ?")
+        params.append(listing)
+    if date_from:
+        where.append("created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("created_at < date(?, '+1 day')")
+        params.append(date_to)
+    if not where:
+        raise ValueError("select reviews, a listing or a date range")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        cur = conn.execute(f"DELETE FROM reviews WHERE {' AND '.join(where)}", params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return cur.rowcount
+
+# Delete a single review by id
+@bp.route('/delete_review', methods=['POST'])
 def delete_review():
     if not session.get('admin'):
-        return redirect(url_for('login'))
-
-    line_no = int(request.form.get('line_number', -1))
-    if os.path.exists(REVIEWS_PATH):
-        with open(REVIEWS_PATH, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        if 0 <= line_no < len(lines):
-            del lines[line_no]
-            with open(REVIEWS_PATH, 'w', encoding='utf-8') as f:
-                f.writelines(lines)
-            flash("Review deleted.")
-    return redirect(url_for('reviews'))
-
-@app.route('/delete_listing/<int:listing_id>', methods=['POST'])
+        return redirect(url_for('.login'))
+
+    review_id = request.form.get('review_id', type=int)
+    if review_id is None:
+        flash("Enter a review ID.")
+        return redirect(url_for('.reviews'))
+    conn = connect_db(LISTINGS_DB)
+    deleted = delete_reviews(conn, ids=[review_id])
+    conn.close()
+    flash("Review deleted." if deleted else f"No review with ID {review_id}.")
+    return redirect(url_for('.reviews'))
+
+# Bulk delete: the selected ids, or everything for a listing and/or date range
+@bp.route('/moderate_reviews', methods=['POST'])
+def moderate_reviews():
+    if not session.get('admin'):
+        return redirect(url_for('.login'))
+
+    try:
+        ids = _review_ids(request.form.getlist('review_ids'))
+        listing = request.form.get('listing', '').strip() or None
+        date_from = _day(request.form.get('from', '').strip(), "from")
+        date_to = _day(request.form.get('to', '').strip(), "to")
+        conn = connect_db(LISTINGS_DB)
+        try:
+            deleted = delete_reviews(conn, ids, listing, date_from, date_to)
+        finally:
+            conn.close()
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('.reviews'))
+    flash(f"{deleted} review{'s' if deleted != 1 else ''} deleted.")
+    return redirect(url_for('.reviews'))
+
+@bp.route('/delete_listing/<int:listing_id>', methods=['POST'])
 def delete_listing(listing_id):
     if not session.get('admin'):
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     conn = connect_db(LISTINGS_DB)
     conn.execute("DELETE FROM listings WHERE id = ?", (listing_id,))
     conn.commit()
     conn.close()
     flash("Listing deleted.")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
+
 
+def create_app(settings=None):
+    """admin on its own (wsgi.py mounts bp together with chs and chb)."""
+    app = Flask(__name__, static_folder=None)
+    app.secret_key = 'admin_secret'
+    app.config.update(settings or {})
+    db.init_app(app)
+    metrics.init_app(app, 'admin')
+    app.register_blueprint(bp)
+    return app
 
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True)
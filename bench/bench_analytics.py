@@ -0,0 +1,274 @@
+"""
+Business analytics aggregation: row-at-a-time Python against chb/frames.py.
+
+    python bench/bench_analytics.py [EVENTS] [REVIEWS] [REPEAT]   # default 1000000 200000 5
+
+Builds a scratch listings.db for one owner with 50 listings over three
+years: EVENTS chat events rolled up into chat_daily, and REVIEWS
+reviews folded into review_daily / review_labels the way chb's review
+engine does. Then, for the whole history, the last year and the last
+30 days, times:
+
+  legacy  - fetch sqlite3.Row objects and fill Counters / nested dicts
+            per row, then unpack them into chart specs (what chb did before)
+  frames  - chb/frames.py: tuples, review totals summed in Python, chat
+            rows summed in dicts or, from COLUMNAR_MIN_ROWS up, as
+            bincounts over pandas categoricals; plus the rating
+            percentiles the legacy code never had
+
+Both must produce the same insights and chart data (checked before
+timing), and frames' two chat paths the same totals. The chat columns
+time those two paths alone on the window's rows, which is where
+COLUMNAR_MIN_ROWS comes from. Also times the category comparison: the
+category_ratings rollup against the full scan of every listing's
+reviews it replaces.
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'chb'))
+from common import db, listing_query, periods  # noqa: E402
+import frames  # noqa: E402
+
+LISTINGS = 50
+OTHER_LISTINGS = 2000
+DAYS = 3 * 365
+INTENTS = ["price", "wifi", "food", "cleanliness", "safety", "transport",
+           "laundry", "noise", "water", "staff", "rules", "other"]
+CATEGORIES = ["Accommodations", "Gyms", "Libraries", "Meal Services"]
+TYPES = ["Positive", "Negative", "Neutral", "Sarcastically Negative"]
+
+
+def build(path, n_events, n_reviews):
+    rng = np.random.default_rng(19)
+    conn = db.connect(path)
+    conn.executescript('''
+        CREATE TABLE listings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+            category TEXT NOT NULL, name TEXT NOT NULL, address TEXT,
+            facilities TEXT, cuisine TEXT, price REAL NOT NULL, image TEXT
+        );
+        CREATE INDEX idx_listings_name ON listings(name);
+        CREATE TABLE reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, listing TEXT NOT NULL,
+            review TEXT NOT NULL, rating TEXT NOT NULL, created_at TEXT NOT NULL
+        );
+        CREATE TABLE chat_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, listing TEXT NOT NULL,
+            created_at TEXT NOT NULL, intent TEXT NOT NULL
+        );
+        CREATE TABLE review_daily (
+            listing TEXT NOT NULL, day TEXT NOT NULL, sentiment TEXT NOT NULL,
+            n INTEGER NOT NULL, rating_sum INTEGER NOT NULL, sarcastic INTEGER NOT NULL,
+            first_id INTEGER NOT NULL, PRIMARY KEY (listing, day, sentiment)
+        );
+        CREATE TABLE review_monthly (
+            listing TEXT NOT NULL, month TEXT NOT NULL, sentiment TEXT NOT NULL,
+            n INTEGER NOT NULL, rating_sum INTEGER NOT NULL, sarcastic INTEGER NOT NULL,
+            first_id INTEGER NOT NULL, PRIMARY KEY (listing, month, sentiment)
+        );
+        CREATE TABLE review_labels (
+            review_id INTEGER PRIMARY KEY, pg TEXT NOT NULL, type TEXT NOT NULL,
+            day TEXT NOT NULL, sentiment TEXT NOT NULL, rating INTEGER NOT NULL,
+            sarcastic INTEGER NOT NULL
+        );
+        CREATE INDEX idx_review_labels_pg_day_rating ON review_labels(pg, day, rating);
+    ''')
+    first = date.today() - timedelta(days=DAYS - 1)
+    days = [(first + timedelta(days=i)).isoformat() for i in range(DAYS)]
+    mine = [f"Listing {i}" for i in range(LISTINGS)]
+    others = [f"Other {i}" for i in range(OTHER_LISTINGS)]
+    conn.executemany(
+        "INSERT INTO listings (user_id, category, name, price) VALUES (?, ?, ?, 1000)",
+        [(1, CATEGORIES[i % 4], name, ) for i, name in enumerate(mine)]
+        + [(2 + i % 500, CATEGORIES[i % 4], name) for i, name in enumerate(others)]
+    )
+
+    # Skewed like real traffic: some listings, days and intents are busier
+    pick = lambda k, size, a: np.minimum(rng.zipf(a, size) - 1, k - 1)  # noqa: E731
+    conn.executemany(
+        "INSERT INTO chat_events (listing, created_at, intent) VALUES (?, ?, ?)",
+        zip((mine[i] for i in pick(LISTINGS, n_events, 1.3)),
+            (days[i] for i in rng.integers(0, DAYS, n_events)),
+            (INTENTS[i] for i in pick(len(INTENTS), n_events, 1.5)))
+    )
+    periods.init_chat_rollup(conn)
+
+    names = [mine[i] for i in pick(LISTINGS, n_reviews, 1.3)] + \
+        [others[i] for i in rng.integers(0, OTHER_LISTINGS, n_reviews)]
+    ratings = rng.integers(1, 6, 2 * n_reviews)
+    review_days = [days[i] for i in rng.integers(0, DAYS, 2 * n_reviews)]
+    conn.executemany(
+        "INSERT INTO reviews (listing, review, rating, created_at) VALUES (?, 'text', ?, ?)",
+        zip(names, (f"{r} Stars" for r in ratings), (d + " 12:00:00" for d in review_days))
+    )
+    types = [TYPES[i] for i in rng.integers(0, 4, n_reviews)]
+    conn.executemany(
+        "INSERT INTO review_labels VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((i + 1, names[i], t, review_days[i], "Negative" if t == TYPES[3] else t,
+          int(ratings[i]), int(t == TYPES[3])) for i, t in enumerate(types))
+    )
+    conn.execute('''
+        INSERT INTO review_daily
+        SELECT pg, day, sentiment, COUNT(*), SUM(rating), SUM(sarcastic), MIN(review_id)
+        FROM review_labels GROUP BY pg, day, sentiment
+    ''')
+    listing_query.init_ratings(conn)
+    conn.commit()
+    return conn, mine
+
+
+# ——— The row-at-a-time implementation frames.py replaced ———
+
+def legacy(conn, pgs, window):
+    counts = Counter()
+    by_date = {}
+    by_type_date = defaultdict(lambda: defaultdict(int))
+    pg_issues = defaultdict(Counter)
+    marks = ",".join("?" * len(pgs))
+    days, day_params = periods.day_range("day", window)
+    months, month_params = periods.month_range("month", window)
+    rows = conn.execute(f'''
+        SELECT listing, day, intent, n FROM chat_daily WHERE listing IN ({marks}){days}
+        UNION ALL
+        SELECT listing, month, intent, n FROM chat_monthly WHERE listing IN ({marks}){months}
+    ''', pgs + day_params + pgs + month_params).fetchall()
+    for row in rows:
+        pg, date_str, category, n = row['listing'], row['day'], row['intent'], row['n']
+        counts[category] += n
+        by_date[date_str] = by_date.get(date_str, 0) + n
+        by_type_date[category][date_str] += n
+        pg_issues[pg][category] += n
+
+    stats = conn.execute(f'''
+        SELECT listing, sentiment, SUM(n) AS n, SUM(rating_sum) AS rating_sum,
+               SUM(sarcastic) AS sarcastic, MIN(first_id) AS first_id
+        FROM (
+            SELECT listing, sentiment, n, rating_sum, sarcastic, first_id
+            FROM review_daily WHERE listing IN ({marks}){days}
+            UNION ALL
+            SELECT listing, sentiment, n, rating_sum, sarcastic, first_id
+            FROM review_monthly WHERE listing IN ({marks}){months}
+        )
+        GROUP BY listing, sentiment
+        ORDER BY listing
+    ''', pgs + day_params + pgs + month_params).fetchall()
+    totals = {}
+    for row in stats:
+        t = totals.setdefault(row['listing'], {
+            "total": 0, "rating_sum": 0, "Positive": 0, "Negative": 0,
+            "Neutral": 0, "sarcastic": 0, "first_id": row['first_id']
+        })
+        t["total"] += row['n']
+        t["rating_sum"] += row['rating_sum']
+        t[row['sentiment']] += row['n']
+        t["sarcastic"] += row['sarcastic']
+        t["first_id"] = min(t["first_id"], row['first_id'])
+    insights, avg_ratings = {}, {}
+    for pg in sorted(totals, key=lambda pg: totals[pg]["first_id"]):
+        t = totals[pg]
+        avg = round(t["rating_sum"] / t["total"], 2) if t["total"] else 0
+        insights[pg] = {"avg": avg, "total": t["total"], "pos": t["Positive"],
+                        "neg": t["Negative"], "neu": t["Neutral"], "sarcastic": t["sarcastic"]}
+        avg_ratings[pg] = avg
+
+    dates = sorted(by_date.keys())
+    specs = {
+        "ratings": {"names": list(avg_ratings.keys()), "ratings": list(avg_ratings.values())},
+        "chat": {"labels": list(counts.keys()), "sizes": list(counts.values())},
+        "time": {"dates": dates, "counts": [by_date[d] for d in dates]},
+        "type_time": [[t, sorted(tl.items())] for t, tl in by_type_date.items()],
+        "pg_issues": [[pg, list(c.keys()), list(c.values())] for pg, c in pg_issues.items()],
+    }
+    return insights, specs
+
+
+def vectorized(conn, pgs, window):
+    chat = frames.load_chat(conn, pgs, window)
+    stats = frames.review_stats(frames.load_reviews(conn, pgs, window),
+                                frames.load_rating_counts(conn, pgs, window))
+    return frames.insights(stats), frames.chart_specs(stats, frames.chat_stats(chat))
+
+
+def same_chat(a, b):
+    return a[:3] == b[:3] and all((a[3][k] == b[3][k]).all() for k in a[3])
+
+
+def canonical(insights, specs):
+    """Order-insensitive form of the results, for comparing the two."""
+    core = {pg: {k: v for k, v in d.items() if not k.startswith("p")} for pg, d in insights.items()}
+    return (
+        list(core.items()),
+        specs["ratings"],
+        sorted(zip(specs["chat"]["labels"], specs["chat"]["sizes"])),
+        specs["time"],
+        sorted((t, [tuple(p) for p in points]) for t, points in specs["type_time"]),
+        sorted((pg, sorted(zip(labels, sizes))) for pg, labels, sizes in specs["pg_issues"]),
+    )
+
+
+def legacy_compare(conn, user_id):
+    # Without the rollup: every review of every listing in the owner's categories
+    return conn.execute('''
+        SELECT l.category, COUNT(*), AVG(CAST(r.rating AS INTEGER))
+        FROM listings l JOIN reviews r ON r.listing = l.name
+        WHERE l.category IN (SELECT category FROM listings WHERE user_id = ?)
+        GROUP BY l.category
+    ''', (user_id,)).fetchall()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return np.median(samples)
+
+
+if __name__ == '__main__':
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    n_reviews = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    random.seed(19)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        conn, pgs = build(os.path.join(tmp, 'listings.db'), n_events, n_reviews)
+        rollup = conn.execute("SELECT COUNT(*) FROM chat_daily").fetchone()[0]
+        print(f"{n_events} chat events ({rollup} chat_daily rows), {n_reviews} owner reviews: "
+              f"built in {time.perf_counter() - t0:.1f} s")
+
+        def last(days):
+            return (date.today() - timedelta(days=days - 1)).isoformat(), date.today().isoformat()
+
+        ok = True
+        print(f"{'window':<12}{'legacy ms':>11}{'frames ms':>11}{'speedup':>9}"
+              f"{'chat rows':>11}{'dicts ms':>10}{'pandas ms':>11}")
+        for label, window in (("all time", None), ("last 365 d", last(365)), ("last 30 d", last(30))):
+            same = canonical(*legacy(conn, pgs, window)) == canonical(*vectorized(conn, pgs, window))
+            rows = frames.load_chat(conn, pgs, window)
+            same &= same_chat(frames._chat_dicts(rows), frames._chat_frame(rows))
+            ok &= same
+            old = timed(lambda: legacy(conn, pgs, window), repeat)
+            new = timed(lambda: vectorized(conn, pgs, window), repeat)
+            dicts = timed(lambda: frames._chat_dicts(rows), repeat)
+            columnar = timed(lambda: frames._chat_frame(rows), repeat)
+            print(f"{label:<12}{old:>11.1f}{new:>11.1f}{old / new:>8.1f}x"
+                  f"{len(rows):>11}{dicts:>10.1f}{columnar:>11.1f}"
+                  f"{'' if same else '  results differ'}")
+
+        old = timed(lambda: legacy_compare(conn, 1), repeat)
+        new = timed(lambda: frames.compare(conn, 1), repeat)
+        print(f"{'compare':<12}{old:>11.1f}{new:>11.1f}{old / new:>8.1f}x")
+        conn.close()
+    sys.exit(0 if ok else 1)
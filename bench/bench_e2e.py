@@ -0,0 +1,394 @@
+"""
+End-to-end load test of chs, chb and admin through their real routes.
+
+    python bench/bench_e2e.py [--scale S] [--requests N] [--concurrency C] [--out FILE]
+                              [--combined]
+    python bench/bench_e2e.py --compare BASE.json NEW.json
+
+Generates a site with bench/loadgen.py and imports its flat-file logs
+with chb/migrate_logs.py. Then each app runs in its own process, as
+deployed, with common/config.py's environment variables pointing it at
+the site's databases. Flask's test client drives each endpoint from C
+threads: a short warm-up, then N timed requests. --combined then runs
+every endpoint once more through wsgi.py, all three apps in one process,
+reported as the app "site".
+
+For each endpoint the results give throughput, p50 / p95 / p99 latency,
+errors (unexpected status codes) and the app process's peak RSS while
+that endpoint ran. On Linux the peak is reset per endpoint. Elsewhere it
+is the process high-water mark so far. Results are written as JSON, to
+stdout or FILE, along with the commit they were measured on. --compare
+prints the change between two result files, e.g. from two commits.
+
+Chart and PDF jobs that chb enqueues run in its worker pool. Those
+processes are not counted in the RSS figures.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+import numpy as np
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH, '..')
+sys.path.insert(0, BENCH)
+import loadgen  # noqa: E402
+
+APPS = ["chs", "chb", "admin"]
+
+
+def site_env(site_dir):
+    """common/config.py settings that point every app at the site's files."""
+    return {
+        "LISTINGS_DB": os.path.join(site_dir, "chb", "listings.db"),
+        "CHB_USERS_DB": os.path.join(site_dir, "chb", "users.db"),
+        "CHS_USERS_DB": os.path.join(site_dir, "chs", "users.db"),
+        "JOBS_DB": os.path.join(site_dir, "chb", "jobs.db"),
+        "CHB_OUTPUT_DIR": os.path.join(site_dir, "chb", "static"),
+    }
+
+
+# ——— Requests per endpoint ———
+# Each returns (method, path, client.open() kwargs, session, expected statuses)
+
+def _student(site, rng):
+    i = rng.randrange(len(site["students"]))
+    return {"user_id": i + 1, "username": site["students"][i]}
+
+
+def _owner(site, rng):
+    i = rng.randrange(len(site["owners"]))
+    return {"user_id": i + 1, "username": site["owners"][i]}
+
+
+ADMIN = {"admin": True}
+
+ENDPOINTS = {
+    "chs": {
+        "GET /index": lambda site, rng: (
+            "GET", "/index", {}, _student(site, rng), {200}),
+        "GET /api/listings": lambda site, rng: (
+            "GET", "/api/listings", {"query_string": {"category": rng.choice(list(loadgen.CATEGORIES))}},
+            _student(site, rng), {200}),
+        "POST /chatbot_api": lambda site, rng: (
+            "POST", "/chatbot_api",
+            {"json": {"message": rng.choice(loadgen.CHAT_MESSAGES),
+                      "accommodation": rng.choice(site["listings"])["name"]}},
+            _student(site, rng), {200}),
+        "POST /review/<id>": lambda site, rng: (
+            "POST", f"/review/{rng.randrange(len(site['listings'])) + 1}",
+            {"data": {"review": rng.choice(loadgen.REVIEWS)[0], "rating": str(rng.randint(1, 5))}},
+            _student(site, rng), {302}),
+    },
+    "chb": {
+        "GET /analytics": lambda site, rng: (
+            "GET", "/analytics", {}, _owner(site, rng), {200}),
+        "GET /analytics/data": lambda site, rng: (
+            "GET", "/analytics/data", {"headers": {"Accept-Encoding": "gzip"}}, _owner(site, rng), {200}),
+        "GET /download_report": lambda site, rng: (
+            "GET", "/download_report", {}, _owner(site, rng), {200, 202}),
+    },
+    "admin": {
+        "GET /dashboard": lambda site, rng: ("GET", "/dashboard", {}, ADMIN, {200}),
+        "GET /api/listings": lambda site, rng: ("GET", "/api/listings", {}, ADMIN, {200}),
+        "GET /reviews": lambda site, rng: ("GET", "/reviews", {}, ADMIN, {200}),
+    },
+}
+
+
+# ——— Peak RSS ———
+
+def reset_peak_rss():
+    # Linux: writing 5 to clear_refs resets VmHWM to the current RSS
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+# ——— Worker (one process per app) ———
+
+def run_endpoint(app, site, make_request, requests, concurrency, warmup, seed, prefix=""):
+    def send(client, rng):
+        method, path, kwargs, session, ok = make_request(site, rng)
+        # Under wsgi.py each app has its own session cookie, chosen by path
+        with client.session_transaction(prefix + "/") as s:
+            s.clear()
+            s.update(session)
+        t0 = time.perf_counter()
+        resp = client.open(prefix + path, method=method, **kwargs)
+        resp.get_data()  # streamed pages are only rendered as they are read
+        elapsed = time.perf_counter() - t0
+        resp.close()
+        return elapsed, resp.status_code in ok, f"{method} {prefix}{path} -> {resp.status_code}"
+
+    client = app.test_client()
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        send(client, rng)
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    todo = iter(range(requests))
+
+    def worker(i):
+        client = app.test_client()
+        rng = random.Random(seed * 1000 + i)
+        while True:
+            with lock:
+                if next(todo, None) is None:
+                    return
+            elapsed, ok, what = send(client, rng)
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors.append(what)
+
+    reset_peak_rss()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "error_sample": errors[:3],
+        "throughput_rps": round(requests / wall, 1),
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 2),
+            **{f"p{p}": round(float(np.percentile(ms, p)), 2) for p in (50, 95, 99)},
+            "max": round(float(ms.max()), 2),
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _import_app(name, site_dir):
+    os.environ.update(site_env(site_dir))
+    if name == "site":
+        # All three apps mounted in one process
+        os.chdir(site_dir)
+        sys.path.insert(0, os.path.abspath(ROOT))
+        import wsgi as module
+        return module
+    app_dir = os.path.abspath(os.path.join(ROOT, name))
+    os.chdir(os.path.join(site_dir, name))
+    sys.path.insert(0, app_dir)
+    import app as module
+    return module
+
+
+def _endpoints(name, module):
+    """(label, make_request, URL prefix) of each endpoint an app serves."""
+    if name != "site":
+        return [(endpoint, make, "") for endpoint, make in ENDPOINTS[name].items()]
+    endpoints = []
+    for app_name in APPS:
+        prefix = module.MOUNTS[app_name]
+        for endpoint, make in ENDPOINTS[app_name].items():
+            method, path = endpoint.split(" ", 1)
+            endpoints.append((f"{method} {prefix}{path}", make, prefix))
+    return endpoints
+
+
+def setup_worker(name, site_dir):
+    module = _import_app(name, site_dir)
+    with open(os.path.join(site_dir, 'logs', 'site.json'), encoding='utf-8') as f:
+        site = json.load(f)
+    if name == "chs":
+        conn = module.get_user_db_connection()
+        with conn:
+            conn.executemany("INSERT INTO users (username, password) VALUES (?, 'password')",
+                             [(s,) for s in site["students"]])
+        conn.close()
+    elif name == "chb":
+        password = module.generate_password_hash('password')
+        conn = module.get_user_db_connection()
+        with conn:
+            conn.executemany("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+                             [(o, f"{o}@example.com", password) for o in site["owners"]])
+        conn.close()
+        conn = module.get_listings_db_connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO listings (user_id, category, name, price) VALUES (?, ?, ?, ?)",
+                [(l["owner"], l["category"], l["name"], l["price"]) for l in site["listings"]])
+        conn.close()
+        import migrate_logs
+        migrate_logs.migrate(os.path.join(site_dir, 'logs'))
+        # Classify the imported reviews now rather than on the first request
+        module.update_review_stats()
+    module.db.close_all()
+
+
+def load_worker(name, site_dir, requests, concurrency, warmup, out):
+    t0 = time.perf_counter()
+    module = _import_app(name, site_dir)
+    startup = time.perf_counter() - t0
+    with open(os.path.join(site_dir, 'logs', 'site.json'), encoding='utf-8') as f:
+        site = json.load(f)
+    results = {"startup_s": round(startup, 2), "endpoints": {}}
+    for i, (endpoint, make_request, prefix) in enumerate(_endpoints(name, module)):
+        print(f"  {name} {endpoint}", file=sys.stderr, flush=True)
+        results["endpoints"][endpoint] = run_endpoint(
+            module.app, site, make_request, requests, concurrency, warmup, seed=i + 1,
+            prefix=prefix)
+    module.db.close_all()
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+
+
+# ——— Driver ———
+
+def build_site(site_dir, scale):
+    site = loadgen.generate(os.path.join(site_dir, 'logs'), scale)
+    for name in APPS:
+        os.makedirs(os.path.join(site_dir, name), exist_ok=True)
+    # chb creates the listings schema, so it goes first
+    for name in ("chb", "chs"):
+        # migrate_logs reports progress on stdout, which may be the results
+        subprocess.run([sys.executable, __file__, "--setup", name, "--site", site_dir],
+                       stdout=sys.stderr, check=True)
+    return site
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    if args.site:
+        os.makedirs(args.site)
+        return run_in(args, os.path.abspath(args.site))
+    with tempfile.TemporaryDirectory(prefix='bench_e2e-') as site_dir:
+        return run_in(args, site_dir)
+
+
+def run_in(args, site_dir):
+    t0 = time.perf_counter()
+    site = build_site(site_dir, args.scale)
+    print(f"site {site['sizes']} built in {time.perf_counter() - t0:.1f} s at {site_dir}",
+          file=sys.stderr)
+
+    results = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"scale": args.scale, "sizes": site["sizes"], "requests": args.requests,
+                   "concurrency": args.concurrency, "warmup": args.warmup,
+                   "combined": args.combined},
+        "apps": {},
+    }
+    for name in APPS + (["site"] if args.combined else []):
+        out = os.path.join(site_dir, f"{name}.json")
+        subprocess.run([sys.executable, __file__, "--worker", name, "--site", site_dir,
+                        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                        "--warmup", str(args.warmup), "--out", out], check=True)
+        with open(out, encoding='utf-8') as f:
+            results["apps"][name] = json.load(f)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    summarize(results)
+    return all(e["errors"] == 0 for a in results["apps"].values() for e in a["endpoints"].values())
+
+
+def _rows(results):
+    for name, app in results["apps"].items():
+        for endpoint, r in app["endpoints"].items():
+            yield f"{name} {endpoint}", r
+
+
+def summarize(results):
+    print(f"{'endpoint':<36}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'RSS MB':>9}{'errors':>8}", file=sys.stderr)
+    for label, r in _rows(results):
+        lat = r["latency_ms"]
+        print(f"{label:<36}{r['throughput_rps']:>9.1f}{lat['p50']:>9.1f}{lat['p95']:>9.1f}"
+              f"{lat['p99']:>9.1f}{r['peak_rss_mb']:>9.1f}{r['errors']:>8}", file=sys.stderr)
+
+
+def compare(base_path, new_path):
+    with open(base_path, encoding='utf-8') as f:
+        base_results = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    base = dict(_rows(base_results))
+    print(f"{base_results['commit']} -> {new['commit']}")
+    if base_results["config"] != new["config"]:
+        print(f"note: run with different settings\n  {base_results['config']}\n  {new['config']}")
+    print(f"{'endpoint':<36}{'req/s':>16}{'p95 ms':>16}{'p99 ms':>16}{'RSS MB':>16}")
+
+    def change(old, now):
+        return f"{now:>9.1f}{(now - old) / old * 100 if old else 0:>+6.0f}%"
+
+    for label, r in _rows(new):
+        if label not in base:
+            print(f"{label:<36}  (new)")
+            continue
+        b = base[label]
+        print(f"{label:<36}{change(b['throughput_rps'], r['throughput_rps'])}"
+              f"{change(b['latency_ms']['p95'], r['latency_ms']['p95'])}"
+              f"{change(b['latency_ms']['p99'], r['latency_ms']['p99'])}"
+              f"{change(b['peak_rss_mb'], r['peak_rss_mb'])}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0, help="data size (see loadgen.py)")
+    parser.add_argument('--requests', type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=8, help="client threads")
+    parser.add_argument('--warmup', type=int, default=5, help="untimed requests per endpoint")
+    parser.add_argument('--out', help="write the JSON results here instead of stdout")
+    parser.add_argument('--site', help="new directory to build the site in and keep "
+                                       "(default: a temporary one)")
+    parser.add_argument('--combined', action='store_true',
+                        help="also run all endpoints in one process through wsgi.py")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'))
+    parser.add_argument('--setup', choices=APPS, help=argparse.SUPPRESS)
+    parser.add_argument('--worker', choices=APPS + ["site"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.setup:
+        setup_worker(args.setup, args.site)
+    elif args.worker:
+        load_worker(args.worker, args.site, args.requests, args.concurrency, args.warmup, args.out)
+    else:
+        sys.exit(0 if run(args) else 1)
@@ -0,0 +1,78 @@
+"""
+Per-message latency of the chatbot intent classifier (chs/intents.py).
+
+    python bench/bench_intent.py [N]      # default N = 20000
+
+Checks that classify_intent (the published chs/intent_model)
+agrees with the original CountVectorizer + cosine_similarity + phrase
+lookup implementation on every training phrase and a set of
+synthetic messages, then reports p50/p99 latency per message for both,
+plus the per-message cost of classify_intents on the whole batch.
+"""
+import os
+import sys
+import time
+import random
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chs'))
+import intents  # noqa: E402
+from intents import classify_intent, classify_intents, intent_dict, all_intents  # noqa: E402
+
+vectorizer = CountVectorizer().fit(all_intents)
+intent_vectors = vectorizer.transform(all_intents)
+
+
+def reference_classify(user_input):
+    user_vec = vectorizer.transform([user_input])
+    similarities = cosine_similarity(user_vec, intent_vectors).flatten()
+    if len(similarities) == 0 or max(similarities) < 0.3:
+        return "unknown"
+    best_match_idx = np.argmax(similarities)
+    matched_phrase = all_intents[best_match_idx]
+    for intent, phrases in intent_dict.items():
+        if matched_phrase in phrases:
+            return intent
+    return "unknown"
+
+
+def messages(n, seed=3):
+    rng = random.Random(seed)
+    words = " ".join(all_intents).split() + ["please", "help", "hostel", "today", "really"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(1, 12))) for _ in range(n)]
+
+
+def latencies(fn, msgs):
+    out = np.empty(len(msgs))
+    for i, m in enumerate(msgs):
+        start = time.perf_counter()
+        fn(m)
+        out[i] = time.perf_counter() - start
+    return out * 1e6
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    msgs = messages(n)
+
+    bad = [m for m in all_intents + msgs[:2000] if classify_intent(m) != reference_classify(m)]
+    print(f"agreement: {len(bad)} mismatches")
+    for m in bad[:5]:
+        print("  ", repr(m), classify_intent(m), reference_classify(m))
+
+    batch = classify_intents(msgs)
+    bad_batch = [m for m, b in zip(msgs, batch) if b != classify_intent(m)]
+    print(f"batch agreement: {len(bad_batch)} mismatches")
+
+    for name, fn in (("reference", reference_classify), ("intent index", classify_intent)):
+        lat = latencies(fn, msgs)
+        print(f"{name:>12}: p50 {np.percentile(lat, 50):7.1f} us   p99 {np.percentile(lat, 99):7.1f} us")
+
+    start = time.perf_counter()
+    classify_intents(msgs)
+    per_msg = (time.perf_counter() - start) / n * 1e6
+    print(f"{'batch':>12}: {per_msg:7.1f} us per message ({n} messages)")
+    sys.exit(1 if bad or bad_batch else 0)
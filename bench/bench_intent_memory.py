@@ -0,0 +1,144 @@
+"""
+Memory and latency of the memory-mapped intent model across worker processes.
+
+    python bench/bench_intent_memory.py [--phrases P] [--workers W]
+
+Publishes a synthetic model with P training phrases (default 20000, over
+40 intents and a 30,000-word vocabulary) to a scratch directory, the same
+way chs/intents.py publishes its own. Then it starts W worker processes
+(default 4) that each load it, classify messages until every page of the
+model has been read, and report, while all W are still alive:
+
+  mapped  - Rss / Pss of the model's .npy mappings (smaps, Linux only)
+  heap    - extra memory np.load without mmap would have used per worker
+
+Pss divides shared pages between the processes that map them, so a model
+shared through the page cache shows mapped Pss of about Rss / W.
+Also reports p50 / p99 classify_intent latency on the large model, and
+checks that a worker picks up a newly published version (hot reload)
+without restarting.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chs'))
+import intents  # noqa: E402
+
+
+def synthetic_phrases(n_phrases, n_intents=40, vocab=30000, seed=23):
+    rng = random.Random(seed)
+    words = [f"w{i}x" for i in range(vocab)]
+    per = n_phrases // n_intents
+    return {f"intent_{k}": [" ".join(rng.choices(words, k=rng.randint(3, 9))) for _ in range(per)]
+            for k in range(n_intents)}
+
+
+def mapped_kb(root):
+    """(Rss, Pss) in kB of this process's mappings of files under root."""
+    rss = pss = 0
+    inside = False
+    with open("/proc/self/smaps") as f:
+        for line in f:
+            head = line.split()
+            if "-" in head[0] and len(head) >= 5 and ":" in head[3]:  # mapping header
+                inside = len(head) >= 6 and head[5].startswith(root)
+            elif inside and head[0] == "Rss:":
+                rss += int(head[1])
+            elif inside and head[0] == "Pss:":
+                pss += int(head[1])
+    return rss, pss
+
+
+def worker(root, messages):
+    model = intents.IntentModel(os.path.join(root, intents.published_version(root)))
+    model.classify(messages)
+    for name in intents.ARRAYS:  # make sure every page is resident
+        np.asarray(getattr(model, name)).view(np.uint8).sum()
+    heap = sum(getattr(model, name).nbytes for name in intents.ARRAYS) // 1024
+    print("ready", flush=True)
+    sys.stdin.readline()
+    rss, pss = mapped_kb(root) if os.path.exists("/proc/self/smaps") else (None, None)
+    print(json.dumps({"rss_kb": rss, "pss_kb": pss, "heap_kb": heap}), flush=True)
+    sys.stdin.readline()
+
+
+def check_reload(root, phrases):
+    """Publish a second version and time how long a live process takes to switch."""
+    intents.MODEL_DIR, intents.RELOAD_INTERVAL = root, 0.5
+    first = intents.current_model()
+    changed = dict(phrases, extra=["a brand new intent phrase"])
+    meta, arrays = intents.build_model(changed)
+    intents.publish(meta, arrays, root=root)
+    start = time.perf_counter()
+    while intents.current_model().version == first.version:
+        if time.perf_counter() - start > 5:
+            return None
+        time.sleep(0.05)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--phrases", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    phrases = synthetic_phrases(args.phrases)
+    rng = random.Random(1)
+    flat = sum(phrases.values(), [])
+    messages = [" ".join(rng.choice(flat).split()[:4] + ["please", "help"]) for _ in range(2000)]
+    if args.worker:
+        worker(args.worker, messages)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as root:
+        meta, arrays = intents.build_model(phrases)
+        intents.publish(meta, arrays, root=root)
+        size = sum(a.nbytes for a in arrays.values()) / 2**20
+        print(f"model: {len(flat)} phrases, {len(arrays['vocab'])} terms, {size:.1f} MB of arrays")
+
+        procs = [subprocess.Popen([sys.executable, __file__, "--phrases", str(args.phrases),
+                                   "--worker", root],
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                 for _ in range(args.workers)]
+        for p in procs:
+            assert p.stdout.readline().strip() == "ready"
+        # Ask every worker to report before any of them exits
+        for p in procs:
+            p.stdin.write("\n")
+            p.stdin.flush()
+        reports = [json.loads(p.stdout.readline()) for p in procs]
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+        for i, r in enumerate(reports):
+            mapped = (f"mapped Rss {r['rss_kb'] / 1024:6.1f} MB  Pss {r['pss_kb'] / 1024:6.1f} MB"
+                      if r["rss_kb"] is not None else "mapped n/a (no /proc/self/smaps)")
+            print(f"worker {i}: {mapped}   in-heap copy would be {r['heap_kb'] / 1024:6.1f} MB")
+
+        model = intents.IntentModel(os.path.join(root, meta["version"]))
+        lat = []
+        for m in messages:
+            start = time.perf_counter()
+            model.classify([m])
+            lat.append(time.perf_counter() - start)
+        lat = np.array(lat) * 1e6
+        print(f"classify one message: p50 {np.percentile(lat, 50):7.1f} us   "
+              f"p99 {np.percentile(lat, 99):7.1f} us")
+        start = time.perf_counter()
+        model.classify(messages)
+        print(f"batch: {(time.perf_counter() - start) / len(messages) * 1e6:7.1f} us per message")
+
+        took = check_reload(root, phrases)
+        print("hot reload: " + (f"new version live after {took:.2f} s" if took is not None
+                                else "FAILED, still on the old version"))
+    sys.exit(0 if took is not None else 1)
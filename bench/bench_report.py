@@ -0,0 +1,53 @@
+"""
+Memory/time benchmark for the streaming PDF report (chb/reports.py).
+
+    python bench/bench_report.py [N ...]      # default: 1000 10000 100000 1000000
+
+Feeds N synthetic review rows through write_pdf_report from a generator
+and reports wall time, output size and peak traced Python memory. Peak
+memory does not grow with the rows held, only with the page count: the
+writer keeps each page's object offsets and id for the xref table and
+page tree (~190 bytes per 25-row page). Measured:
+
+         1000 rows      0.12 s        0.4 MB pdf  peak   0.05 MB
+       100000 rows      9.11 s       40.1 MB pdf  peak   0.73 MB
+      1000000 rows    117.64 s      400.8 MB pdf  peak   7.48 MB
+
+The synthetic rows are ASCII. Real reviews outside latin-1 are printed
+with "?" in place of those characters; see the limits in chb/reports.py.
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chb'))
+from reports import write_pdf_report  # noqa: E402
+
+
+def synthetic_rows(n):
+    for i in range(n):
+        yield (f"Listing {i % 50}",
+               f"Review number {i}: the rooms were clean but the wifi (sometimes) dropped",
+               f"{i % 5 + 1} Stars",
+               ("Positive", "Negative", "Neutral", "Sarcastically Negative")[i % 4])
+
+
+def run(n):
+    with tempfile.TemporaryFile() as f:
+        tracemalloc.start()
+        start = time.perf_counter()
+        write_pdf_report(synthetic_rows(n), f)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = f.tell()
+    print(f"{n:>9} rows  {elapsed:8.2f} s  {size / 1e6:9.1f} MB pdf  peak {peak / 1e6:6.2f} MB")
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000, 1000000]
+    for n in sizes:
+        run(n)
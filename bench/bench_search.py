@@ -0,0 +1,162 @@
+"""
+Latency of the full-text listing and review search (common/search.py).
+
+    python bench/bench_search.py [LISTINGS] [REVIEWS] [QUERIES]
+                                              # default 100000 1000000 300
+
+Builds a scratch listings.db with LISTINGS synthetic listings and REVIEWS
+synthetic reviews (Zipf-distributed vocabulary, so some words are in a
+large share of all reviews), indexes them with init_search and times
+search_listings / search_reviews for several query shapes: a rare word,
+a common word, two words, short prefixes as typed into a search box, and
+a word within one listing's reviews. Prints p50 / p95 / max per shape and the share of queries answered
+in BM25 order rather than newest first (see common/search.py), and exits
+non-zero if any p95 is above TARGET_MS.
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import db, search  # noqa: E402
+
+TARGET_MS = 10.0
+CATEGORIES = ["Accommodations", "Gyms", "Libraries", "Meal Services"]
+FACILITIES = ["WiFi", "AC", "Laundry", "Parking", "Gym", "Power backup", "CCTV",
+              "Hot water", "Housekeeping", "Study room", "Mess", "Lift"]
+CUISINES = ["North Indian", "South Indian", "Maharashtrian", "Chinese", "Jain", "Continental"]
+AREAS = ["College Road", "Gangapur Road", "Panchavati", "Nashik Road", "Satpur",
+         "Indira Nagar", "Cidco", "Pathardi Phata", "Dwarka", "Mumbai Naka"]
+
+
+def vocabulary(rng, size=20000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    words = sorted(words)
+    random.Random(size).shuffle(words)  # frequency rank unrelated to spelling
+    return words
+
+
+def build(path, n_listings, n_reviews):
+    rng = random.Random(14)
+    words = vocabulary(rng)
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE listings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+            category TEXT NOT NULL, name TEXT NOT NULL, address TEXT,
+            facilities TEXT, cuisine TEXT, price REAL NOT NULL, image TEXT
+        );
+        CREATE TABLE reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, listing TEXT NOT NULL,
+            review TEXT NOT NULL, rating TEXT NOT NULL, created_at TEXT NOT NULL
+        );
+        CREATE INDEX idx_reviews_listing_time ON reviews(listing, created_at);
+    ''')
+    names = [f"{rng.choice(words).title()} {rng.choice(['PG', 'Gym', 'Library', 'Meals', 'Hostel'])} {i}"
+             for i in range(n_listings)]
+    conn.executemany(
+        "INSERT INTO listings (user_id, category, name, address, facilities, cuisine, price) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(i % 5000, rng.choice(CATEGORIES), name,
+          f"{rng.randint(1, 300)}, {rng.choice(AREAS)}, Nashik",
+          ", ".join(rng.sample(FACILITIES, rng.randint(1, 5))),
+          rng.choice(CUISINES), rng.randint(10, 90) * 100)
+         for i, name in enumerate(names)]
+    )
+    # Zipf-ish word frequencies: the first few words appear in a large
+    # share of reviews, most words are rare.
+    np_rng = np.random.default_rng(14)
+    ranks = np.minimum(np_rng.zipf(1.2, size=n_reviews * 12), len(words)) - 1
+    pos = 0
+    batch = []
+    for i in range(n_reviews):
+        length = 6 + i % 13
+        text = " ".join(words[r] for r in ranks[pos:pos + length])
+        pos = (pos + length) % (len(ranks) - 20)
+        batch.append((names[i % n_listings], text, f"{1 + i % 5} Stars", "2025-01-01 10:00:00"))
+        if len(batch) == 50000:
+            conn.executemany("INSERT INTO reviews (listing, review, rating, created_at) VALUES (?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO reviews (listing, review, rating, created_at) VALUES (?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+    return words, names
+
+
+def timed(fn, queries):
+    samples, ranked = [], 0
+    for q in queries:
+        t0 = time.perf_counter()
+        page = fn(q)
+        samples.append((time.perf_counter() - t0) * 1000)
+        ranked += page["order"] == "relevance"
+    return (np.percentile(samples, 50), np.percentile(samples, 95), max(samples),
+            100 * ranked / len(queries))
+
+
+if __name__ == '__main__':
+    n_listings = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    n_reviews = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'listings.db')
+        t0 = time.perf_counter()
+        words, names = build(path, n_listings, n_reviews)
+        t1 = time.perf_counter()
+        conn = db.connect(path)
+        search.init_search(conn)
+        t2 = time.perf_counter()
+        print(f"{n_listings} listings, {n_reviews} reviews: "
+              f"load {t1 - t0:.1f} s, index {t2 - t1:.1f} s")
+
+        def word(pool):
+            return rng.choice(pool)
+
+        common, rare = words[:50], words[5000:]
+        shapes = {
+            "listings: name word": (
+                lambda q: search.search_listings(conn, q),
+                [n.split()[0] for n in rng.sample(names, n_queries)]),
+            "listings: facility + area": (
+                lambda q: search.search_listings(conn, q),
+                [f"{rng.choice(FACILITIES)} {rng.choice(AREAS).split()[0]}" for _ in range(n_queries)]),
+            "listings: 2-letter prefix": (
+                lambda q: search.search_listings(conn, q),
+                [word(words)[:2] for _ in range(n_queries)]),
+            "reviews: rare word": (
+                lambda q: search.search_reviews(conn, q),
+                [word(rare) for _ in range(n_queries)]),
+            "reviews: common word": (
+                lambda q: search.search_reviews(conn, q),
+                [word(common) for _ in range(n_queries)]),
+            "reviews: two words": (
+                lambda q: search.search_reviews(conn, q),
+                [f"{word(common)} {word(words[:2000])}" for _ in range(n_queries)]),
+            "reviews: 3-letter prefix": (
+                lambda q: search.search_reviews(conn, q),
+                [word(words)[:3] for _ in range(n_queries)]),
+            "reviews: one listing": (
+                lambda q: search.search_reviews(conn, q[0], listing=q[1]),
+                [(word(common), rng.choice(names)) for _ in range(n_queries)]),
+        }
+        ok = True
+        print(f"{'query':<28}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'ranked':>9}")
+        for label, (fn, queries) in shapes.items():
+            fn(queries[0])  # warm the page cache
+            p50, p95, worst, ranked = timed(fn, queries)
+            flag = "" if p95 <= TARGET_MS else "  > target"
+            ok &= p95 <= TARGET_MS
+            print(f"{label:<28}{p50:>9.2f}{p95:>9.2f}{worst:>9.2f}{ranked:>8.0f}%{flag}")
+        conn.close()
+    sys.exit(0 if ok else 1)
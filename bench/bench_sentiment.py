@@ -0,0 +1,154 @@
+"""
+Regression check and throughput benchmark for chb/sentiment.py.
+
+    python bench/bench_sentiment.py [N]      # default N = 200000
+
+First verifies that score_reviews gives exactly the labels of the original
+per-review loop (kept below as reference_classify) for every review in
+chb/reviews.txt plus a synthetic corpus built from the lexicons, and exits
+non-zero on any mismatch. The reference only parses "<n>/5" ratings, so
+this check runs score_reviews with that same pattern; how many ratings
+and labels the current "<n> Stars" parse changes is reported separately.
+Then times both implementations on N reviews.
+"""
+import os
+import re
+import sys
+import time
+import random
+
+CHB = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chb')
+sys.path.insert(0, CHB)
+import sentiment  # noqa: E402
+from sentiment import score_reviews  # noqa: E402
+
+
+# ——— Reference: the pre-batch implementation, verbatim ———
+
+def reference_detect_sarcasm(review):
+    sarcasm_indicators = set(sentiment.sarcasm_indicators)
+    negative_words = set(sentiment.sarcasm_negative_words)
+    sarcastic_phrases = list(sentiment.sarcastic_phrases)
+    additional_sarcasm = set(sentiment.additional_sarcasm)
+
+    review_lower = review.lower()
+    words = set(review_lower.split())
+
+    indicator_negative_overlap = bool(words & sarcasm_indicators and words & negative_words)
+    phrase_detected = any(phrase in review_lower for phrase in sarcastic_phrases)
+    additional_detected = any(phrase in review_lower for phrase in additional_sarcasm)
+
+    return indicator_negative_overlap or phrase_detected or additional_detected
+
+
+def reference_classify(txt, r):
+    m = re.search(r"(\d)/5", r)
+    val = int(m.group(1)) if m else 0
+
+    txt_lower = txt.lower()
+    pos_count = sum(1 for word in sentiment.positive_words if word in txt_lower)
+    neg_count = sum(1 for word in sentiment.negative_words if word in txt_lower)
+
+    if pos_count > neg_count:
+        bucket = "Positive"
+    elif neg_count > pos_count:
+        bucket = "Negative"
+    else:
+        bucket = "Neutral"
+
+    label = bucket
+    if reference_detect_sarcasm(txt) and val <= 2:
+        label = "Sarcastically Negative"
+    return pos_count, neg_count, bucket, label
+
+
+# ——— Corpora ———
+
+def reviews_txt():
+    texts, ratings = [], []
+    with open(os.path.join(CHB, 'reviews.txt'), encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split("|")
+            if len(parts) >= 3:
+                texts.append(parts[1].strip())
+                ratings.append(parts[2].strip())
+    return texts, ratings
+
+
+FILLER = ("the room food staff wifi was is and but very really our my a to of "
+          "warden mess bathroom water hostel bed fan we it not goodness Great! BAD ...").split()
+
+
+def synthetic(n, seed=7):
+    """Review-like texts: mostly filler with a few lexicon words and phrases."""
+    rng = random.Random(seed)
+    lexicon = (sorted(sentiment.positive_words) + sorted(sentiment.negative_words)
+               + sorted(sentiment.sarcasm_indicators) + sorted(sentiment.sarcasm_negative_words)
+               + sentiment.sarcastic_phrases + sentiment.additional_sarcasm)
+    texts = []
+    for _ in range(n):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(3, 25))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(lexicon))
+        texts.append(" ".join(words))
+    ratings = [rng.choice([f"{k} Stars" for k in range(1, 6)] + [f"{k}/5" for k in range(1, 6)])
+               for _ in range(n)]
+    return texts, ratings
+
+
+ORIGINAL_RATING_RE = re.compile(r"(\d)/5")
+
+
+def check(texts, ratings):
+    current, sentiment._RATING_RE = sentiment._RATING_RE, ORIGINAL_RATING_RE
+    try:
+        scores = score_reviews(texts, ratings)
+    finally:
+        sentiment._RATING_RE = current
+    bad = 0
+    for i, (t, r) in enumerate(zip(texts, ratings)):
+        pos, neg, bucket, label = reference_classify(t, r)
+        got = (int(scores['pos'][i]), int(scores['neg'][i]), scores['bucket'][i], scores['type'][i])
+        if got != (pos, neg, bucket, label):
+            bad += 1
+            if bad <= 5:
+                print("MISMATCH", repr(t), r, got, (pos, neg, bucket, label))
+    return bad
+
+
+def parse_changes(texts, ratings):
+    """(ratings, labels) that differ between the original and current parse."""
+    current = score_reviews(texts, ratings)
+    original = [reference_classify(t, r)[3] for t, r in zip(texts, ratings)]
+    changed_ratings = sum(
+        sentiment.parse_rating(r) != (int(m.group(1)) if m else 0)
+        for r, m in zip(ratings, map(ORIGINAL_RATING_RE.search, ratings))
+    )
+    changed_labels = sum(a != b for a, b in zip(original, current['type']))
+    return changed_ratings, changed_labels
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    bad = check(*reviews_txt()) + check(*synthetic(20000))
+    print(f"regression: {bad} mismatches")
+    if bad:
+        sys.exit(1)
+    for name, corpus in (("reviews.txt", reviews_txt()), ("synthetic", synthetic(20000))):
+        n_ratings, n_labels = parse_changes(*corpus)
+        print(f"current parse  : {name}: {n_ratings} of {len(corpus[0])} ratings, "
+              f"{n_labels} labels differ from the reference")
+
+    texts, ratings = synthetic(n, seed=11)
+    start = time.perf_counter()
+    for t, r in zip(texts, ratings):
+        reference_classify(t, r)
+    ref = time.perf_counter() - start
+
+    start = time.perf_counter()
+    score_reviews(texts, ratings)
+    new = time.perf_counter() - start
+
+    print(f"reference loop : {n / ref:10.0f} reviews/s")
+    print(f"score_reviews  : {n / new:10.0f} reviews/s  ({ref / new:.1f}x)")
@@ -0,0 +1,140 @@
+"""
+Mixed read/write load on listings.db: student reads against business writes.
+
+    python bench/bench_sqlite.py [SECONDS] [READERS] [WRITERS]   # default 5 8 2
+
+Runs the same workload twice on a scratch copy of the schema:
+
+  legacy  - a fresh sqlite3.connect() per operation, rollback journal,
+            default 5 s lock timeout (what the apps did before)
+  pooled  - common.db: per-thread pooled connections, WAL, busy_timeout
+
+Readers run the student index queries (listings by category, review counts);
+writers add reviews and edit listings like the business app does. Reports
+operations per second and how many operations failed with "database is
+locked".
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import db  # noqa: E402
+
+CATEGORIES = ["Accommodations", "Food Services", "Library"]
+
+
+def build(path, listings=500, reviews=50000):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE listings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+            category TEXT NOT NULL, name TEXT NOT NULL, address TEXT,
+            facilities TEXT, cuisine TEXT, price REAL NOT NULL, image TEXT
+        );
+        CREATE TABLE reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, listing TEXT NOT NULL,
+            review TEXT NOT NULL, rating TEXT NOT NULL, created_at TEXT NOT NULL
+        );
+        CREATE INDEX idx_reviews_listing ON reviews(listing, created_at);
+    ''')
+    rng = random.Random(1)
+    conn.executemany(
+        "INSERT INTO listings (user_id, category, name, price) VALUES (?, ?, ?, ?)",
+        [(i % 50, rng.choice(CATEGORIES), f"Listing {i}", rng.randint(1000, 9000))
+         for i in range(listings)]
+    )
+    conn.executemany(
+        "INSERT INTO reviews (listing, review, rating, created_at) VALUES (?, ?, ?, ?)",
+        [(f"Listing {rng.randrange(listings)}", "clean and friendly", "4 Stars",
+          "2025-01-01 10:00:00") for _ in range(reviews)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_connection(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def read_op(get, path, rng):
+    conn = get(path)
+    conn.execute("SELECT * FROM listings WHERE category = ?", (rng.choice(CATEGORIES),)).fetchall()
+    conn.execute(
+        "SELECT COUNT(*) FROM reviews WHERE listing = ?", (f"Listing {rng.randrange(500)}",)
+    ).fetchone()
+    conn.close()
+
+
+def write_op(get, path, rng):
+    conn = get(path)
+    conn.execute(
+        "INSERT INTO reviews (listing, review, rating, created_at) VALUES (?, ?, ?, ?)",
+        (f"Listing {rng.randrange(500)}", "noisy at night", "2 Stars", "2025-01-02 10:00:00")
+    )
+    conn.execute("UPDATE listings SET price = price + 1 WHERE id = ?", (rng.randrange(1, 501),))
+    conn.commit()
+    conn.close()
+
+
+def worker(op, get, release, path, stop, stats, seed):
+    rng = random.Random(seed)
+    lat, locked = [], 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            op(get, path, rng)
+            lat.append(time.perf_counter() - start)
+        except sqlite3.OperationalError:
+            locked += 1
+        release()  # end of "request"
+    stats.append((op.__name__, lat, locked))
+
+
+def run(name, get, release, path, seconds, readers, writers):
+    stop = threading.Event()
+    stats = []
+    threads = [threading.Thread(target=worker, args=(read_op, get, release, path, stop, stats, i))
+               for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=(write_op, get, release, path, stop, stats, 100 + i))
+                for i in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    for kind in ("read_op", "write_op"):
+        lat = np.concatenate([np.array(s[1]) for s in stats if s[0] == kind] or [np.zeros(0)])
+        locked = sum(s[2] for s in stats if s[0] == kind)
+        if len(lat):
+            print(f"{name:>7} {kind[:-3]:>5}: {len(lat) / seconds:8.0f} ops/s   "
+                  f"p50 {np.percentile(lat, 50) * 1e3:6.2f} ms   "
+                  f"p99 {np.percentile(lat, 99) * 1e3:7.2f} ms   locked {locked}")
+        else:
+            print(f"{name:>7} {kind[:-3]:>5}: no successful operations, locked {locked}")
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        pooled_path = os.path.join(tmp, "pooled.db")
+        build(legacy_path)
+        build(pooled_path)
+        run("legacy", legacy_connection, lambda: None, legacy_path, seconds, readers, writers)
+        run("pooled", db.get_connection, db.release_connections, pooled_path,
+            seconds, readers, writers)
+        db.close_all()
@@ -0,0 +1,136 @@
+"""
+Cold-start cost of chs, chb and admin: how long `import app` takes.
+
+    python bench/bench_startup.py [--runs N] [--apps APP ...] [--out FILE] [--check]
+
+Each app is imported in a fresh interpreter under `python -X importtime`,
+with common/config.py's paths pointing into an empty scratch directory
+(so the databases it creates on import are scratch files), N times after
+one untimed run that compiles the .pyc files. "site" is all three
+mounted in one process by wsgi.py (`import wsgi`). For each app the results give the median import time,
+the interpreter's wall-clock time from start to exit, the heaviest direct
+imports of app.py, and any of the HEAVY packages that got imported.
+Results are written as JSON (stdout or FILE) with the commit they were
+measured on, like bench_e2e.py.
+
+--check exits non-zero if an app imports one of its HEAVY packages at
+startup. Those belong on the analytics, report and chatbot paths only.
+
+bench/results/startup-before.json and startup-after.json are runs from
+just before and just after the heavy imports were made lazy and the
+intent model prebuilt (this script copied into each checkout, --apps chs
+chb admin, 5 runs).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+APPS = ["chs", "chb", "admin", "site"]
+# Directory put on sys.path and module imported, per app
+MODULES = {"chs": ("chs", "app"), "chb": ("chb", "app"), "admin": ("admin", "app"),
+           "site": ("", "wsgi")}
+# Packages an app must not import just to start
+HEAVY = {
+    "chs": ("sklearn", "scipy", "numpy"),
+    "chb": ("matplotlib", "seaborn", "pandas", "scipy", "numpy", "fpdf"),
+    "admin": ("sklearn", "matplotlib", "pandas", "numpy"),
+}
+HEAVY["site"] = tuple(sorted(set(sum(HEAVY.values(), ()))))
+TOP = 8
+
+
+def scratch_env(cwd):
+    env = dict(os.environ)
+    for name in ("LISTINGS_DB", "CHS_USERS_DB", "CHB_USERS_DB", "JOBS_DB"):
+        env[name] = os.path.join(cwd, name.lower() + ".db")
+    env["CHB_OUTPUT_DIR"] = cwd
+    return env
+
+
+def import_once(app, cwd):
+    """(import-time log lines, wall seconds) of one `import app`."""
+    directory, module = MODULES[app]
+    code = f"import sys; sys.path.insert(0, {os.path.join(ROOT, directory)!r}); import {module}"
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd,
+                          env=scratch_env(cwd), capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        raise RuntimeError(f"{app}: import failed\n{proc.stderr[-2000:]}")
+    return [l for l in proc.stderr.splitlines() if l.startswith("import time:")], wall
+
+
+def parse(lines):
+    """[(depth, module, cumulative us)] from -X importtime output."""
+    out = []
+    for line in lines[1:]:  # first line is the header
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        out.append((depth, name.strip(), int(cumulative)))
+    return out
+
+
+def measure(app, runs):
+    with tempfile.TemporaryDirectory() as cwd:
+        import_once(app, cwd)
+        top = MODULES[app][1]
+        totals, walls, modules = [], [], None
+        for _ in range(runs):
+            lines, wall = import_once(app, cwd)
+            modules = parse(lines)
+            totals.append(next(us for depth, name, us in modules if name == top))
+            walls.append(wall)
+    # app's direct imports are one level deeper than app itself
+    depth = next(d for d, name, _ in modules if name == top)
+    direct = sorted(((name, us) for d, name, us in modules if d == depth + 1),
+                    key=lambda x: -x[1])[:TOP]
+    loaded = {name.split(".")[0] for _, name, _ in modules}
+    return {
+        "import_ms": round(statistics.median(totals) / 1000, 1),
+        "wall_ms": round(statistics.median(walls) * 1000, 1),
+        "heaviest_imports": [{"module": m, "ms": round(us / 1000, 1)} for m, us in direct],
+        "heavy_loaded": sorted(p for p in HEAVY[app] if p in loaded),
+    }
+
+
+def git_describe():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--apps", nargs="+", choices=APPS, default=APPS,
+                        help="apps to measure (checkouts from before wsgi.py have no site)")
+    parser.add_argument("--out")
+    parser.add_argument("--check", action="store_true",
+                        help="fail if an app imports a HEAVY package at startup")
+    args = parser.parse_args()
+
+    results = {}
+    for app in args.apps:
+        results[app] = r = measure(app, args.runs)
+        print(f"{app:>6}: import {r['import_ms']:7.1f} ms   process {r['wall_ms']:7.1f} ms   "
+              f"heavy: {', '.join(r['heavy_loaded']) or '-'}", file=sys.stderr)
+        for imp in r["heaviest_imports"][:3]:
+            print(f"{'':>10}{imp['module']:<24}{imp['ms']:7.1f} ms", file=sys.stderr)
+
+    report = {"commit": git_describe(), "python": platform.python_version(),
+              "runs": args.runs, "apps": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        print(json.dumps(report, indent=1))
+    sys.exit(1 if args.check and any(r["heavy_loaded"] for r in results.values()) else 0)
@@ -0,0 +1,157 @@
+"""
+Guard against the hot listings queries falling back to full table scans.
+
+    python bench/check_query_plans.py [ROWS]      # default ROWS = 20000
+
+Creates scratch databases with the real schema (by importing chs, chb
+and admin with common/config.py's paths pointing into a temporary
+directory), fills listings with ROWS synthetic rows,
+runs ANALYZE and checks EXPLAIN QUERY PLAN for each query below: the
+listings API pages built by common/listing_query.py, the admin review and
+chat-log viewer pages (admin/app.py) and chb's analytics reads
+(chb/frames.py), each built by the same code the route runs. A query
+must use the expected indexes and must not SCAN listings or (unless
+noted) sort in a temp b-tree. Exits non-zero on any violation.
+"""
+import os
+import sys
+import random
+import tempfile
+import importlib.util
+
+from werkzeug.datastructures import MultiDict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from common import listing_query, periods  # noqa: E402
+
+# (label, /api/listings args, index that must serve it, temp sort allowed)
+CURSOR = listing_query.encode_cursor("price", "asc", 4000.0, 100)
+API_QUERIES = [
+    ("api: one category, default order",
+     [("category", "Gyms")], "idx_listings_category", False),
+    ("api: one category, next page",
+     [("category", "Gyms"), ("cursor", listing_query.encode_cursor("id", "asc", 500, 500))],
+     "idx_listings_category", False),
+    ("api: one category by price",
+     [("category", "Gyms"), ("sort", "price")], "idx_listings_category_price", False),
+    ("api: one category by price, next page",
+     [("category", "Gyms"), ("sort", "price"), ("cursor", CURSOR)],
+     "idx_listings_category_price", False),
+    ("api: one category by price with price range",
+     [("category", "Gyms"), ("sort", "price"), ("min_price", "2000"), ("max_price", "3000")],
+     "idx_listings_category_price", False),
+    # Rating is computed from the rollup, so only the filter uses an index
+    ("api: one category by rating",
+     [("category", "Gyms"), ("sort", "rating"), ("order", "desc")],
+     "idx_listings_category", True),
+]
+CATEGORIES = ["Accommodations", "Gyms", "Libraries", "Meal Services",
+              "Laundry", "Transport", "Stationery", "Cafes"]
+
+
+def load_app(name, app_dir):
+    sys.path.insert(0, app_dir)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(app_dir, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(conn, rows):
+    rng = random.Random(5)
+    conn.executemany(
+        "INSERT INTO listings (user_id, category, name, address, facilities, price) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(rng.randrange(rows // 10), rng.choice(CATEGORIES), f"Listing {i}", "Somewhere",
+          "WiFi", rng.randint(1000, 9000)) for i in range(rows)]
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def plan(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check(label, conn, sql, params, index, allow_sort=False):
+    details = plan(conn, sql, params)
+    problems = []
+    for name in (index,) if isinstance(index, str) else index:
+        if not any(name in d for d in details):
+            problems.append(f"does not use {name}")
+    if any(d.startswith(("SCAN listings", "SCAN l")) for d in details):
+        problems.append("scans listings")
+    if not allow_sort and any("TEMP B-TREE" in d for d in details):
+        problems.append("sorts in a temp b-tree")
+    print(f"{'FAIL' if problems else 'ok':>4}  {label}")
+    for d in details:
+        print(f"        {d}")
+    for p in problems:
+        print(f"        -> {p}")
+    return not problems
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ('LISTINGS_DB', 'CHS_USERS_DB', 'CHB_USERS_DB', 'JOBS_DB'):
+            os.environ[name] = os.path.join(tmp, name.lower() + '.db')
+        os.environ['CHB_OUTPUT_DIR'] = tmp
+        chs = load_app('chs_app', os.path.join(ROOT, 'chs'))
+        conn = chs.get_listings_db_connection()
+        seed(conn, rows)
+        for label, args, index, allow_sort in API_QUERIES:
+            q = listing_query.parse_args(MultiDict(args))
+            sql, params = listing_query.build_sql(q)
+            ok &= check(label, conn, sql, params, index, allow_sort)
+        conn.close()
+
+        # chb shares listings.db with chs and adds its own tables to it
+        chb = load_app('chb_app', os.path.join(ROOT, 'chb'))
+        conn = chb.get_listings_db_connection()
+        conn.execute("ANALYZE")
+        ok &= check("chb dashboard(): listings of a user", conn,
+                    "SELECT * FROM listings WHERE user_id=?", (7,), "idx_listings_user")
+        ok &= check("chb get_user_pg_names()", conn,
+                    "SELECT name FROM listings WHERE user_id=?", (7,), "idx_listings_user")
+        ok &= check("listing by name", conn,
+                    "SELECT id FROM listings WHERE name=?", ("Listing 42",), "idx_listings_name")
+
+        # admin review / chat-log viewers: newest first, keyset "older" pages
+        admin = load_app('admin_app', os.path.join(ROOT, 'admin'))
+        horizon = periods.horizon(conn)
+        no_filters = {'listing': '', 'from': '', 'to': '', 'rating': '', 'intent': ''}
+        after = ("2025-03-01", 500)
+        sql, params = admin.build_view_sql(admin.REVIEWS_SQL, *admin.reviews_where(no_filters),
+                                           'created_at', after)
+        ok &= check("admin reviews(): older page", conn, sql, params, "idx_reviews_time")
+        sql, params = admin.build_view_sql(
+            admin.REVIEWS_SQL, *admin.reviews_where(dict(no_filters, listing="Listing 42")),
+            'created_at', after)
+        ok &= check("admin reviews(): one listing, older page", conn, sql, params,
+                    "idx_reviews_listing_time")
+        dates = dict(no_filters, **{'from': "2025-01-01", 'to': "2025-01-31"})
+        sql, params = admin.build_view_sql(admin.CHATLOGS_SQL,
+                                           *admin.chatlogs_where(dates, horizon), 'day', after)
+        ok &= check("admin chatlogs(): date range, older page", conn, sql, params,
+                    ("idx_chat_daily_day", "idx_chat_monthly_month"))
+
+        # chb analytics (frames.py)
+        import frames
+        pgs, window = ["Listing 1", "Listing 2"], ("2025-01-01", "2025-01-31")
+        ok &= check("chb chat totals for a window", conn, *frames.chat_sql(pgs, window),
+                    ("sqlite_autoindex_chat_daily_1", "sqlite_autoindex_chat_monthly_1"))
+        # grouping a few hundred rows per listing and sentiment
+        ok &= check("chb review totals for a window", conn, *frames.reviews_sql(pgs, window),
+                    ("sqlite_autoindex_review_daily_1", "sqlite_autoindex_review_monthly_1"),
+                    allow_sort=True)
+        ok &= check("chb rating histogram for a window", conn,
+                    *frames.rating_counts_sql(pgs, window),
+                    "COVERING INDEX idx_review_labels_pg_day_rating")
+        ok &= check("chb compare(): an owner's listings against their categories", conn,
+                    frames.COMPARE_SQL, (7,), "idx_listings_user")
+        conn.close()
+        chs.db.close_all()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,133 @@
+"""
+Synthetic site data for load tests, in the apps' own flat-file formats.
+
+    python bench/loadgen.py OUT_DIR [SCALE]   # default SCALE 1
+
+Writes to OUT_DIR:
+
+  reviews.txt    - "Listing | review | N Stars | YYYY-MM-DD HH:MM:SS" entries
+                   between dashed lines, as chs used to append them
+  <Listing>.txt  - one chat log per listing, "Listing| YYYY-MM-DD | intent"
+  site.json      - the students, business owners and listings they refer to
+
+The .txt files are what chb/migrate_logs.py imports. At SCALE 1 there are
+100 students, 20 business owners, 200 listings, 20,000 reviews and 100,000
+chat events spread over the last year. Every count scales linearly.
+Popularity is skewed (a few listings get most reviews and chats) and the
+output is deterministic for a given seed.
+"""
+import os
+import sys
+import json
+import random
+from datetime import date, datetime, timedelta
+
+BASE = {"students": 100, "owners": 20, "listings": 200, "reviews": 20000, "chat_events": 100000}
+DAYS = 365
+
+# The student index page's categories (chs INDEX_CATEGORIES)
+CATEGORIES = {
+    "Accommodations": "PG", "Gyms": "Gym", "Libraries": "Library", "Meal Services": "Meals",
+}
+PREFIXES = ["Sunrise", "Star Shine", "Ramson", "Green Leaf", "Lotus", "Anudeep", "Silver Oak",
+            "City", "Campus", "Royal", "Blue Sky", "Shanti"]
+
+# (review text, possible star ratings); sarcastic ones read positive
+REVIEWS = [
+    ("Great place, very clean and the staff are friendly", (4, 5)),
+    ("Good food and quiet rooms, would recommend", (4, 5)),
+    ("Excellent wifi and helpful owner", (5,)),
+    ("very bad, dirty bathrooms and rude staff", (1, 2)),
+    ("Terrible food, worst experience", (1,)),
+    ("okay for the price", (3,)),
+    ("Average, nothing special", (2, 3)),
+    ("Yeah right, the so-called clean bathroom smelled like heaven.", (1, 2, 3)),
+    ("I just love waiting for 2 hours to get cold food. Wonderful experience... not.", (1, 2, 3)),
+    ("Oh great, the water stopped again. Just perfect.", (1, 2)),
+]
+
+# Messages a student might send the chatbot, across all intents
+CHAT_MESSAGES = [
+    "I miss my family so much", "I feel lonely here", "I don't understand the local language",
+    "I need money for rent", "I can't afford my expenses this month", "I have exam stress",
+    "Too much homework this week", "I have no friends in college", "My dorm is noisy at night",
+    "I need a better place to stay", "I have a fever", "I need to see a doctor",
+    "Buses are always late", "I can't find transportation to campus", "what is the wifi password",
+]
+
+# Intents the chatbot logs (chs/intents.py), most common first
+INTENTS = ["accommodation_problems", "financial_issues", "academic_pressure",
+           "transportation_challenges", "health_concerns", "homesickness",
+           "social_integration", "language_barrier", "unknown"]
+
+
+def sizes(scale):
+    return {k: max(1, int(v * scale)) for k, v in BASE.items()}
+
+
+def _skewed(rng, items, k):
+    # Zipf-like: the i-th item is picked with weight 1 / (i + 1)
+    return rng.choices(items, weights=[1 / (i + 1) for i in range(len(items))], k=k)
+
+
+def log_name(listing):
+    return listing.replace(" ", "_") + ".txt"
+
+
+def generate(out_dir, scale=1.0, seed=20, today=None):
+    """Write the flat files and site.json to out_dir; return the site."""
+    rng = random.Random(seed)
+    n = sizes(scale)
+    today = today or date.today()
+    first = datetime.combine(today - timedelta(days=DAYS - 1), datetime.min.time())
+    os.makedirs(out_dir, exist_ok=True)
+
+    kinds = list(CATEGORIES)
+    listings = []
+    for i in range(n["listings"]):
+        category = kinds[i % len(kinds)]
+        listings.append({
+            "owner": i % n["owners"] + 1,
+            "category": category,
+            "name": f"{rng.choice(PREFIXES)} {CATEGORIES[category]} {i + 1}",
+            "price": rng.randrange(1000, 15000, 500),
+        })
+    site = {
+        "scale": scale,
+        "sizes": n,
+        "students": [f"student{i + 1}" for i in range(n["students"])],
+        "owners": [f"owner{i + 1}" for i in range(n["owners"])],
+        "listings": listings,
+    }
+    names = [listing["name"] for listing in listings]
+
+    stamps = sorted(first + timedelta(seconds=rng.randrange(DAYS * 86400))
+                    for _ in range(n["reviews"]))
+    with open(os.path.join(out_dir, "reviews.txt"), "w", encoding="utf-8") as f:
+        for stamp, name in zip(stamps, _skewed(rng, names, n["reviews"])):
+            text, stars = rng.choice(REVIEWS)
+            f.write("-" * 60 + "\n")
+            f.write(f"{name} | {text} | {rng.choice(stars)} Stars | "
+                    f"{stamp.strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+    events = {}
+    for name, intent in zip(_skewed(rng, names, n["chat_events"]),
+                            _skewed(rng, INTENTS, n["chat_events"])):
+        events.setdefault(name, []).append(
+            ((first + timedelta(days=rng.randrange(DAYS))).strftime("%Y-%m-%d"), intent))
+    for name, rows in events.items():
+        with open(os.path.join(out_dir, log_name(name)), "w", encoding="utf-8") as f:
+            for day, intent in sorted(rows):
+                f.write(f"{name}| {day} | {intent}\n")
+
+    with open(os.path.join(out_dir, "site.json"), "w", encoding="utf-8") as f:
+        json.dump(site, f, indent=1)
+    return site
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    site = generate(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else 1.0)
+    print(json.dumps(site["sizes"]))
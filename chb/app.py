@@ -1,36 +1,39 @@
 import os
-import re
+import sys
+import gzip
+import json
 import sqlite3
-from collections import defaultdict, Counter
 from flask import (
-    Flask, render_template, request, redirect,
-    url_for, session, flash, send_file
+    Blueprint, Flask, current_app, render_template, request, redirect,
+    url_for, session, flash, send_file, abort, make_response, jsonify
 )
 from werkzeug.security import generate_password_hash, check_password_hash
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import seaborn as sns
-from fpdf import FPDF
-import numpy as np
 
-app = Flask(__name__)
-app.secret_key = 'your_secret_key_here'  # ← Change this!
+# common/ (shared SQLite access) lives next to the app directories
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reports import report_key, report_path
+from jobs import init_jobs_db, enqueue, get_job
+from common import db, config, listings_db, metrics, periods
+# sentiment and frames (numpy, pandas) are imported where analytics and
+# reports need them, so a worker serving logins and listing edits starts
+# without them.
 
-USERS_DB = 'users.db'
-LISTINGS_DB = 'listings.db'
+# Routes live on a blueprint so wsgi.py can mount chb next to chs and
+# admin in one process; create_app() at the bottom serves it on its own.
+bp = Blueprint('chb', __name__, template_folder='templates',
+               static_folder='static', static_url_path='/static')
+
+# Databases, see common/config.py
+USERS_DB = config.CHB_USERS_DB
+LISTINGS_DB = config.LISTINGS_DB
 
 # ——— Database Setup ———
 
 def get_user_db_connection():
-    conn = sqlite3.connect(USERS_DB)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db.get_connection(USERS_DB)
 
 def get_listings_db_connection():
-    conn = sqlite3.connect(LISTINGS_DB)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db.get_connection(LISTINGS_DB)
 
 def init_user_db():
     with get_user_db_connection() as conn:
@@ -44,33 +47,145 @@ def init_user_db():
         ''')
 
 def init_listings_db():
+    # Reviews and chatbot events are written by the student app (chs) and
+    # read here and by admin; all three share listings.db.
     with get_listings_db_connection() as conn:
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS listings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                category TEXT NOT NULL,
-                name TEXT NOT NULL,
-                address TEXT,
-                facilities TEXT,
-                cuisine TEXT,
-                price REAL NOT NULL,
-                image TEXT
-            )
+        listings_db.init(conn)
+
+def init_review_stats_db():
+    # Daily review rollup maintained by the incremental review engine (see
+    # update_review_stats). review_watermark remembers the last review id
+    # already folded in and how many rows that covered. review_labels keeps
+    # what each review added to review_daily, so the delete trigger below
+    # can take it out again instead of forcing a full rebuild. Days before
+    # the rollup horizon live in review_monthly (see common/periods.py).
+    with get_listings_db_connection() as conn:
+        columns = [r['name'] for r in conn.execute("PRAGMA table_info(review_labels)")]
+        if columns and 'rating' not in columns:
+            # Labels from before deletes were incremental: start over
+            conn.executescript('''
+                DROP TABLE review_labels;
+                DELETE FROM review_daily;
+                DELETE FROM review_watermark WHERE source = 'reviews';
+            ''')
+        elif columns and conn.execute('''
+            SELECT 1 FROM review_labels l JOIN reviews r ON r.id = l.review_id
+            WHERE l.rating = 0 AND CAST(r.rating AS INTEGER) > 0 LIMIT 1
+        ''').fetchone():
+            # Labelled when only "<n>/5" ratings were parsed, so every
+            # "<n> Stars" review counted as 0: reclassify from scratch
+            conn.execute("DELETE FROM review_watermark WHERE source = 'reviews'")
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS review_watermark (
+                source TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                seen INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS review_daily (
+                listing TEXT NOT NULL,
+                day TEXT NOT NULL,
+                sentiment TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                rating_sum INTEGER NOT NULL,
+                sarcastic INTEGER NOT NULL,
+                first_id INTEGER NOT NULL,
+                PRIMARY KEY (listing, day, sentiment)
+            );
+            CREATE TABLE IF NOT EXISTS review_labels (
+                review_id INTEGER PRIMARY KEY,
+                pg TEXT NOT NULL,
+                type TEXT NOT NULL,
+                day TEXT NOT NULL,
+                sentiment TEXT NOT NULL,
+                rating INTEGER NOT NULL,
+                sarcastic INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS review_monthly (
+                listing TEXT NOT NULL,
+                month TEXT NOT NULL,
+                sentiment TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                rating_sum INTEGER NOT NULL,
+                sarcastic INTEGER NOT NULL,
+                first_id INTEGER NOT NULL,
+                PRIMARY KEY (listing, month, sentiment)
+            );
+            -- the review log and PDF report read one listing's labels by day,
+            -- the rating histogram (frames.py) from the index alone
+            DROP INDEX IF EXISTS idx_review_labels_pg;
+            DROP INDEX IF EXISTS idx_review_labels_pg_day;
+            CREATE INDEX IF NOT EXISTS idx_review_labels_pg_day_rating
+                ON review_labels(pg, day, rating);
+
+            -- Whoever deletes a review (admin moderation, scripts) takes its
+            -- contribution back out of the rollup in the same transaction.
+            -- Reviews past the watermark have no label yet and are skipped.
+            -- A day is either in review_daily or, once compacted, in its
+            -- month's review_monthly row, never both.
+            DROP TRIGGER IF EXISTS review_stats_delete;
+            CREATE TRIGGER review_stats_delete
+            AFTER DELETE ON reviews BEGIN
+                UPDATE review_daily
+                SET n = n - 1,
+                    rating_sum = rating_sum - (SELECT rating FROM review_labels WHERE review_id = OLD.id),
+                    sarcastic = sarcastic - (SELECT sarcastic FROM review_labels WHERE review_id = OLD.id),
+                    first_id = COALESCE((
+                        SELECT MIN(l.review_id) FROM review_labels l
+                        WHERE l.pg = review_daily.listing AND l.day = review_daily.day
+                          AND l.sentiment = review_daily.sentiment AND l.review_id != OLD.id
+                    ), first_id)
+                WHERE (listing, day, sentiment) =
+                      (SELECT pg, day, sentiment FROM review_labels WHERE review_id = OLD.id);
+                DELETE FROM review_daily
+                WHERE n <= 0 AND (listing, day, sentiment) =
+                      (SELECT pg, day, sentiment FROM review_labels WHERE review_id = OLD.id);
+                UPDATE review_monthly
+                SET n = n - 1,
+                    rating_sum = rating_sum - (SELECT rating FROM review_labels WHERE review_id = OLD.id),
+                    sarcastic = sarcastic - (SELECT sarcastic FROM review_labels WHERE review_id = OLD.id),
+                    first_id = COALESCE((
+                        SELECT MIN(l.review_id) FROM review_labels l
+                        WHERE l.pg = review_monthly.listing
+                          AND l.day BETWEEN review_monthly.month || '-01' AND review_monthly.month || '-31'
+                          AND l.sentiment = review_monthly.sentiment AND l.review_id != OLD.id
+                    ), first_id)
+                WHERE (listing, month, sentiment) =
+                      (SELECT pg, substr(day, 1, 7), sentiment FROM review_labels WHERE review_id = OLD.id);
+                DELETE FROM review_monthly
+                WHERE n <= 0 AND (listing, month, sentiment) =
+                      (SELECT pg, substr(day, 1, 7), sentiment FROM review_labels WHERE review_id = OLD.id);
+                UPDATE review_watermark SET seen = seen - 1
+                WHERE source = 'reviews' AND OLD.id <= last_id;
+                DELETE FROM review_labels WHERE review_id = OLD.id;
+            END;
         ''')
-
-init_user_db()
-init_listings_db()
+        # The trigger keeps seen equal to the number of reviews up to
+        # last_id, so requests never recount. Rows removed while it was
+        # missing (or outside SQLite) are only caught here, at startup.
+        mark = conn.execute(
+            "SELECT last_id, seen FROM review_watermark WHERE source = 'reviews'"
+        ).fetchone()
+        if mark and conn.execute(
+            "SELECT COUNT(*) FROM reviews WHERE id <= ?", (mark['last_id'],)
+        ).fetchone()[0] != mark['seen']:
+            conn.execute("DELETE FROM review_watermark WHERE source = 'reviews'")
+
+@bp.record_once
+def init_databases(state):
+    init_user_db()
+    init_listings_db()
+    init_review_stats_db()
+    init_jobs_db()
 
 # ——— Authentication & Listing Routes ———
 
-@app.route('/')
+@bp.route('/')
 def index():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
-    return render_template('index.html')
+        return redirect(url_for('.dashboard'))
+    return render_template('chb/index.html')
 
-@app.route('/register', methods=['GET','POST'])
+@bp.route('/register', methods=['GET','POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username'].strip()
@@ -78,7 +193,7 @@ def register():
         password = request.form['password']
         if not username or not email or not password:
             flash('Please fill out all fields.')
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
         conn = get_user_db_connection()
         try:
             conn.execute(
@@ -87,15 +202,15 @@ def register():
             )
             conn.commit()
             flash('Registration successful. Please log in.')
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
         except sqlite3.IntegrityError:
             flash('Username or email already exists.')
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
         finally:
             conn.close()
-    return render_template('register.html')
+    return render_template('chb/register.html')
 
-@app.route('/login', methods=['GET','POST'])
+@bp.route('/login', methods=['GET','POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username'].strip()
@@ -109,35 +224,35 @@ def login():
             session['user_id'] = user['id']
             session['username'] = user['username']
             flash('Logged in successfully.')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('.dashboard'))
         flash('Invalid username or password.')
-        return redirect(url_for('login'))
-    return render_template('login.html')
+        return redirect(url_for('.login'))
+    return render_template('chb/login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash('Logged out.')
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     if 'user_id' not in session:
         flash('Please log in first.')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     conn = get_listings_db_connection()
     listings = conn.execute(
         "SELECT * FROM listings WHERE user_id=?", (session['user_id'],)
     ).fetchall()
     conn.close()
-    return render_template('dashboard.html', listings=listings)
+    return render_template('chb/dashboard.html', listings=listings)
 
 # Add a new business listing
-@app.route('/add_listing', methods=['GET', 'POST'])
+@bp.route('/add_listing', methods=['GET', 'POST'])
 def add_listing():
     if 'user_id' not in session:
         flash('Please log in first.')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     if request.method == 'POST':
         category = request.form['category']
         name = request.form['name'].strip()
@@ -155,15 +270,15 @@ def add_listing():
         conn.commit()
         conn.close()
         flash('Listing added successfully.')
-        return redirect(url_for('dashboard'))
-    return render_template('add_listing.html')
+        return redirect(url_for('.dashboard'))
+    return render_template('chb/add_listing.html')
 
 # Edit an existing listing (route remains for direct POST)
-@app.route('/edit_listing/<int:listing_id>', methods=['POST'])
+@bp.route('/edit_listing/<int:listing_id>', methods=['POST'])
 def edit_listing(listing_id):
     if 'user_id' not in session:
         flash('Please log in first.')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     conn = get_listings_db_connection()
     conn.execute('''
         UPDATE listings
@@ -176,337 +291,353 @@ def edit_listing(listing_id):
     conn.commit()
     conn.close()
     flash('Listing updated successfully.')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
 
 # Delete a listing
-@app.route('/delete_listing/<int:listing_id>', methods=['POST'])
+@bp.route('/delete_listing/<int:listing_id>', methods=['POST'])
 def delete_listing(listing_id):
     if 'user_id' not in session:
         flash('Please log in first.')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     conn = get_listings_db_connection()
     conn.execute("DELETE FROM listings WHERE id = ? AND user_id = ?", (listing_id, session['user_id']))
     conn.commit()
     conn.close()
     flash('Listing deleted successfully.')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('.dashboard'))
 
 # ——— Analytics Helpers ———
 
-def detect_sarcasm(review):
-    """
-    Detects sarcasm using:
-    - overlap of strongly positive and negative words (contradiction)
-    - presence of sarcastic phrases
-    - known sarcastic expressions
-    """
-    sarcasm_indicators = {
-        "great", "amazing", "awesome", "loved", "best", "fantastic", "incredible", 
-        "brilliant", "spectacular", "marvelous", "phenomenal", "stunning", "mind-blowing", 
-        "impressive", "wonderful", "terrific", "fabulous", "superb"
-    }
-
-    negative_words = {
-        "worst", "bad", "terrible", "awful", "hate", "poor", "horrible", "sucks", 
-        "dreadful", "abysmal", "lousy", "disappointing", "pathetic", "subpar"
-    }
-
-    sarcastic_phrases = [
-        "oh great", "just perfect", "yeah right", "exactly what i wanted", 
-        "fantastic... not", "well isn't that nice", "what a joy", "wonderful experience... not",
-        "i just love waiting", "oh, joy", "perfect timing", "exactly what i expected", 
-        "not impressed", "no kidding", "obviously", "clearly", "incredible, really", "amazing, isn't it", 
-        "so hilarious", "how convenient", "excellent, as always"
-    ]
+def get_user_pg_names(user_id):
+    conn = get_listings_db_connection()
+    rows = conn.execute(
+        "SELECT name FROM listings WHERE user_id=?", (user_id,)
+    ).fetchall()
+    conn.close()
+    return set(r["name"] for r in rows)
 
-    additional_sarcasm = {
-        "oh, absolutely!", "how thoughtful!", "well, isn't that special!", "wow, groundbreaking!",
-        "oh, you don't say!", "bravo, well done!", "how original!", "a true masterpiece!",
-        "clearly the best!", "oh, just perfect!", "what a surprise!", "outstanding effort!",
-        "really impressive!", "oh, that's rich!", "truly state-of-the-art!", "wonderful choice!",
-        "oh, this is fine!", "remarkably consistent!", "simply flawless!", "my favorite part!"
-    }
+def _in_clause(values):
+    return ",".join("?" * len(values))
+
+# ——— Incremental Review Engine ———
+# Instead of re-classifying every review on every request we remember the
+# highest review id already folded into review_daily and only classify
+# rows added since then. Deleted reviews are taken back out by the
+# review_stats_delete trigger, which also keeps the watermark's row count
+# current; init_review_stats_db rebuilds the rollup if that count has
+# drifted. With no new reviews a call is one indexed read and takes no
+# write lock, so it never holds up chs inserting reviews.
+
+def _reset_review_stats(conn):
+    conn.execute("DELETE FROM review_daily")
+    conn.execute("DELETE FROM review_monthly")
+    conn.execute("DELETE FROM review_labels")
+    conn.execute("DELETE FROM review_watermark WHERE source='reviews'")
+
+def update_review_stats():
+    """Fold any newly added reviews into the daily review rollup."""
+    conn = get_listings_db_connection()
+    try:
+        mark = conn.execute(
+            "SELECT last_id FROM review_watermark WHERE source='reviews'"
+        ).fetchone()
+        if mark and not conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM reviews WHERE id > ?)", (mark['last_id'],)
+        ).fetchone()[0]:
+            return
+
+        # IMMEDIATE so two concurrent requests don't both consume the tail;
+        # the watermark is read again because one may just have done so
+        conn.execute("BEGIN IMMEDIATE")
+        mark = conn.execute(
+            "SELECT last_id, seen FROM review_watermark WHERE source='reviews'"
+        ).fetchone()
+        if mark:
+            last_id, seen = mark['last_id'], mark['seen']
+        else:
+            _reset_review_stats(conn)
+            last_id = seen = 0
+
+        rows = conn.execute(
+            "SELECT id, listing, review, rating, created_at FROM reviews WHERE id > ? ORDER BY id",
+            (last_id,)
+        ).fetchall()
+        if mark and not rows:
+            conn.rollback()
+            return
+        horizon = periods.horizon(conn)
+        from sentiment import score_reviews
+        with metrics.span("sentiment"):
+            scores = score_reviews([r['review'] for r in rows], [r['rating'] for r in rows])
+        for i, row in enumerate(rows):
+            pg = row['listing']
+            day = row['created_at'][:10]
+            val = int(scores['rating'][i])
+            bucket = str(scores['bucket'][i])
+            sentiment = str(scores['type'][i])
+            sarcastic = int(sentiment == "Sarcastically Negative")
+            if day >= horizon:
+                conn.execute('''
+                    INSERT INTO review_daily (listing, day, sentiment, n, rating_sum, sarcastic, first_id)
+                    VALUES (?, ?, ?, 1, ?, ?, ?)
+                    ON CONFLICT (listing, day, sentiment) DO UPDATE
+                    SET n = n + 1,
+                        rating_sum = rating_sum + excluded.rating_sum,
+                        sarcastic = sarcastic + excluded.sarcastic
+                ''', (pg, day, bucket, val, sarcastic, row['id']))
+            else:
+                # A late review for a month that has already been compacted
+                conn.execute('''
+                    INSERT INTO review_monthly (listing, month, sentiment, n, rating_sum, sarcastic, first_id)
+                    VALUES (?, ?, ?, 1, ?, ?, ?)
+                    ON CONFLICT (listing, month, sentiment) DO UPDATE
+                    SET n = n + 1,
+                        rating_sum = rating_sum + excluded.rating_sum,
+                        sarcastic = sarcastic + excluded.sarcastic,
+                        first_id = MIN(first_id, excluded.first_id)
+                ''', (pg, day[:7], bucket, val, sarcastic, row['id']))
+            conn.execute('''
+                INSERT INTO review_labels(review_id, pg, type, day, sentiment, rating, sarcastic)
+                VALUES(?,?,?,?,?,?,?)
+            ''', (row['id'], pg, sentiment, day, bucket, val, sarcastic))
+
+        if rows:
+            last_id = rows[-1]['id']
+        conn.execute(
+            "INSERT OR REPLACE INTO review_watermark(source, last_id, seen) VALUES('reviews',?,?)",
+            (last_id, seen + len(rows))
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-    review_lower = review.lower()
-    words = set(review_lower.split())
+def rebuild_review_stats():
+    conn = get_listings_db_connection()
+    with conn:
+        _reset_review_stats(conn)
+    conn.close()
+    update_review_stats()
 
-    indicator_negative_overlap = bool(words & sarcasm_indicators and words & negative_words)
-    phrase_detected = any(phrase in review_lower for phrase in sarcastic_phrases)
-    additional_detected = any(phrase in review_lower for phrase in additional_sarcasm)
+def compact_review_stats(conn, horizon):
+    """Fold review_daily rows before horizon into review_monthly."""
+    conn.execute('''
+        INSERT INTO review_monthly (listing, month, sentiment, n, rating_sum, sarcastic, first_id)
+        SELECT listing, substr(day, 1, 7), sentiment,
+               SUM(n), SUM(rating_sum), SUM(sarcastic), MIN(first_id)
+        FROM review_daily
+        WHERE day < ?
+        GROUP BY listing, substr(day, 1, 7), sentiment
+        ON CONFLICT (listing, month, sentiment) DO UPDATE
+        SET n = n + excluded.n,
+            rating_sum = rating_sum + excluded.rating_sum,
+            sarcastic = sarcastic + excluded.sarcastic,
+            first_id = MIN(first_id, excluded.first_id)
+    ''', (horizon,))
+    conn.execute("DELETE FROM review_daily WHERE day < ?", (horizon,))
+
+
+def review_log_version(user_pgs, window=None):
+    """(count, newest id) of a user's classified reviews; changes on any edit."""
+    update_review_stats()
+    pgs = list(user_pgs)
+    days, params = periods.day_range("day", window)
+    conn = get_listings_db_connection()
+    row = conn.execute(f'''
+        SELECT COUNT(*), COALESCE(MAX(review_id), 0) FROM review_labels
+        WHERE pg IN ({_in_clause(pgs)}){days}
+    ''', pgs + params).fetchone()
+    conn.close()
+    return tuple(row)
 
-    return indicator_negative_overlap or phrase_detected or additional_detected
 
+def _review_stats(conn, pgs, window):
+    import frames
+    return frames.review_stats(frames.load_reviews(conn, pgs, window),
+                               frames.load_rating_counts(conn, pgs, window))
 
 
-def get_user_pg_names(user_id):
+def generate_insights(user_pgs, window=None):
+    """(insights, review log) for a user's listings and window."""
+    import frames
+    update_review_stats()
+    pgs = list(user_pgs)
+    days, params = periods.day_range("l.day", window)
     conn = get_listings_db_connection()
-    rows = conn.execute(
-        "SELECT name FROM listings WHERE user_id=?", (user_id,)
-    ).fetchall()
+    stats = _review_stats(conn, pgs, window)
+    logs = conn.execute(f'''
+        SELECT l.pg, r.review, r.rating, l.type
+        FROM review_labels l JOIN reviews r ON r.id = l.review_id
+        WHERE l.pg IN ({_in_clause(pgs)}){days}
+        ORDER BY l.review_id
+    ''', pgs + params).fetchall()
     conn.close()
-    return set(r["name"] for r in rows)
 
-def analyze_reviews(user_pgs):
-    reviews = defaultdict(list)
-    if not os.path.exists("reviews.txt"):
-        return reviews
-    with open("reviews.txt","r",encoding="utf-8") as f:
-        for line in f:
-            parts = line.strip().split("|")
-            if len(parts) >= 3:
-                pg = parts[0].strip()
-                if pg not in user_pgs:
-                    continue
-                txt = parts[1].strip()
-                rating = parts[2].strip()
-                reviews[pg].append((txt, rating))
-    return reviews
-
-def analyze_chat_logs(user_pgs):
-    counts = Counter()
-    by_date = {}
-    by_type_date = defaultdict(lambda: defaultdict(int))
-    pg_issues = defaultdict(Counter)
-
-    for fn in os.listdir():
-        if fn.endswith(".txt") and fn != "reviews.txt":
-            with open(fn,"r",encoding="utf-8") as f:
-                for line in f:
-                    parts = [p.strip() for p in line.strip().split("|")]
-                    if len(parts) == 3:
-                        pg, date_str, category = parts
-                        if pg not in user_pgs:
-                            continue
-                        counts[category] += 1
-                        by_date[date_str] = by_date.get(date_str, 0) + 1
-                        by_type_date[category][date_str] += 1
-                        pg_issues[pg][category] += 1
-    return counts, by_date, by_type_date, pg_issues
-
-
-positive_words = {
-    "good", "great", "excellent", "amazing", "awesome", "wonderful",
-    "clean", "friendly", "comfortable", "delicious", "perfect", "happy",
-    "helpful", "spacious", "affordable", "recommend", "fast", "satisfied",
-    "peaceful", "nice", "quiet"
-}
-
-negative_words = {
-    "bad", "worst", "dirty", "rude", "late", "expensive", "poor",
-    "horrible", "noisy", "uncomfortable", "slow", "broken", "crowded",
-    "terrible", "disappointed", "not good", "problem", "issue", "hate"
-}
-
-
-def generate_insights(user_pgs):
-    revs = analyze_reviews(user_pgs)
-    issues, timeline, type_tl, pg_iss = analyze_chat_logs(user_pgs)
-    insights = {}
-    avg_ratings = {}
-    log_data = []
-
-    for pg, lst in revs.items():
-        total = pos = neg = neu = 0
-        for txt, r in lst:
-            m = re.search(r"(\d)/5", r)
-            val = int(m.group(1)) if m else 0
-            total += val
-
-            txt_lower = txt.lower()
-            pos_count = sum(1 for word in positive_words if word in txt_lower)
-            neg_count = sum(1 for word in negative_words if word in txt_lower)
-
-            if pos_count > neg_count:
-                sentiment = "Positive"; pos += 1
-            elif neg_count > pos_count:
-                sentiment = "Negative"; neg += 1
-            else:
-                sentiment = "Neutral"; neu += 1
-
-            if detect_sarcasm(txt) and val <= 2:
-                sentiment = "Sarcastically Negative"
-
-            log_data.append({
-                "pg": pg,
-                "review": txt,
-                "rating": r,
-                "type": sentiment
-            })
-
-        avg = round(total / len(lst), 2) if lst else 0
-        insights[pg] = {
-            "avg": avg,
-            "total": len(lst),
-            "pos": pos,
-            "neg": neg,
-            "neu": neu
-        }
-        avg_ratings[pg] = avg
-
-    return insights, avg_ratings, issues, timeline, type_tl, pg_iss, log_data
-
-
-def generate_graphs(avg_ratings, chat_issues, issue_timeline, timeline_by_type, pg_issues):
-    # Ensure static folder exists
-    os.makedirs("static", exist_ok=True)
-
-    # 1) PG Ratings Bar Chart
-    fig, ax = plt.subplots(figsize=(8, 4))
-    names = list(avg_ratings.keys())
-    ratings = list(avg_ratings.values())
-    sns.barplot(x=ratings, y=names, hue=names, ax=ax, palette="viridis", dodge=False)
-    if ax.get_legend():
-        ax.get_legend().remove()
-    ax.set_xlabel("Average Rating")
-    ax.set_title("Key Insights for Your Business Performance")
-    ratings_graph = "ratings_graph.png"
-    fig.tight_layout()
-    fig.savefig(f"static/{ratings_graph}")
-    plt.close(fig)
-
-    # 2) Chat Issues Breakdown Pie Chart
-    fig, ax = plt.subplots(figsize=(6, 6))
-    labels = list(chat_issues.keys())
-    sizes = list(chat_issues.values())
-    ax.pie(sizes, labels=labels, autopct='%1.1f%%', colors=sns.color_palette("pastel"))
-    ax.set_title("Chat Issues Breakdown")
-    chat_graph = "chat_graph.png"
-    fig.tight_layout()
-    fig.savefig(f"static/{chat_graph}")
-    plt.close(fig)
-
-    # 3) Issues Over Time
-    fig, ax = plt.subplots(figsize=(8, 4))
-    dates = sorted(issue_timeline.keys())
-    counts = [issue_timeline[d] for d in dates]
-    ax.plot(dates, counts, marker='o', color='#00bfff')
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Number of Issues")
-    ax.set_title("Issues Over Time")
-    plt.xticks(rotation=45)
-    time_graph = "time_graph.png"
-    fig.tight_layout()
-    fig.savefig(f"static/{time_graph}")
-    plt.close(fig)
-
-    # 4) Type of Issue Over Time
-    fig, ax = plt.subplots(figsize=(8, 4))
-    for issue_type, tl in timeline_by_type.items():
-        ds = sorted(tl.keys())
-        cs = [tl[d] for d in ds]
-        ax.plot(ds, cs, marker='o', label=issue_type)
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Count")
-    ax.set_title("Type of Issue Over Time")
-    plt.xticks(rotation=45)
-    if timeline_by_type:
-        ax.legend()
-    type_graph = "type_issue_time_graph.png"
-    fig.tight_layout()
-    fig.savefig(f"static/{type_graph}")
-    plt.close(fig)
-
-    # 5) PG Issues Breakdown
-    num = len(pg_issues)
-    pg_graph = "pg_issues_graph.png"
-    if num == 0:
-        fig, ax = plt.subplots(figsize=(5, 5))
-        ax.text(0.5, 0.5, "No PG issues found", ha="center", va="center")
-        ax.axis("off")
-        fig.tight_layout()
-        fig.savefig(f"static/{pg_graph}")
-        plt.close(fig)
-    else:
-        cols = 2
-        rows = (num + 1) // 2
-        fig, axes = plt.subplots(rows, cols, figsize=(cols * 5, rows * 5))
+    # Listings appear in order of their first review, with the review log
+    # grouped per listing, as when reviews were read from one file.
+    rank = {pg: i for i, pg in enumerate(stats)}
+    log_data = [
+        {"pg": row['pg'], "review": row['review'], "rating": row['rating'], "type": row['type']}
+        for row in sorted(logs, key=lambda r: rank.get(r['pg'], len(rank)))
+    ]
+    return frames.insights(stats), log_data
 
-        # Flatten safely
-        if isinstance(axes, np.ndarray):
-            axes = axes.flatten()
-        else:
-            axes = [axes]
-
-        for i, (pg, ctr) in enumerate(pg_issues.items()):
-            axes[i].pie(list(ctr.values()), labels=list(ctr.keys()),
-                        autopct='%1.1f%%', colors=sns.color_palette("pastel"))
-            axes[i].set_title(f"{pg} Issues Breakdown")
-
-        # Hide unused subplots
-        for j in range(i + 1, len(axes)):
-            axes[j].axis("off")
-
-        fig.tight_layout()
-        fig.savefig(f"static/{pg_graph}")
-        plt.close(fig)
-
-    return ratings_graph, chat_graph, time_graph, type_graph, pg_graph
-
-def safe_text(text):
-    return str(text).encode("latin-1", "replace").decode("latin-1")
-
-def generate_pdf_report(log_data):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, "Analytics Report", 0, 1, "C")
-
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(30, 10, "PG", 1)
-    pdf.cell(100, 10, "Review", 1)
-    pdf.cell(30, 10, "Rating", 1)
-    pdf.cell(30, 10, "Type", 1)
-    pdf.ln()
-
-    pdf.set_font("Arial", "", 10)
-    for entry in log_data:
-        pg = safe_text(entry["pg"])[:28]
-        review = safe_text(entry["review"])[:70]
-        rating = safe_text(entry["rating"])
-        sentiment = safe_text(entry["type"])
-        pdf.cell(30, 10, pg, 1)
-        pdf.cell(100, 10, review, 1)
-        pdf.cell(30, 10, rating, 1)
-        pdf.cell(30, 10, sentiment, 1)
-        pdf.ln()
-
-    report_path = "static/report.pdf"
-    pdf.output(report_path)
-    return report_path
+
+def chart_data(user_pgs, window=None):
+    """Input data of every dashboard chart (see frames.chart_specs)."""
+    import frames
+    update_review_stats()
+    pgs = list(user_pgs)
+    conn = get_listings_db_connection()
+    stats = _review_stats(conn, pgs, window)
+    chat = frames.load_chat(conn, pgs, window)
+    conn.close()
+    return frames.chart_specs(stats, frames.chat_stats(chat))
 
 
 # ——— Analytics Routes ———
 
-@app.route('/analytics')
+def _analytics_window():
+    """
+    The request's date window, widened to whole months before the rollup
+    horizon (periods.align_window) so every number on the page counts the
+    same days. Raises ValueError on a bad date.
+    """
+    window = periods.parse_window(request.args)
+    if window is None:
+        return None
+    conn = get_listings_db_connection()
+    horizon = periods.horizon(conn)
+    conn.close()
+    return periods.align_window(window, horizon)
+
+@bp.route('/analytics')
 def analytics():
     if 'user_id' not in session:
         flash('Please log in first.')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
-    user_pgs = get_user_pg_names(session['user_id'])
-    insights, avgs, issues, timeline, type_tl, pg_iss, logd = generate_insights(user_pgs)
-    r_g, c_g, t_g, ty_g, p_g = generate_graphs(avgs, issues, timeline, type_tl, pg_iss)
+    try:
+        window = _analytics_window()
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('.analytics'))
 
-    return render_template('businessdb.html',
+    user_id = session['user_id']
+    insights, logd = generate_insights(get_user_pg_names(user_id), window)
+    import frames
+    conn = get_listings_db_connection()
+    comparison = frames.compare(conn, user_id)
+    conn.close()
+    # Charts are drawn in the browser from /analytics/data
+    resp = make_response(render_template('chb/businessdb.html',
         insights=insights,
-        ratings_graph=r_g,
-        chat_graph=c_g,
-        time_graph=t_g,
-        type_graph=ty_g,
-        pg_graph=p_g,
-        log_data=logd
-    )
-
-@app.route('/download_report')
+        comparison=comparison,
+        log_data=logd,
+        window=periods.window_args(window)
+    ))
+    return _compressed(resp)
+
+# Chart series as compact JSON: all of them, or one by name
+CHART_NAMES = ("ratings", "chat", "time", "type_time", "pg_issues")  # frames.chart_specs keys
+
+@bp.route('/analytics/data')
+@bp.route('/analytics/data/<name>')
+def analytics_data(name=None):
+    if 'user_id' not in session:
+        return jsonify({"error": "login required"}), 401
+    if name is not None and name not in CHART_NAMES:
+        return jsonify({"error": f"unknown chart {name}"}), 404
+    try:
+        window = _analytics_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    data = chart_data(get_user_pg_names(session['user_id']), window)
+    body = json.dumps(data if name is None else data[name], separators=(',', ':'))
+    return _compressed(current_app.response_class(body, mimetype='application/json'))
+
+@bp.route('/download_report')
 def download_report():
     if 'user_id' not in session:
         flash('Please log in first.')
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
+
+    try:
+        window = _analytics_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    user_id = session['user_id']
+    user_pgs = get_user_pg_names(user_id)
+    # The worker streams rows from listings.db itself; all we need here is
+    # a cheap version of the user's review log to key the cached PDF on.
+    key = report_key(user_pgs, review_log_version(user_pgs, window), window)
+    path = report_path(user_id, key)
+    job_id = enqueue(user_id, "report", f"report:{user_id}:{key}",
+                     LISTINGS_DB, sorted(user_pgs), path, window)
+    return _job_response(get_job(job_id), 202)
+
+# ——— Response compression ———
+
+GZIP_MIN_SIZE = 1024  # bytes; smaller bodies gain little from compression
+
+def _compressed(resp):
+    """Gzip resp if the client accepts it, and answer conditional GETs."""
+    resp.vary.add('Accept-Encoding')
+    body = resp.get_data()
+    if len(body) >= GZIP_MIN_SIZE and request.accept_encodings['gzip']:
+        # mtime=0: the same body always compresses to the same bytes
+        resp.set_data(gzip.compress(body, compresslevel=6, mtime=0))
+        resp.headers['Content-Encoding'] = 'gzip'
+    # Tagged after compression, so each encoding has its own ETag
+    resp.add_etag()
+    return resp.make_conditional(request)
+
+# ——— Background Job Routes ———
+
+def _job_response(job, code=200):
+    body = {"id": job['id'], "kind": job['kind'], "status": job['status']}
+    if job['status'] == 'done':
+        body["result_url"] = url_for('.job_result', job_id=job['id'])
+        code = 200
+    elif job['status'] == 'failed':
+        body["error"] = job['error']
+    else:
+        body["status_url"] = url_for('.job_status', job_id=job['id'])
+    return jsonify(body), code
 
-    user_pgs = get_user_pg_names(session['user_id'])
-    _, _, _, _, _, _, log_data = generate_insights(user_pgs)
-    report_path = generate_pdf_report(log_data)
-    return send_file(report_path, as_attachment=True)
+def _get_user_job(job_id):
+    if 'user_id' not in session:
+        abort(403)
+    job = get_job(job_id)
+    if job is None or job['user_id'] != session['user_id']:
+        abort(404)
+    return job
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    return _job_response(_get_user_job(job_id))
+
+@bp.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = _get_user_job(job_id)
+    if job['status'] != 'done' or not os.path.exists(job['result']):
+        abort(404)
+    return send_file(job['result'], as_attachment=True, download_name='report.pdf')
+
+def create_app(settings=None):
+    """chb on its own (wsgi.py mounts bp together with chs and admin)."""
+    app = Flask(__name__, static_folder=None)
+    app.secret_key = 'your_secret_key_here'  # ← Change this!
+    app.config.update(settings or {})
+    db.init_app(app)
+    metrics.init_app(app, 'chb')
+    app.register_blueprint(bp)
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,302 @@
+"""
+Analytics for the business dashboard, read from the rollup tables.
+
+Everything here starts from rollup rows, not events, so how the rows are
+aggregated is chosen by how many there are (bench/bench_analytics.py):
+
+- Review totals come back already grouped per listing and sentiment, and
+  rating percentiles from a per-listing rating histogram (one row per
+  listing), so the review side is a few hundred rows at most and is
+  summed in plain Python.
+- Chat rows are one per listing, day and intent in the window. Up to
+  COLUMNAR_MIN_ROWS (about a month, for a busy owner) they are summed into
+  dicts; pandas' setup cost is more than the whole loop there. Longer
+  windows go into a DataFrame with categorical listing, day and intent
+  (an integer code per row plus one copy of each name) and every total
+  is a bincount over the codes.
+
+Either way the chat totals come out as the same dense arrays, with
+periods parsed to datetime64 once each, not once per row. Days before
+the rollup horizon come back as whole months (see common/periods.py).
+They are kept as the first of the month with `monthly` set and labelled
+"YYYY-MM" in the charts.
+"""
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from common import periods
+
+SENTIMENTS = ["Positive", "Negative", "Neutral"]
+PERCENTILES = (25, 50, 75)
+MAX_RATING = 5
+# Chat rows from which the pandas path is faster than the dict loop
+COLUMNAR_MIN_ROWS = 8000
+
+
+def _rows(conn, sql, params):
+    cur = conn.cursor()
+    cur.row_factory = None  # tuples: no sqlite3.Row object per row
+    return cur.execute(sql, params).fetchall()
+
+
+def _marks(values):
+    return ",".join("?" * len(values))
+
+
+# ——— Loading ———
+# Each query has an (sql, params) builder, which bench/check_query_plans.py
+# checks the plans of.
+
+def chat_sql(pgs, window=None):
+    days, day_params = periods.day_range("day", window)
+    months, month_params = periods.month_range("month", window)
+    return f'''
+        SELECT listing, day, intent, n FROM chat_daily
+        WHERE listing IN ({_marks(pgs)}){days}
+        UNION ALL
+        SELECT listing, month, intent, n FROM chat_monthly
+        WHERE listing IN ({_marks(pgs)}){months}
+    ''', pgs + day_params + pgs + month_params
+
+
+def load_chat(conn, pgs, window=None):
+    """(listing, period, intent, n) rows; period is "YYYY-MM-DD", or "YYYY-MM" once compacted."""
+    return _rows(conn, *chat_sql(pgs, window))
+
+
+def reviews_sql(pgs, window=None):
+    days, day_params = periods.day_range("day", window)
+    months, month_params = periods.month_range("month", window)
+    return f'''
+        SELECT listing, sentiment, SUM(n), SUM(rating_sum), SUM(sarcastic), MIN(first_id)
+        FROM (
+            SELECT listing, sentiment, n, rating_sum, sarcastic, first_id
+            FROM review_daily WHERE listing IN ({_marks(pgs)}){days}
+            UNION ALL
+            SELECT listing, sentiment, n, rating_sum, sarcastic, first_id
+            FROM review_monthly WHERE listing IN ({_marks(pgs)}){months}
+        )
+        GROUP BY listing, sentiment
+    ''', pgs + day_params + pgs + month_params
+
+
+def load_reviews(conn, pgs, window=None):
+    """(listing, sentiment, n, rating_sum, sarcastic, first_id) totals for a window."""
+    return _rows(conn, *reviews_sql(pgs, window))
+
+
+def rating_counts_sql(pgs, window=None):
+    days, params = periods.day_range("day", window)
+    # One SUM per rating rather than GROUP BY pg, rating: the index is
+    # read in (pg, day) order, so grouping by pg alone needs no sort.
+    # Anything above MAX_RATING counts as MAX_RATING.
+    counts = ", ".join([f"SUM(rating = {r})" for r in range(MAX_RATING)]
+                       + [f"SUM(rating >= {MAX_RATING})"])
+    return f'''
+        SELECT pg, {counts} FROM review_labels
+        WHERE pg IN ({_marks(pgs)}){days}
+        GROUP BY pg
+    ''', pgs + params
+
+
+def load_rating_counts(conn, pgs, window=None):
+    """(listing, reviews rated 0, 1, ... MAX_RATING) for a window."""
+    return _rows(conn, *rating_counts_sql(pgs, window))
+
+
+# ——— Aggregation ———
+
+def _percentiles(hist):
+    """Nearest-rank rating percentiles from a rating histogram."""
+    total = sum(hist)
+    out = {}
+    for p in PERCENTILES:
+        target = max(math.ceil(total * p / 100), 1)
+        seen = 0
+        for rating, n in enumerate(hist):
+            seen += n
+            if seen >= target:
+                break
+        out[f"p{p}"] = rating if total else 0
+    return out
+
+
+def review_stats(reviews, rating_counts):
+    """
+    {listing: totals} for every listing with reviews, in order of each
+    listing's first review: total, pos / neg / neu, sarcastic, avg and
+    rating percentiles.
+    """
+    keys = dict(zip(SENTIMENTS, ("pos", "neg", "neu")))
+    stats = {}
+    for listing, sentiment, n, rating_sum, sarcastic, first_id in reviews:
+        s = stats.setdefault(listing, {
+            "total": 0, "rating_sum": 0, "pos": 0, "neg": 0, "neu": 0,
+            "sarcastic": 0, "first_id": first_id,
+        })
+        s["total"] += n
+        s["rating_sum"] += rating_sum
+        s["sarcastic"] += sarcastic
+        s["first_id"] = min(s["first_id"], first_id)
+        if sentiment in keys:
+            s[keys[sentiment]] += n
+    for s in stats.values():
+        s["avg"] = s["rating_sum"] / s["total"] if s["total"] else 0
+        s.update(_percentiles(()))
+    for listing, *hist in rating_counts:
+        if listing in stats:
+            stats[listing].update(_percentiles(hist))
+    return dict(sorted(stats.items(), key=lambda item: item[1]["first_id"]))
+
+
+def _dense(sums, *axes):
+    """A {key: n} dict as an array over the given axes, zero where absent."""
+    out = np.zeros(tuple(len(axis) for axis in axes), dtype=np.int64)
+    if sums:
+        positions = [{name: i for i, name in enumerate(axis)} for axis in axes]
+        columns = zip(*sums) if len(axes) > 1 else (sums,)
+        index = tuple([pos[k] for k in column] for pos, column in zip(positions, columns))
+        out[index] = list(sums.values())
+    return out
+
+
+def _chat_dicts(rows):
+    by_intent, by_period = defaultdict(int), defaultdict(int)
+    by_intent_period, by_listing_intent = defaultdict(int), defaultdict(int)
+    for listing, period, intent, n in rows:
+        by_intent[intent] += n
+        by_period[period] += n
+        by_intent_period[intent, period] += n
+        by_listing_intent[listing, intent] += n
+    listings = sorted({listing for listing, _ in by_listing_intent})
+    intents, keys = sorted(by_intent), sorted(by_period)
+    return listings, intents, keys, {
+        "by_intent": _dense(by_intent, intents),
+        "by_period": _dense(by_period, keys),
+        "by_intent_period": _dense(by_intent_period, intents, keys),
+        "by_listing_intent": _dense(by_listing_intent, listings, intents),
+    }
+
+
+def _chat_frame(rows):
+    import pandas as pd
+    chat = pd.DataFrame.from_records(rows, columns=["listing", "period", "intent", "n"])
+    for name in ("listing", "period", "intent"):
+        chat[name] = chat[name].astype("category")
+
+    def sums(*columns):
+        shape = tuple(len(chat[c].cat.categories) for c in columns)
+        cells = np.ravel_multi_index([chat[c].cat.codes.to_numpy() for c in columns], shape)
+        totals = np.bincount(cells, weights=chat["n"].to_numpy(), minlength=int(np.prod(shape)))
+        return totals.astype(np.int64).reshape(shape)
+
+    names = lambda column: chat[column].cat.categories.astype(str).tolist()  # noqa: E731
+    return names("listing"), names("intent"), names("period"), {
+        "by_intent": sums("intent"),
+        "by_period": sums("period"),
+        "by_intent_period": sums("intent", "period"),
+        "by_listing_intent": sums("listing", "intent"),
+    }
+
+
+def chat_stats(rows):
+    """
+    Chat-issue totals per intent, per period, per intent and period, and
+    per listing and intent, as dense arrays over the sorted names.
+    Periods are datetime64 days (a compacted month is its first day, with
+    `monthly` set) in date order.
+    """
+    if len(rows) >= COLUMNAR_MIN_ROWS:
+        listings, intents, keys, sums = _chat_frame(rows)
+    else:
+        listings, intents, keys, sums = _chat_dicts(rows)
+    keys = np.array(keys, dtype=str)
+    return {
+        "listings": listings,
+        "intents": intents,
+        # numpy reads "YYYY-MM" as that month, i.e. its first day
+        "periods": keys.astype("datetime64[D]"),
+        "monthly": np.char.str_len(keys) == 7,
+        **sums,
+    }
+
+
+def insights(stats):
+    """Per-listing card data for businessdb.html, in display order."""
+    return {
+        pg: {
+            "avg": round(s["avg"], 2), "total": s["total"], "pos": s["pos"],
+            "neg": s["neg"], "neu": s["neu"], "sarcastic": s["sarcastic"],
+            **{f"p{p}": s[f"p{p}"] for p in PERCENTILES},
+        }
+        for pg, s in stats.items()
+    }
+
+
+def chart_specs(stats, chat):
+    """JSON-able input data for each dashboard chart, keyed by chart name."""
+    labels = np.where(chat["monthly"],
+                      np.datetime_as_string(chat["periods"], unit="M"),
+                      np.datetime_as_string(chat["periods"], unit="D")).tolist()
+
+    def rows(outer, inner, sums):
+        # only the combinations that occurred, like the rollup rows
+        inner = np.asarray(inner)
+        for name, row in zip(outer, sums):
+            present = row > 0
+            yield name, inner[present].tolist(), row[present].tolist()
+
+    return {
+        "ratings": {
+            "names": list(stats),
+            "ratings": [round(s["avg"], 2) for s in stats.values()],
+        },
+        "chat": {"labels": chat["intents"], "sizes": chat["by_intent"].tolist()},
+        "time": {"dates": labels, "counts": chat["by_period"].tolist()},
+        "type_time": [
+            [intent, [list(point) for point in zip(dates, counts)]]
+            for intent, dates, counts in rows(chat["intents"], labels, chat["by_intent_period"])
+        ],
+        "pg_issues": [
+            list(group) for group in rows(chat["listings"], chat["intents"], chat["by_listing_intent"])
+        ],
+    }
+
+
+# ——— Comparison with the category ———
+
+COMPARE_SQL = '''
+    SELECT l.name, l.category, COALESCE(r.n, 0), COALESCE(r.rating_sum, 0),
+           c.listings, c.n, c.rating_sum
+    FROM listings l
+    LEFT JOIN listing_ratings r ON r.listing = l.name
+    JOIN category_ratings c ON c.category = l.category
+    WHERE l.user_id = ?
+'''
+
+def compare(conn, user_id):
+    """
+    An owner's listings against the average of every listing in the same
+    category, best first. Category totals come from the category_ratings
+    rollup (common/listing_query.py), so no other owner's rows are read.
+    """
+    rows = []
+    for name, category, n, rating_sum, listings, category_n, category_sum in _rows(
+            conn, COMPARE_SQL, (user_id,)):
+        avg = rating_sum / n if n else None
+        category_avg = category_sum / category_n if category_n else None
+        rows.append({
+            "listing": name, "category": category, "n": n, "avg": avg,
+            "category_avg": category_avg,
+            "delta": avg - category_avg if avg is not None and category_avg is not None else None,
+            # reviews relative to the category's average listing (1.0 = typical)
+            "volume": n / (category_n / listings) if category_n and listings else 0.0,
+        })
+    # best delta first, then most reviewed; listings without reviews last
+    rows.sort(key=lambda r: (r["delta"] is None, -(r["delta"] or 0), -r["n"]))
+    return [
+        {"rank": rank, **{k: round(v, 2) if isinstance(v, float) else v for k, v in row.items()}}
+        for rank, row in enumerate(rows, 1)
+    ]
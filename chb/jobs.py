@@ -0,0 +1,178 @@
+"""
+Background jobs for the slow analytics work (PDF reports).
+
+Jobs run in a local process pool, so request handlers return immediately.
+State lives in a small SQLite table that both the web process and the
+pool workers update; no external broker is needed.
+
+A job is identified by a dedupe key describing its exact input. Enqueuing
+a key that is already pending or running returns the existing job, and a
+finished job whose result file still exists is reused as is.
+
+A worker that dies (killed, out of memory, or failing to import) breaks
+the whole pool: its jobs are marked failed and the next enqueue starts a
+fresh pool, so one crash doesn't fail every later export.
+"""
+import os
+import time
+import uuid
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from reports import generate_pdf_report
+from common import config, db, metrics
+
+JOBS_DB = config.JOBS_DB
+JOB_WORKERS = int(os.environ.get('CHB_JOB_WORKERS', 2))
+# A pending/running job older than this is assumed lost (e.g. the web
+# process restarted) and no longer blocks a fresh submission.
+JOB_TIMEOUT = 300
+
+TASKS = {
+    "report": generate_pdf_report,
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_jobs_db_connection():
+    return db.get_connection(JOBS_DB)
+
+
+def init_jobs_db():
+    with get_jobs_db_connection() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                dedupe_key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key, status)"
+        )
+
+
+def _set_status(job_id, status, result=None, error=None):
+    conn = get_jobs_db_connection()
+    with conn:
+        conn.execute(
+            "UPDATE jobs SET status=?, result=COALESCE(?, result), error=?, updated_at=? WHERE id=?",
+            (status, result, error, time.time(), job_id)
+        )
+    conn.close()
+
+
+def _run(job_id, kind, args):
+    # Executed inside a pool worker process
+    _set_status(job_id, 'running')
+    started = time.perf_counter()
+    try:
+        with metrics.capture() as stages:
+            result = TASKS[kind](*args)
+    except Exception as e:
+        _set_status(job_id, 'failed', error=repr(e))
+        raise
+    _set_status(job_id, 'done', result=result)
+    # Timings travel back with the result: /metrics is served by the web process
+    return result, time.perf_counter() - started, stages
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: workers must not inherit the web server's threads/locks
+            ctx = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=ctx)
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def _drop_pool(pool):
+    """Forget a broken pool; it has already stopped its own workers."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def _submit(job_id, kind, args):
+    """(pool, future) of the submitted job, or (None, None) if it failed."""
+    # A pool found broken here may just not have been noticed yet (no job
+    # finished since its worker died), so one fresh pool is tried
+    for _ in range(2):
+        pool = _get_pool()
+        try:
+            return pool, pool.submit(_run, job_id, kind, args)
+        except BrokenProcessPool as e:
+            _drop_pool(pool)
+            error = e
+    _set_status(job_id, 'failed', error=repr(error))
+    return None, None
+
+
+def enqueue(user_id, kind, dedupe_key, *args):
+    """Return the id of a job producing dedupe_key, submitting one if needed."""
+    now = time.time()
+    conn = get_jobs_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        existing = conn.execute('''
+            SELECT id, status, result, updated_at FROM jobs
+            WHERE dedupe_key = ? AND status IN ('pending', 'running', 'done')
+            ORDER BY created_at DESC LIMIT 1
+        ''', (dedupe_key,)).fetchone()
+        if existing:
+            if existing['status'] == 'done' and existing['result'] and os.path.exists(existing['result']):
+                conn.commit()
+                return existing['id']
+            if existing['status'] != 'done' and now - existing['updated_at'] < JOB_TIMEOUT:
+                conn.commit()
+                return existing['id']
+
+        job_id = uuid.uuid4().hex
+        conn.execute('''
+            INSERT INTO jobs (id, user_id, kind, dedupe_key, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 'pending', ?, ?)
+        ''', (job_id, user_id, kind, dedupe_key, now, now))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    pool, future = _submit(job_id, kind, args)
+    if future is None:
+        return job_id
+
+    def _on_done(fut):
+        # Covers workers that died before they could record the failure
+        exc = fut.exception()
+        if exc is not None:
+            if isinstance(exc, BrokenProcessPool):
+                _drop_pool(pool)
+            _set_status(job_id, 'failed', error=repr(exc))
+        else:
+            _, seconds, stages = fut.result()
+            metrics.observe_job(kind, seconds, stages)
+    future.add_done_callback(_on_done)
+    return job_id
+
+
+def get_job(job_id):
+    conn = get_jobs_db_connection()
+    job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    conn.close()
+    return job
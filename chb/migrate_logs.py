@@ -0,0 +1,97 @@
+"""
+One-shot import of the legacy flat-file logs into listings.db.
+
+    python migrate_logs.py [LOG_DIR]
+
+Loads reviews.txt and every <Listing>.txt chat log found in LOG_DIR
+(defaults to the current directory) into the reviews and chat_events
+tables. Everything is inserted with batched executemany inside a single
+transaction, so a failed run leaves the database untouched. Imported file
+names are recorded in imported_logs and skipped on later runs.
+"""
+import os
+import sys
+
+from app import get_listings_db_connection
+
+BATCH_SIZE = 5000
+
+
+def parse_review_file(path):
+    # Listing Name | Review Text | X Stars | Timestamp
+    # separated by lines of dashes, which have no "|" and are skipped.
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = [p.strip() for p in line.strip().split("|")]
+            if len(parts) == 3:
+                yield parts[0], parts[1], parts[2], ""
+            elif len(parts) >= 4:
+                # review text may itself contain "|"
+                yield parts[0], " | ".join(parts[1:-2]), parts[-2], parts[-1]
+
+
+def parse_chat_file(path):
+    # Listing| YYYY-MM-DD | intent
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = [p.strip() for p in line.strip().split("|")]
+            if len(parts) == 3:
+                yield tuple(parts)
+
+
+def insert_batched(conn, sql, rows):
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany(sql, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+        total += len(batch)
+    return total
+
+
+def migrate(log_dir):
+    conn = get_listings_db_connection()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS imported_logs (
+            fname TEXT PRIMARY KEY,
+            rows INTEGER NOT NULL
+        )
+    ''')
+    conn.commit()
+    done = {r['fname'] for r in conn.execute("SELECT fname FROM imported_logs")}
+
+    try:
+        conn.execute("BEGIN")
+        for fname in sorted(os.listdir(log_dir)):
+            if not fname.endswith(".txt") or fname in done:
+                continue
+            path = os.path.join(log_dir, fname)
+            if fname == "reviews.txt":
+                n = insert_batched(
+                    conn,
+                    "INSERT INTO reviews (listing, review, rating, created_at) VALUES (?, ?, ?, ?)",
+                    parse_review_file(path)
+                )
+            else:
+                n = insert_batched(
+                    conn,
+                    "INSERT INTO chat_events (listing, created_at, intent) VALUES (?, ?, ?)",
+                    parse_chat_file(path)
+                )
+            conn.execute("INSERT INTO imported_logs (fname, rows) VALUES (?, ?)", (fname, n))
+            print(f"{fname}: {n} rows")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    migrate(sys.argv[1] if len(sys.argv) > 1 else ".")
@@ -0,0 +1,196 @@
+"""
+PDF review-log reports, written by chb's background jobs (jobs.py).
+
+Rows are streamed from listings.db into StreamingPDF, a minimal PDF
+writer that puts each page into the file as soon as it is full, so the
+review history is never held in memory. Its limits, by design:
+
+- Memory is flat per row but not per page. The writer keeps two object
+  offsets and one page id for every page until the xref table and page
+  tree are written at the end. That is about 190 bytes per page (25 rows),
+  measured by bench/bench_report.py as 0.05 MB peak at 1k rows, 0.7 MB at
+  100k and 7.5 MB at 1M.
+- Text is reduced to latin-1. Only the standard Helvetica fonts are used
+  and no font is embedded, so any character outside latin-1 (Devanagari,
+  CJK, emoji, curly quotes) is printed as "?" by safe_text.
+- Layout is approximate. Nothing is measured with font metrics: the title
+  is centred assuming 0.55 em per character, and the PG and Review columns
+  are cut to a number of characters, not to the cell width, so a long
+  title is off centre and wide text can run past its cell.
+"""
+import os
+import sqlite3
+import hashlib
+
+from common import config, metrics, periods
+
+# Reports are cached per user and data version:
+# <output>/reports/<user>/report-<key>.pdf (output: config.CHB_OUTPUT_DIR)
+REPORT_DIR = os.path.join(config.CHB_OUTPUT_DIR, 'reports')
+REPORT_VERSION = 3  # bump when the report layout changes
+
+MM = 72 / 25.4                       # points per millimetre
+PAGE_W, PAGE_H = 210 * MM, 297 * MM  # A4
+MARGIN = 10 * MM
+BOTTOM = PAGE_H - 20 * MM            # leave room like FPDF's auto page break
+ROW_H = 10 * MM
+COLUMNS = [("PG", 30, 28), ("Review", 100, 70), ("Rating", 30, None), ("Type", 30, None)]
+
+
+def safe_text(text):
+    """text as latin-1, the only characters the built-in fonts have; others become "?"."""
+    return str(text).encode("latin-1", "replace").decode("latin-1")
+
+
+def report_key(user_pgs, data_version, window=None):
+    """Cache key for a user's report; data_version changes with the reviews."""
+    payload = repr((REPORT_VERSION, sorted(user_pgs), data_version, window))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def report_path(user_id, key):
+    return os.path.join(REPORT_DIR, str(user_id), f"report-{key}.pdf")
+
+
+def iter_report_rows(conn, user_pgs, window=None):
+    """
+    Yield (pg, review, rating, type) straight off the cursor, grouped per
+    listing in order of each listing's first review, without ever holding
+    the whole review history in memory. window is an inclusive (first,
+    last) day range, or None for the whole history.
+    """
+    pgs = list(user_pgs)
+    marks = ",".join("?" * len(pgs))
+    days, params = periods.day_range("day", window)
+    cur = conn.execute(f'''
+        SELECT l.pg, r.review, r.rating, l.type
+        FROM (SELECT * FROM review_labels WHERE pg IN ({marks}){days}) l
+        JOIN reviews r ON r.id = l.review_id
+        JOIN (SELECT pg, MIN(review_id) AS first_id FROM review_labels
+              WHERE pg IN ({marks}){days} GROUP BY pg) f ON f.pg = l.pg
+        ORDER BY f.first_id, l.review_id
+    ''', pgs + params + pgs + params)
+    for row in cur:
+        yield tuple(row)
+
+
+# ——— Streaming PDF writer ———
+# FPDF keeps every page in memory until output(). This writer flushes each
+# page to the file as soon as it is full and only remembers object offsets,
+# so memory grows with the page count only (see the limits above).
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class StreamingPDF:
+    CATALOG, PAGES, FONT, FONT_BOLD = 1, 2, 3, 4
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = [None] * 4
+        self.page_ids = []
+        self.ops = []
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _obj(self, num, body):
+        self.offsets[num - 1] = self.f.tell()
+        self.f.write(f"{num} 0 obj\n".encode('latin-1'))
+        self.f.write(body)
+        self.f.write(b"\nendobj\n")
+
+    def _new_id(self):
+        self.offsets.append(None)
+        return len(self.offsets)
+
+    def title(self, top, h, size, s):
+        # Helvetica-Bold averages roughly 0.55em per character
+        x = (PAGE_W - len(s) * size * 0.55) / 2
+        self.ops.append(f"BT /F2 {size} Tf {x:.2f} {PAGE_H - top - h / 2 - size * 0.3:.2f} Td "
+                        f"({_escape(s)}) Tj ET")
+
+    def cell(self, x, top, w, h, s, size, bold=False):
+        self.ops.append(f"{x:.2f} {PAGE_H - top - h:.2f} {w:.2f} {h:.2f} re S")
+        self.ops.append(f"BT /{'F2' if bold else 'F1'} {size} Tf "
+                        f"{x + MM:.2f} {PAGE_H - top - h / 2 - size * 0.3:.2f} Td "
+                        f"({_escape(s)}) Tj ET")
+
+    def end_page(self):
+        data = "\n".join(self.ops).encode('latin-1')
+        self.ops = []
+        content_id = self._new_id()
+        self._obj(content_id,
+                  f"<< /Length {len(data)} >>\nstream\n".encode('latin-1') + data + b"\nendstream")
+        page_id = self._new_id()
+        self._obj(page_id, (
+            f"<< /Type /Page /Parent {self.PAGES} 0 R "
+            f"/MediaBox [0 0 {PAGE_W:.2f} {PAGE_H:.2f}] "
+            f"/Resources << /Font << /F1 {self.FONT} 0 R /F2 {self.FONT_BOLD} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>"
+        ).encode('latin-1'))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        if self.ops or not self.page_ids:
+            self.end_page()
+        kids = " ".join(f"{p} 0 R" for p in self.page_ids)
+        self._obj(self.PAGES,
+                  f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode('latin-1'))
+        self._obj(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode('latin-1'))
+        for num, base in ((self.FONT, "Helvetica"), (self.FONT_BOLD, "Helvetica-Bold")):
+            self._obj(num, (f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} "
+                            f"/Encoding /WinAnsiEncoding >>").encode('latin-1'))
+
+        xref = self.f.tell()
+        self.f.write(f"xref\n0 {len(self.offsets) + 1}\n0000000000 65535 f \n".encode('latin-1'))
+        for off in self.offsets:
+            self.f.write(f"{off:010d} 00000 n \n".encode('latin-1'))
+        self.f.write((f"trailer\n<< /Size {len(self.offsets) + 1} /Root {self.CATALOG} 0 R >>\n"
+                      f"startxref\n{xref}\n%%EOF\n").encode('latin-1'))
+
+
+def _table_header(pdf, top):
+    x = MARGIN
+    for title, width, _ in COLUMNS:
+        pdf.cell(x, top, width * MM, ROW_H, title, 12, bold=True)
+        x += width * MM
+    return top + ROW_H
+
+
+def write_pdf_report(rows, f, title="Analytics Report"):
+    """Write the review log report for an iterable of rows to a binary file."""
+    pdf = StreamingPDF(f)
+    pdf.title(MARGIN, ROW_H, 16, title)
+    top = _table_header(pdf, MARGIN + ROW_H)
+
+    for row in rows:
+        if top + ROW_H > BOTTOM:
+            pdf.end_page()
+            # Repeat the column headings on every page
+            top = _table_header(pdf, MARGIN)
+        x = MARGIN
+        for value, (_, width, limit) in zip(row, COLUMNS):
+            text = safe_text(value)
+            pdf.cell(x, top, width * MM, ROW_H, text[:limit] if limit else text, 10)
+            x += width * MM
+        top += ROW_H
+
+    pdf.close()
+
+
+def generate_pdf_report(listings_db, user_pgs, path, window=None):
+    """Background job: stream a user's review log from the DB into a PDF."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    title = "Analytics Report"
+    span = periods.window_args(window)
+    if span:
+        title += " (" + ", ".join(f"{k} {v}" for k, v in span.items()) + ")"
+    conn = sqlite3.connect(listings_db)
+    try:
+        with open(tmp, "wb") as f, metrics.span("pdf"):
+            write_pdf_report(iter_report_rows(conn, user_pgs, window), f, title)
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,130 @@
+"""
+Maintenance for the analytics rollup tables (chat_daily, review_daily and
+their month partitions chat_monthly, review_monthly).
+
+    python rollups.py rebuild           # recompute the rollups from the raw tables
+    python rollups.py check             # compare the rollups with a full rescan
+    python rollups.py compact [MONTHS]  # keep MONTHS months daily (default 12)
+
+chat_daily is kept current by triggers on chat_events and review_daily by
+update_review_stats (plus a trigger for deleted reviews), so neither
+rebuild nor check is needed in normal operation.
+Use rebuild after bulk edits done outside the apps, and check to verify
+nothing has drifted. check exits with status 1 if any row differs.
+
+compact folds the daily rows of every month older than the last MONTHS
+into one row per listing and month (see common/periods.py), so analytics
+over long histories read a few rows per month instead of one per day.
+Run it from cron, say monthly; it only ever moves the horizon forward.
+The raw chat_events and reviews rows are kept.
+"""
+import sys
+from collections import Counter, defaultdict
+
+from app import (
+    get_listings_db_connection, compact_review_stats,
+    rebuild_review_stats, update_review_stats
+)
+from sentiment import classify_review
+from common import periods
+
+KEEP_MONTHS = 12
+
+
+def rebuild():
+    conn = get_listings_db_connection()
+    with conn:
+        periods.rebuild_chat(conn)
+    conn.close()
+    rebuild_review_stats()
+
+
+def compact(months=KEEP_MONTHS):
+    # Classify pending reviews first so they are folded in with the rest
+    update_review_stats()
+    horizon = periods.month_start(months)
+    conn = get_listings_db_connection()
+    try:
+        # IMMEDIATE: no writer may route a row by the old horizon meanwhile
+        conn.execute("BEGIN IMMEDIATE")
+        current = periods.horizon(conn)
+        if horizon > current:
+            periods.compact_chat(conn, horizon)
+            compact_review_stats(conn, horizon)
+            periods.set_horizon(conn, horizon)
+            current = horizon
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    print(f"daily rows kept from {current}")
+
+
+def _diff(name, expected, actual):
+    problems = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key) != actual.get(key):
+            problems.append(f"{name} {key}: rollup={actual.get(key)} rescan={expected.get(key)}")
+    return problems
+
+
+def check():
+    update_review_stats()
+    conn = get_listings_db_connection()
+    # Days before the horizon are compared by month
+    horizon = periods.horizon(conn)
+
+    chat_rescan = Counter()
+    for r in conn.execute('''
+        SELECT listing, created_at, intent, COUNT(*) AS n
+        FROM chat_events GROUP BY listing, created_at, intent
+    '''):
+        chat_rescan[(r['listing'], periods.bucket(r['created_at'], horizon), r['intent'])] += r['n']
+    chat_rollup = {
+        (r['listing'], r['day'], r['intent']): r['n']
+        for r in conn.execute(
+            "SELECT listing, day, intent, n FROM chat_daily "
+            "UNION ALL SELECT listing, month, intent, n FROM chat_monthly"
+        )
+    }
+
+    review_rescan = defaultdict(Counter)
+    for r in conn.execute("SELECT listing, review, rating, created_at FROM reviews"):
+        val, bucket, sentiment = classify_review(r['review'], r['rating'])
+        key = (r['listing'], periods.bucket(r['created_at'][:10], horizon), bucket)
+        review_rescan[key]['n'] += 1
+        review_rescan[key]['rating_sum'] += val
+        review_rescan[key]['sarcastic'] += int(sentiment == "Sarcastically Negative")
+    review_rescan = {
+        k: (c['n'], c['rating_sum'], c['sarcastic']) for k, c in review_rescan.items()
+    }
+    review_rollup = {
+        (r['listing'], r['day'], r['sentiment']): (r['n'], r['rating_sum'], r['sarcastic'])
+        for r in conn.execute(
+            "SELECT listing, day, sentiment, n, rating_sum, sarcastic FROM review_daily "
+            "UNION ALL SELECT listing, month, sentiment, n, rating_sum, sarcastic FROM review_monthly"
+        )
+    }
+    conn.close()
+
+    problems = _diff("chat_daily", dict(chat_rescan), chat_rollup)
+    problems += _diff("review_daily", review_rescan, review_rollup)
+    for p in problems:
+        print(p)
+    print(f"{len(problems)} mismatched rows")
+    return not problems
+
+
+if __name__ == '__main__':
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "rebuild":
+        rebuild()
+    elif cmd == "check":
+        sys.exit(0 if check() else 1)
+    elif cmd == "compact":
+        compact(int(sys.argv[2]) if len(sys.argv) > 2 else KEEP_MONTHS)
+    else:
+        print(__doc__)
+        sys.exit(2)
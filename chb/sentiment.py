@@ -0,0 +1,154 @@
+import re
+import numpy as np
+
+# ——— Lexicons ———
+
+positive_words = {
+    "good", "great", "excellent", "amazing", "awesome", "wonderful",
+    "clean", "friendly", "comfortable", "delicious", "perfect", "happy",
+    "helpful", "spacious", "affordable", "recommend", "fast", "satisfied",
+    "peaceful", "nice", "quiet"
+}
+
+negative_words = {
+    "bad", "worst", "dirty", "rude", "late", "expensive", "poor",
+    "horrible", "noisy", "uncomfortable", "slow", "broken", "crowded",
+    "terrible", "disappointed", "not good", "problem", "issue", "hate"
+}
+
+sarcasm_indicators = frozenset({
+    "great", "amazing", "awesome", "loved", "best", "fantastic", "incredible",
+    "brilliant", "spectacular", "marvelous", "phenomenal", "stunning", "mind-blowing",
+    "impressive", "wonderful", "terrific", "fabulous", "superb"
+})
+
+# Not the same list as negative_words above: these are whole-word matches
+# that, next to a gushing word, suggest the praise is sarcastic.
+sarcasm_negative_words = frozenset({
+    "worst", "bad", "terrible", "awful", "hate", "poor", "horrible", "sucks",
+    "dreadful", "abysmal", "lousy", "disappointing", "pathetic", "subpar"
+})
+
+sarcastic_phrases = [
+    "oh great", "just perfect", "yeah right", "exactly what i wanted",
+    "fantastic... not", "well isn't that nice", "what a joy", "wonderful experience... not",
+    "i just love waiting", "oh, joy", "perfect timing", "exactly what i expected",
+    "not impressed", "no kidding", "obviously", "clearly", "incredible, really", "amazing, isn't it",
+    "so hilarious", "how convenient", "excellent, as always"
+]
+
+additional_sarcasm = [
+    "oh, absolutely!", "how thoughtful!", "well, isn't that special!", "wow, groundbreaking!",
+    "oh, you don't say!", "bravo, well done!", "how original!", "a true masterpiece!",
+    "clearly the best!", "oh, just perfect!", "what a surprise!", "outstanding effort!",
+    "really impressive!", "oh, that's rich!", "truly state-of-the-art!", "wonderful choice!",
+    "oh, this is fine!", "remarkably consistent!", "simply flawless!", "my favorite part!"
+]
+
+# ——— Precompiled lexicons ———
+# Built once at import instead of on every call. Sentiment counts how many
+# *distinct* lexicon words occur anywhere in the text as substrings, so
+# overlapping entries ("not good" / "good") each count.
+#
+# For batches, every lexicon entry is located with one C-level str.find
+# scan over the whole newline-joined batch and the hit offsets are mapped
+# back to rows with numpy. A single alternation regex (plain or
+# trie-factored) was measured 2-3x slower than this under CPython's re
+# engine, and an Aho-Corasick module would be a new native dependency.
+
+VOCAB = sorted(positive_words | negative_words)
+_POS_MASK = np.array([w in positive_words for w in VOCAB])
+_NEG_MASK = np.array([w in negative_words for w in VOCAB])
+_PHRASES = tuple(sarcastic_phrases + additional_sarcasm)
+# Ratings are stored as "<n> Stars" (chs, admin filters, migrate_logs);
+# older logs wrote "<n>/5". The whole number is read (a single digit would
+# take "10 Stars" as 0) and capped at MAX_RATING.
+_RATING_RE = re.compile(r"(?<!\d)(\d+)\s*(?:/\s*5\b|stars?\b)", re.IGNORECASE)
+MAX_RATING = 5
+
+LABELS = np.array(["Neutral", "Positive", "Negative"])
+
+
+def detect_sarcasm(review):
+    """
+    Detects sarcasm using:
+    - overlap of strongly positive and negative words (contradiction)
+    - presence of sarcastic phrases
+    - known sarcastic expressions
+    """
+    review_lower = review.lower()
+    words = review_lower.split()
+
+    indicator_negative_overlap = (
+        not sarcasm_indicators.isdisjoint(words) and not sarcasm_negative_words.isdisjoint(words)
+    )
+    return indicator_negative_overlap or any(p in review_lower for p in _PHRASES)
+
+
+def parse_rating(rating):
+    m = _RATING_RE.search(rating)
+    return min(int(m.group(1)), MAX_RATING) if m else 0
+
+
+def _rows_containing(needle, joined, starts):
+    """Row index of every occurrence of needle in the joined batch."""
+    found = []
+    find = joined.find
+    i = find(needle)
+    while i != -1:
+        found.append(i)
+        i = find(needle, i + 1)
+    return np.searchsorted(starts, found, side='right') - 1
+
+
+def score_reviews(texts, ratings=None):
+    """
+    Score a batch of reviews in one pass.
+
+    Returns a dict of NumPy arrays, one entry per text:
+    pos / neg (distinct keyword counts), bucket (Positive/Negative/Neutral),
+    sarcastic (phrase or contradiction detected), rating (parsed value, only
+    if ratings are given) and type (bucket, or "Sarcastically Negative" for
+    sarcasm on a rating of 2 or less, again only if ratings are given).
+    """
+    n = len(texts)
+    lowered = [t.lower() for t in texts]
+    # No lexicon entry or phrase contains a newline, so no match can span
+    # two reviews; starts maps a string offset back to its row.
+    joined = "\n".join(lowered)
+    lengths = np.fromiter((len(t) + 1 for t in lowered), dtype=np.int64, count=n)
+    starts = np.cumsum(lengths) - lengths
+
+    hits = np.zeros((n, len(VOCAB)), dtype=bool)
+    for col, word in enumerate(VOCAB):
+        hits[_rows_containing(word, joined, starts), col] = True
+
+    sarcastic = np.fromiter(
+        (not sarcasm_indicators.isdisjoint(words) and not sarcasm_negative_words.isdisjoint(words)
+         for words in map(str.split, lowered)),
+        dtype=bool, count=n
+    )
+    for phrase in _PHRASES:
+        sarcastic[_rows_containing(phrase, joined, starts)] = True
+
+    pos = hits[:, _POS_MASK].sum(axis=1)
+    neg = hits[:, _NEG_MASK].sum(axis=1)
+    # 0 = Neutral, 1 = Positive, 2 = Negative
+    bucket = LABELS[(pos > neg) * 1 + (neg > pos) * 2]
+
+    result = {"pos": pos, "neg": neg, "bucket": bucket, "sarcastic": sarcastic}
+    if ratings is not None:
+        vals = np.array([parse_rating(r) for r in ratings], dtype=int)
+        result["rating"] = vals
+        result["type"] = np.where(sarcastic & (vals <= 2), "Sarcastically Negative", bucket)
+    return result
+
+
+def classify_review(txt, rating):
+    """
+    Returns (rating value, sentiment bucket, final type) for one review.
+    The bucket is what feeds the pos/neg/neu counters; the final type
+    additionally flags sarcasm on low ratings.
+    """
+    scores = score_reviews([txt], [rating])
+    return int(scores["rating"][0]), str(scores["bucket"][0]), str(scores["type"][0])
@@ -1,31 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash,jsonify
-import sqlite3, os
+from flask import (
+    Blueprint, Flask, current_app, render_template, request, redirect, url_for, session,
+    flash, jsonify
+)
+import os
+import sys
+import sqlite3
 from datetime import datetime
-import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-app = Flask(__name__)
-app.secret_key = 'your_secret_key'  # Replace with a secure secret key
-
-# File paths for databases and review storage
-USER_DB = 'users.db'
-LISTINGS_DB = r'C:\Users\Admin\Desktop\chb\listings.db'
-REVIEWS_DIR = r'C:\Users\Admin\Desktop\chb'
-CHATLOG_DIR = r"C:\Users\Admin\Desktop\chb"
-os.makedirs(CHATLOG_DIR, exist_ok=True)
+from chatlog import ChatEventLogger
+
+# common/ (shared SQLite access) lives next to the app directories
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import db, cache, config, listing_query, listings_db, metrics, search
+
+# Routes live on a blueprint so wsgi.py can mount chs next to chb and
+# admin in one process; create_app() at the bottom serves it on its own.
+bp = Blueprint('chs', __name__, template_folder='templates',
+               static_folder='static', static_url_path='/static')
+
+# Databases (reviews and chat events live in listings.db), see common/config.py
+USER_DB = config.CHS_USERS_DB
+LISTINGS_DB = config.LISTINGS_DB
 # ---------------------------
 # Database connection functions
 # ---------------------------
 def get_user_db_connection():
-    conn = sqlite3.connect(USER_DB)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db.get_connection(USER_DB)
 
 def get_listings_db_connection():
-    conn = sqlite3.connect(LISTINGS_DB)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db.get_connection(LISTINGS_DB)
 
 # ---------------------------
 # Database initialization functions
@@ -45,60 +47,69 @@ def init_user_db():
 
 def init_listings_db():
     conn = get_listings_db_connection()
-    cur = conn.cursor()
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS listings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            category TEXT NOT NULL,
-            name TEXT NOT NULL,
-            address TEXT,
-            facilities TEXT,
-            cuisine TEXT,
-            price REAL NOT NULL,
-            image TEXT
-        )
-    ''')
-    conn.commit()
+    listings_db.init(conn)
     conn.close()
 
-init_user_db()
-init_listings_db()
+@bp.record_once
+def init_databases(state):
+    init_user_db()
+    init_listings_db()
+
+# Chat events are written by a background flusher, off the request path
+chat_logger = ChatEventLogger(get_listings_db_connection)
+
+# ---------------------------
+# Listings
+# ---------------------------
+# Categories shown on the index page, in display order
+INDEX_CATEGORIES = ["Accommodations", "Gyms", "Libraries", "Meal Services"]
+
+# Listing pages and the chatbot's accommodation list are cached per
+# process and dropped as soon as any app writes listings or reviews
+# (see common/cache.py).
+listings_cache = cache.VersionedCache(maxsize=512, ttl=300)
+
+def get_accommodation_names(conn):
+    version = cache.read_versions(conn, "listings")
+    return listings_cache.get_or_build(
+        ("accommodations",), version,
+        lambda: [r['name'] for r in conn.execute("SELECT name FROM listings").fetchall()]
+    )
 
 # ---------------------------
 # Routes
 # ---------------------------
 
 # Home page: shows login and register buttons if not logged in, otherwise shows username and logout option.
-@app.route('/')
+@bp.route('/')
 def home():
-    return render_template('home.html')
+    return render_template('chs/home.html')
 
 # Registration route
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username'].strip()
         password = request.form['password']
         if not username or not password:
             flash("Please fill out all fields", "danger")
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
         conn = get_user_db_connection()
         cur = conn.cursor()
         try:
             cur.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
             conn.commit()
             flash("Registration successful, please login", "success")
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
         except sqlite3.IntegrityError:
             flash("Username already exists", "danger")
-            return redirect(url_for('register'))
+            return redirect(url_for('.register'))
         finally:
             conn.close()
-    return render_template('register.html')
+    return render_template('chs/register.html')
 
 # Login route
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username'].strip()
@@ -110,71 +121,88 @@ def login():
             session['user_id'] = user['id']
             session['username'] = user['username']
             flash("Logged in successfully", "success")
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
         else:
             flash("Invalid credentials", "danger")
-            return redirect(url_for('login'))
-    return render_template('login.html')
+            return redirect(url_for('.login'))
+    return render_template('chs/login.html')
 
 # Logout route
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash("Logged out", "success")
-    return redirect(url_for('home'))
+    return redirect(url_for('.home'))
 
-# Index page: shows all listings by category from the external listings.db
-@app.route('/index')
+# Index page: lists every category from the external listings.db
+@bp.route('/index')
 def index():
     if 'user_id' not in session:
         flash("Please login first", "warning")
-        return redirect(url_for('login'))
-    # Define the categories to display
-    categories = ["Accommodations", "Gyms", "Libraries", "Meal Services"]
-    listings_by_category = {}
+        return redirect(url_for('.login'))
+    # Listings are fetched page by page from /api/listings by the template
+    return render_template('chs/index.html', categories=INDEX_CATEGORIES)
+
+# JSON listings API: filters, sorting and keyset pagination (see common/listing_query.py)
+@bp.route('/api/listings')
+def api_listings():
+    if 'user_id' not in session:
+        return jsonify({"error": "login required"}), 401
+    key = ("api_listings", tuple(sorted(request.args.items(multi=True))))
     conn = get_listings_db_connection()
-    for cat in categories:
-        listings = conn.execute("SELECT * FROM listings WHERE category = ?", (cat,)).fetchall()
-        listings_by_category[cat] = listings
+    try:
+        # Pages carry ratings, so a new review invalidates them too
+        version = cache.read_versions(conn, "listings", "reviews")
+        body = listings_cache.get_or_build(key, version, lambda: current_app.json.dumps(
+            listing_query.query_listings(conn, request.args)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        conn.close()
+    resp = current_app.response_class(body, mimetype='application/json')
+    resp.add_etag()
+    return resp.make_conditional(request)
+
+# Full-text listing search, best match first (see common/search.py)
+@bp.route('/api/search/listings')
+def api_search_listings():
+    if 'user_id' not in session:
+        return jsonify({"error": "login required"}), 401
+    conn = get_listings_db_connection()
+    page = search.search_listings(
+        conn, request.args.get('q', ''),
+        limit=request.args.get('limit', search.DEFAULT_LIMIT, type=int),
+        category=request.args.get('category') or None
+    )
     conn.close()
-    return render_template('index.html', listings_by_category=listings_by_category)
+    return jsonify(page)
 
 # Route to handle review submission for a listing
-@app.route('/review/<int:listing_id>', methods=['POST'])
+@bp.route('/review/<int:listing_id>', methods=['POST'])
 def review(listing_id):
     if 'user_id' not in session:
         flash("Please login to submit a review", "warning")
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     review_text = request.form.get('review', '').strip()
     rating = request.form.get('rating')
     # Get the listing name
     conn = get_listings_db_connection()
     listing = conn.execute("SELECT name FROM listings WHERE id = ?", (listing_id,)).fetchone()
-    conn.close()
     listing_name = listing['name'] if listing else "Unknown"
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    # Save review in a single file in the specified format:
-    # Listing Name | Review Text | X Stars | Timestamp
-    review_line = f"{listing_name} | {review_text} | {rating} Stars | {now}\n{'-'*60}\n"
-    review_filename = os.path.join(REVIEWS_DIR, "reviews.txt")
-    with open(review_filename, 'a', encoding='utf-8') as f:
-        f.write(review_line)
+    conn.execute(
+        "INSERT INTO reviews (listing, review, rating, created_at) VALUES (?, ?, ?, ?)",
+        (listing_name, review_text, f"{rating} Stars", now)
+    )
+    conn.commit()
+    conn.close()
     flash("Review submitted", "success")
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
-# Chatbot setup
+# Chatbot setup (intents and the classifier live in intents.py)
 # ---------------------------
-intent_dict = {
-    "homesickness": ["I miss my home", "I feel lonely", "I want to go home", "I miss my family"],
-    "language_barrier": ["I don't understand the language", "I have difficulty speaking", "I struggle with communication"],
-    "financial_issues": ["I can't afford my expenses", "I need money", "I have financial problems"],
-    "academic_pressure": ["Too much homework", "I can't focus on studies", "I have exam stress"],
-    "social_integration": ["I have no friends", "I feel isolated", "I find it hard to make friends"],
-    "accommodation_problems": ["My dorm is noisy", "I need a better place to stay", "Housing is expensive"],
-    "health_concerns": ["I feel sick", "I have a fever", "I need to see a doctor"],
-    "transportation_challenges": ["Buses are always late", "I can't find transportation", "transport is bad"]
-}
-
+# intents.py (numpy and the prebuilt model) is imported by the chatbot
+# routes on first use, so other pages start without it.
 responses = {
     "homesickness": "Homesickness is common. Try joining student groups or video calling your family!",
     "language_barrier": "Learning a new language takes time. Join language exchange programs or practice with friends.",
@@ -187,43 +215,29 @@ responses = {
     "unknown": "I'm not sure about that. Can you rephrase?"
 }
 
-# Vectorizer
-all_intents = sum(intent_dict.values(), [])
-vectorizer = CountVectorizer().fit(all_intents)
-intent_vectors = vectorizer.transform(all_intents)
-
-def classify_intent(user_input):
-    user_vec = vectorizer.transform([user_input])
-    similarities = cosine_similarity(user_vec, intent_vectors).flatten()
-    if len(similarities) == 0 or max(similarities) < 0.3:
-        return "unknown"
-    best_match_idx = np.argmax(similarities)
-    matched_phrase = all_intents[best_match_idx]
-    for intent, phrases in intent_dict.items():
-        if matched_phrase in phrases:
-            return intent
-    return "unknown"
-
-
 # ---------------------------
 # Routes for chatbot
 # ---------------------------
-@app.route('/chatbot')
+@bp.route('/chatbot')
 def chatbot():
     if 'user_id' not in session:
         flash("Please login to use the chatbot", "warning")
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
 
     # Fetch all accommodation names from your listings.db
     conn = get_listings_db_connection()
-    rows = conn.execute("SELECT name FROM listings").fetchall()
+    accommodations = get_accommodation_names(conn)
     conn.close()
-    accommodations = [r['name'] for r in rows]
 
-    return render_template('chatbot.html', accommodations=accommodations)
+    return render_template('chs/chatbot.html', accommodations=accommodations)
+
+
+def log_chat_events(events):
+    """Queue (accommodation, intent) pairs; they reach the DB in one batch."""
+    chat_logger.log(events)
 
 
-@app.route('/chatbot_api', methods=['POST'])
+@bp.route('/chatbot_api', methods=['POST'])
 def chatbot_api():
     # Safely parse JSON body (defaults to {} if parsing fails)
     data = request.get_json(silent=True) or {}
@@ -247,15 +261,12 @@ def chatbot_api():
         })
 
     # Classify intent and pick a response
-    intent = classify_intent(msg)
+    from intents import classify_intent
+    with metrics.span("intent"):
+        intent = classify_intent(msg)
     reply = responses.get(intent, responses["unknown"])
 
-    # … after you classify intent …
-    today = datetime.now().strftime("%Y-%m-%d")
-    log_entry = f"{accommodation}| {today} | {intent}\n"   # <-- here
-    fname = f"{accommodation.replace(' ', '_')}.txt"
-    with open(os.path.join(CHATLOG_DIR, fname), "a", encoding="utf-8") as logf:
-        logf.write(log_entry)
+    log_chat_events([(accommodation, intent)])
 
     return jsonify({
         "response": reply,
@@ -266,5 +277,79 @@ def chatbot_api():
 
 
 
+MAX_BATCH = 10000
+
+@bp.route('/chatbot_api/batch', methods=['POST'])
+def chatbot_api_batch():
+    """
+    Classify many messages in one request, e.g. from kiosks or when
+    importing historical help-desk messages. Body:
+
+        {"accommodation": "Default PG",
+         "messages": ["I feel sick", {"message": "...", "accommodation": "..."}]}
+
+    Each message may override the top-level accommodation. Messages with
+    an accommodation are logged as chat events; empty messages are skipped.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "body must be a JSON object"}), 400
+    default_acc = data.get("accommodation") or ""
+    if not isinstance(default_acc, str):
+        return jsonify({"error": "accommodation must be a string"}), 400
+    default_acc = default_acc.strip()
+    items = data.get("messages")
+    if not isinstance(items, list):
+        return jsonify({"error": "messages must be a list"}), 400
+    if len(items) > MAX_BATCH:
+        return jsonify({"error": f"at most {MAX_BATCH} messages per batch"}), 413
+
+    msgs, accs = [], []
+    for i, item in enumerate(items):
+        if isinstance(item, dict):
+            msg, acc = item.get("message") or "", item.get("accommodation") or default_acc
+            if not isinstance(msg, str) or not isinstance(acc, str):
+                return jsonify({
+                    "error": f"messages[{i}]: message and accommodation must be strings"
+                }), 400
+        elif item is None or isinstance(item, str):
+            msg, acc = item or "", default_acc
+        else:
+            return jsonify({"error": f"messages[{i}] must be a string or an object"}), 400
+        msgs.append(msg.strip())
+        accs.append(acc.strip())
+
+    to_classify = [m for m in msgs if m]
+    from intents import classify_intents
+    with metrics.span("intent"):
+        intents = iter(classify_intents(to_classify))
+
+    results, events = [], []
+    for msg, acc in zip(msgs, accs):
+        if not msg:
+            results.append({"intent": None, "response": "Please say something so I can help!"})
+            continue
+        intent = next(intents)
+        results.append({"intent": intent, "response": responses.get(intent, responses["unknown"])})
+        if acc:
+            events.append((acc, intent))
+
+    if events:
+        log_chat_events(events)
+    return jsonify({"results": results, "logged": len(events)})
+
+
+def create_app(settings=None):
+    """chs on its own (wsgi.py mounts bp together with chb and admin)."""
+    app = Flask(__name__, static_folder=None)
+    app.secret_key = 'your_secret_key'  # Replace with a secure secret key
+    app.config.update(settings or {})
+    db.init_app(app)
+    metrics.init_app(app, 'chs')
+    app.register_blueprint(bp)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True)
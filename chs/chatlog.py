@@ -0,0 +1,158 @@
+import queue
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+# ---------------------------
+# Buffered chat-event logging
+# ---------------------------
+# Requests only put events on an in-process queue. A background thread
+# drains it and writes to chat_events in batches, either once BATCH_SIZE
+# events are waiting or FLUSH_INTERVAL seconds after the first one arrived,
+# whichever comes first. Anything still queued is written on shutdown.
+# A batch that still cannot be written after WRITE_ATTEMPTS tries, or on
+# shutdown, is dropped and counted in `dropped` like a full queue.
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0  # seconds
+FLUSH_TIMEOUT = 10.0  # seconds flush() waits at most
+MAX_QUEUE = 100000    # events waiting before new ones are dropped
+WRITE_ATTEMPTS = 10   # failed writes of one batch before it is dropped
+
+
+class ChatEventLogger:
+    def __init__(self, connect, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_queue=MAX_QUEUE):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._dropped_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flush_now = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="chat-event-logger",
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def log(self, events):
+        """Queue (listing, intent) pairs; never touches the disk."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        rows = [(listing, today, intent) for listing, intent in events]
+        if not rows:
+            return
+        if self._thread is None:
+            self.start()
+        try:
+            self.queue.put_nowait(rows)
+        except queue.Full:
+            self._count_dropped(len(rows))
+            log.warning("chat event queue full, dropped %d events", len(rows))
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        Wait until everything queued so far has been written or dropped.
+        Returns False if that took longer than timeout seconds.
+        """
+        self._flush_now.set()
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _count_dropped(self, n):
+        with self._dropped_lock:
+            self.dropped += n
+
+    def _drop(self, pending, items):
+        """Give up on a batch made of `items` queue entries."""
+        log.error("dropping %d chat events that could not be written", len(pending))
+        self._count_dropped(len(pending))
+        for _ in range(items):
+            self.queue.task_done()
+
+    def _run(self):
+        pending, items, attempts = [], 0, 0
+        deadline = None
+        while True:
+            timeout = self.flush_interval if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                rows = self.queue.get(timeout=timeout)
+                pending.extend(rows)
+                items += 1
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            due = (deadline is not None and time.monotonic() >= deadline) or \
+                (self._flush_now.is_set() and self.queue.empty())
+            # after a failed write, wait out the interval before trying again
+            backing_off = attempts and time.monotonic() < deadline
+            if pending and (stopping or not backing_off and (len(pending) >= self.batch_size or due)):
+                if self._write(pending):
+                    for _ in range(items):
+                        self.queue.task_done()
+                elif stopping:
+                    # Nothing more will be written: drop what is still queued too
+                    while True:
+                        try:
+                            pending.extend(self.queue.get_nowait())
+                        except queue.Empty:
+                            break
+                        items += 1
+                    self._drop(pending, items)
+                    return
+                else:
+                    attempts += 1
+                    if attempts < WRITE_ATTEMPTS:
+                        # Keep the batch and try again after another interval
+                        deadline = time.monotonic() + self.flush_interval
+                        continue
+                    self._drop(pending, items)
+                pending, items, attempts = [], 0, 0
+                deadline = None
+                if self.queue.empty():
+                    self._flush_now.clear()
+
+            if stopping and not pending and self.queue.empty():
+                return
+
+    def _write(self, rows):
+        try:
+            conn = self.connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO chat_events (listing, created_at, intent) VALUES (?, ?, ?)",
+                        rows
+                    )
+            finally:
+                conn.close()
+            return True
+        except Exception:
+            log.exception("failed to write %d chat events", len(rows))
+            return False
@@ -0,0 +1,293 @@
+"""
+Chatbot intent classifier.
+
+    python chs/intents.py        # publish a new model after editing intent_dict
+
+The vocabulary and phrase matrix are fitted with scikit-learn's
+CountVectorizer, but only when a model is built. Models are published to
+intent_model/ next to this file:
+
+  intent_model/CURRENT            name of the live version
+  intent_model/<version>/         one directory per version:
+    meta.json                     format, version and intent names
+    vocab.npy                     terms, UTF-8 bytes, sorted bytewise
+    indptr.npy, phrases.npy,      the phrase matrix, transposed, as CSR:
+    weights.npy                   each term's (phrase, weight) postings
+    phrase_intent.npy             intent id of each phrase
+
+The .npy files are memory-mapped read-only, never copied into the heap,
+so every worker process on a host shares one page-cache copy of the
+model. Term lookup is a binary search in vocab.npy, so no worker builds
+its own vocabulary dict either.
+
+Publishing writes a new version directory and then replaces CURRENT.
+Running workers re-read CURRENT at most every RELOAD_INTERVAL seconds and
+switch to the new model without a restart, so after editing intent_dict,
+run the command above and the workers pick it up. A model's version is a
+hash of MODEL_FORMAT and the training phrases. Only when nothing usable is
+published (no CURRENT, or a model of another format) does the first
+process to need one build and publish it. A published model whose version
+is not model_version() of this file's intent_dict is still served, but
+each process logs a warning when it loads one, so a forgotten publish
+after editing intent_dict shows up in the logs.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# ---------------------------
+# Training phrases per intent
+# ---------------------------
+intent_dict = {
+    "homesickness": ["I miss my home", "I feel lonely", "I want to go home", "I miss my family"],
+    "language_barrier": ["I don't understand the language", "I have difficulty speaking", "I struggle with communication"],
+    "financial_issues": ["I can't afford my expenses", "I need money", "I have financial problems"],
+    "academic_pressure": ["Too much homework", "I can't focus on studies", "I have exam stress"],
+    "social_integration": ["I have no friends", "I feel isolated", "I find it hard to make friends"],
+    "accommodation_problems": ["My dorm is noisy", "I need a better place to stay", "Housing is expensive"],
+    "health_concerns": ["I feel sick", "I have a fever", "I need to see a doctor"],
+    "transportation_challenges": ["Buses are always late", "I can't find transportation", "transport is bad"]
+}
+
+# ---------------------------
+# Intent index
+# ---------------------------
+# Every training phrase is one L2-normalised bag-of-words row, and
+# phrase_intent maps each row to its intent id. Cosine similarity against
+# all phrases is a sparse dot product that only reads the postings of the
+# message's own terms, and the best phrase per intent is a max-pool over
+# that intent's rows. Mapping rows to intent ids also means a phrase
+# listed under two intents can no longer be attributed to the wrong one.
+SIMILARITY_THRESHOLD = 0.3
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intent_model')
+MODEL_FORMAT = 2  # bump when the artifact's layout or the tokenizer changes
+ARRAYS = ("vocab", "indptr", "phrases", "weights", "phrase_intent")
+RELOAD_INTERVAL = 5.0  # seconds between checks of CURRENT
+
+# CountVectorizer's default analyzer: lowercase, then words of 2+ characters
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+all_intents = sum(intent_dict.values(), [])
+
+
+def analyze(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def model_version(phrases_by_intent=intent_dict):
+    payload = json.dumps([MODEL_FORMAT, _TOKEN_RE.pattern, phrases_by_intent])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+# ---------------------------
+# Building and publishing
+# ---------------------------
+
+def build_model(phrases_by_intent=intent_dict):
+    """Fit the vocabulary and phrase matrix (needs scikit-learn)."""
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.preprocessing import normalize
+
+    names = [name for name, phrases in phrases_by_intent.items() if phrases]
+    phrases = [p for name in names for p in phrases_by_intent[name]]
+    vectorizer = CountVectorizer().fit(phrases)
+    analyzer = vectorizer.build_analyzer()
+    if any(analyzer(p) != analyze(p) for p in phrases):
+        raise RuntimeError("analyze() no longer matches CountVectorizer's analyzer")
+
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    vocab = np.array([t.encode('utf-8') for t in terms])
+    order = np.argsort(vocab, kind='stable')
+    by_term = normalize(vectorizer.transform(phrases)).T.tocsr()[order]
+    by_term.sort_indices()
+    meta = {"format": MODEL_FORMAT, "version": model_version(phrases_by_intent), "intents": names}
+    return meta, {
+        "vocab": vocab[order],
+        "indptr": by_term.indptr.astype(np.int64),
+        "phrases": by_term.indices.astype(np.int32),
+        "weights": by_term.data.astype(np.float64),
+        "phrase_intent": np.repeat(np.arange(len(names), dtype=np.int32),
+                                   [len(phrases_by_intent[n]) for n in names]),
+    }
+
+
+def _write_text(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def published_version(root=None):
+    root = root or MODEL_DIR
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def publish(meta, arrays, root=None, keep=2):
+    """Write a model version and make it CURRENT; returns its directory."""
+    root = root or MODEL_DIR
+    os.makedirs(root, exist_ok=True)
+    final = os.path.join(root, meta["version"])
+    if not os.path.isdir(final):
+        tmp = os.path.join(root, f".tmp-{os.getpid()}-{threading.get_ident()}")
+        os.makedirs(tmp)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp, f"{name}.npy"), arrays[name])
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp, final)
+        except OSError:
+            # Another process published the same version first
+            shutil.rmtree(tmp, ignore_errors=True)
+    _write_text(os.path.join(root, "CURRENT"), meta["version"] + "\n")
+
+    # Older versions may still be mapped by workers that have not reloaded
+    # yet; they are kept until they fall `keep` versions behind.
+    versions = sorted((d for d in os.listdir(root)
+                       if d != meta["version"] and os.path.isfile(os.path.join(root, d, "meta.json"))),
+                      key=lambda d: os.path.getmtime(os.path.join(root, d)), reverse=True)
+    for old in versions[keep - 1:]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return final
+
+
+# ---------------------------
+# Loading and scoring
+# ---------------------------
+
+class IntentModel:
+    """One published model version, memory-mapped from its directory."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != MODEL_FORMAT:
+            raise ValueError(f"{path}: model format {meta.get('format')}, expected {MODEL_FORMAT}")
+        self.version = meta["version"]
+        for name in ARRAYS:
+            # A plain ndarray view of the map: same shared pages, without
+            # np.memmap's per-indexing overhead
+            mapped = np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+            setattr(self, name, mapped.view(np.ndarray))
+        self.n_phrases = len(self.phrase_intent)
+        self.intents = meta["intents"]
+
+    def columns(self, tokens):
+        """Vocabulary column of each token, -1 if unknown."""
+        cols = np.full(len(tokens), -1, dtype=np.int64)
+        width = self.vocab.dtype.itemsize
+        keys = [t.encode('utf-8') for t in tokens]
+        fits = np.array([len(k) <= width for k in keys], dtype=bool)
+        if len(self.vocab) and fits.any():
+            wanted = np.array([k for k, ok in zip(keys, fits) if ok], dtype=self.vocab.dtype)
+            pos = np.minimum(np.searchsorted(self.vocab, wanted), len(self.vocab) - 1)
+            cols[fits] = np.where(self.vocab[pos] == wanted, pos, -1)
+        return cols
+
+    def intent_scores(self, messages):
+        """(len(messages) x intents) best phrase similarity per intent."""
+        # Bag-of-words counts per (message, token)
+        counts = {}
+        for i, text in enumerate(messages):
+            for token in analyze(text):
+                counts[i, token] = counts.get((i, token), 0) + 1
+        tokens = list({token for _, token in counts})
+        column = dict(zip(tokens, self.columns(tokens).tolist()))
+        triples = [(i, column[token], n) for (i, token), n in counts.items() if column[token] >= 0]
+        msg, col, n = (np.array(v, dtype=np.int64) for v in zip(*triples)) if triples else \
+            (np.zeros(0, dtype=np.int64),) * 3
+        # L2-normalised per message
+        norms = np.sqrt(np.bincount(msg, weights=n * n, minlength=len(messages)))
+        weights = n / norms[msg]
+
+        # Gather every posting of every (message, term) pair; only phrases
+        # sharing a term with a message get a (message, phrase) entry
+        starts = self.indptr[col]
+        lengths = self.indptr[col + 1] - starts
+        total = int(lengths.sum())
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+        keys = np.repeat(msg, lengths) * self.n_phrases + self.phrases[offsets]
+        pairs, which = np.unique(keys, return_inverse=True)
+        sims = np.bincount(which, weights=self.weights[offsets] * np.repeat(weights, lengths))
+        scores = np.zeros((len(messages), len(self.intents)))
+        np.maximum.at(scores, (pairs // self.n_phrases, self.phrase_intent[pairs % self.n_phrases]), sims)
+        return scores
+
+    def classify(self, messages):
+        scores = self.intent_scores(messages)
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(best)), best]
+        return [self.intents[b] if score >= SIMILARITY_THRESHOLD else "unknown"
+                for b, score in zip(best, best_scores)]
+
+
+_model = None
+_checked = 0.0
+_model_lock = threading.Lock()
+
+
+def _load_published(root):
+    version = published_version(root)
+    if version:
+        try:
+            model = IntentModel(os.path.join(root, version))
+        except (OSError, KeyError, ValueError):
+            return None
+        expected = model_version()
+        if model.version != expected:
+            log.warning("intent model %s in %s was not built from this intent_dict (version %s); "
+                        "run `python chs/intents.py` to publish it", model.version, root, expected)
+        return model
+    return None
+
+
+def current_model():
+    """The live model, reloaded when CURRENT names a new version."""
+    global _model, _checked
+    root = MODEL_DIR
+    now = time.monotonic()
+    if _model is not None and now - _checked < RELOAD_INTERVAL:
+        return _model
+    with _model_lock:
+        if _model is not None and now - _checked < RELOAD_INTERVAL:
+            return _model
+        _checked = now
+        if _model is None:
+            model = _load_published(root)
+            if model is None:
+                publish(*build_model(), root=root)
+                model = _load_published(root)
+            _model = model
+        elif published_version(root) != _model.version:
+            _model = _load_published(root) or _model
+    return _model
+
+
+def classify_intent(user_input):
+    return current_model().classify([user_input])[0]
+
+
+def classify_intents(messages):
+    """Classify a list of messages at once: one pass over their postings."""
+    if not messages:
+        return []
+    return current_model().classify(list(messages))
+
+
+if __name__ == '__main__':
+    path = publish(*build_model())
+    print(f"published {path}")
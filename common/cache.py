@@ -0,0 +1,95 @@
+"""
+In-process caches for data derived from listings.db, invalidated by
+version counters that live in the database itself.
+
+data_version holds one counter per source table. Triggers bump it on
+every insert, update and delete, so a write from any process (chb
+add/edit/delete_listing, chs review(), admin deletes) is seen by every
+other process on its next read of the counter, one primary-key lookup.
+A cached value remembers the versions it was built from and is only
+served while they are still current; the TTL bounds how long an entry
+can sit unused, and the LRU bound caps memory.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS data_version (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO data_version (name, version) VALUES ('listings', 0), ('reviews', 0);
+'''
+
+BUMP_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS data_version_{table}_{name}
+    AFTER {event} ON {table} BEGIN
+        UPDATE data_version SET version = version + 1 WHERE name = '{table}';
+    END;
+'''
+
+
+def init_versions(conn):
+    """Create data_version and the triggers that bump it."""
+    script = SCHEMA + "".join(
+        BUMP_TRIGGER.format(table=table, event=event, name=event.lower())
+        for table in ("listings", "reviews")
+        for event in ("INSERT", "UPDATE", "DELETE")
+    )
+    conn.executescript(script)
+    conn.commit()
+
+
+def read_versions(conn, *names):
+    """Current counters for the named tables, as a tuple in that order."""
+    rows = dict(conn.execute(
+        f"SELECT name, version FROM data_version WHERE name IN ({','.join('?' * len(names))})",
+        names
+    ).fetchall())
+    return tuple(rows.get(name, 0) for name in names)
+
+
+class VersionedCache:
+    """Thread-safe LRU cache whose entries expire by TTL or version change."""
+
+    def __init__(self, maxsize=256, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()  # key -> (version, expires, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or entry[1] < self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, key, version, build):
+        value = self.get(key, version)
+        if value is None:
+            value = build()
+            self.put(key, version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
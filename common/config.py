@@ -0,0 +1,32 @@
+"""
+File locations shared by the chs, chb and admin apps.
+
+Every database and output directory is read from the environment once,
+at import, and otherwise defaults to its place in this checkout:
+
+  LISTINGS_DB     chb/listings.db   listings, reviews, chat events, rollups
+  CHS_USERS_DB    chs/users.db      student accounts
+  CHB_USERS_DB    chb/users.db      business accounts
+  JOBS_DB         chb/jobs.db       chb background job state
+  CHB_OUTPUT_DIR  chb/static        generated reports/
+
+So the apps find each other's files whatever directory they are started
+from, whether they run as three processes or mounted together in one
+(wsgi.py). Relative paths in the environment are taken relative to the
+working directory.
+"""
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _path(name, *default):
+    value = os.environ.get(name)
+    return os.path.abspath(value) if value else os.path.join(ROOT, *default)
+
+
+LISTINGS_DB = _path('LISTINGS_DB', 'chb', 'listings.db')
+CHS_USERS_DB = _path('CHS_USERS_DB', 'chs', 'users.db')
+CHB_USERS_DB = _path('CHB_USERS_DB', 'chb', 'users.db')
+JOBS_DB = _path('JOBS_DB', 'chb', 'jobs.db')
+CHB_OUTPUT_DIR = _path('CHB_OUTPUT_DIR', 'chb', 'static')
@@ -0,0 +1,157 @@
+"""
+SQLite access shared by the student (chs), business (chb) and admin apps.
+
+All three apps read and write listings.db at the same time, so every
+connection is opened in WAL mode (readers never block the writer) with a
+busy timeout instead of failing straight away with "database is locked".
+
+Connections are pooled. A thread checks out one connection per database
+file the first time it asks for it and keeps it until the Flask app
+context ends, when it goes back on the free list for the next request.
+Threads outside Flask (background flushers, scripts) simply keep theirs.
+Calling close() on a pooled connection only rolls back anything left
+uncommitted, so existing ``conn.close()`` calls stay correct.
+
+Pooled connections time their calls as the "db" stage (common/metrics.py):
+execute, the fetch methods and commit. Iterating over a cursor row by row
+is not timed, which keeps the per-row cost of large scans unchanged.
+"""
+import sqlite3
+import threading
+from collections import defaultdict
+
+from common import metrics
+
+BUSY_TIMEOUT_MS = 5000
+POOL_SIZE = 8  # idle connections kept per database file
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    # Safe with WAL: a power loss can only drop the last commits, never
+    # corrupt the file, and commits no longer wait for an fsync each.
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",  # 8 MB page cache per connection
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        with metrics.span("db"):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with metrics.span("db"):
+            return super().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        with metrics.span("db"):
+            return super().executescript(script)
+
+    def fetchone(self):
+        with metrics.span("db"):
+            return super().fetchone()
+
+    def fetchmany(self, size=None):
+        with metrics.span("db"):
+            return super().fetchmany(self.arraysize if size is None else size)
+
+    def fetchall(self):
+        with metrics.span("db"):
+            return super().fetchall()
+
+
+class PooledConnection(sqlite3.Connection):
+    # sqlite3.Connection.execute() and friends bypass cursor() in C, so
+    # they are routed through a TimedCursor here
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def commit(self):
+        with metrics.span("db"):
+            super().commit()
+
+    def close(self):
+        # Returned to the pool at the end of the request, not closed here
+        if self.in_transaction:
+            self.rollback()
+
+    def _close(self):
+        super().close()
+
+
+def connect(path, factory=sqlite3.Connection):
+    """Open a new, tuned connection that the caller owns and closes."""
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=False, factory=factory)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+_idle = defaultdict(list)
+_idle_lock = threading.Lock()
+_local = threading.local()
+
+
+def _checked_out():
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    return conns
+
+
+def get_connection(path):
+    """This thread's pooled connection to path."""
+    conns = _checked_out()
+    conn = conns.get(path)
+    if conn is None:
+        with _idle_lock:
+            conn = _idle[path].pop() if _idle[path] else None
+        if conn is None:
+            conn = connect(path, factory=PooledConnection)
+        conns[path] = conn
+    return conn
+
+
+def release_connections(exc=None):
+    """Give this thread's connections back to the pool."""
+    conns = _checked_out()
+    for path, conn in conns.items():
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn._close()
+            continue
+        with _idle_lock:
+            if len(_idle[path]) < POOL_SIZE:
+                _idle[path].append(conn)
+                continue
+        conn._close()
+    conns.clear()
+
+
+def close_all():
+    """Close every idle connection (e.g. before deleting a database file)."""
+    release_connections()
+    with _idle_lock:
+        for conns in _idle.values():
+            for conn in conns:
+                conn._close()
+        _idle.clear()
+
+
+def init_app(app):
+    app.teardown_appcontext(release_connections)
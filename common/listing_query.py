@@ -0,0 +1,311 @@
+"""
+Filtered, sorted and keyset-paginated listing queries for the JSON
+listings APIs of the student (chs) and admin apps.
+
+Query parameters (all optional):
+
+    category    repeatable; listings in any of these categories
+    min_price   inclusive lower bound on price
+    max_price   inclusive upper bound on price
+    facility    repeatable; every one must appear in ``facilities``
+    sort        id (default, insertion order), price or rating
+    order       asc (default) or desc
+    limit       page size, 1..MAX_LIMIT (default DEFAULT_LIMIT)
+    cursor      ``next_cursor`` from the previous page
+
+Pages are cut with a keyset condition on (sort key, id) instead of
+OFFSET, so page N costs the same as page 1 and rows inserted or deleted
+between requests never shift items across pages.
+
+Ratings come from listing_ratings, a per-listing (count, sum) rollup kept
+in step with the reviews table by triggers (see init_ratings).
+category_ratings sums it per category, over every listing in the category,
+so category-wide averages never need a scan of other owners' listings.
+"""
+import base64
+import binascii
+import json
+
+DEFAULT_LIMIT = 24
+MAX_LIMIT = 100
+
+# Columns index.html renders; the admin API adds the owner and cuisine
+PUBLIC_COLUMNS = ("id", "category", "name", "price", "address", "facilities", "image")
+ADMIN_COLUMNS = PUBLIC_COLUMNS + ("user_id", "cuisine")
+
+RATING = "COALESCE(r.rating_sum * 1.0 / r.n, 0)"
+SORT_KEYS = {
+    "id": "l.id",
+    "price": "l.price",
+    # Computed from the rollup, so rating pages are sorted per request;
+    # the filters above it still narrow the rows through the indexes.
+    "rating": RATING,
+}
+
+RATINGS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS listing_ratings (
+        listing TEXT PRIMARY KEY,
+        n INTEGER NOT NULL,
+        rating_sum INTEGER NOT NULL
+    );
+    -- reviews.rating is stored as "<1-5> Stars"; CAST keeps the number
+    CREATE TRIGGER IF NOT EXISTS listing_ratings_insert
+    AFTER INSERT ON reviews
+    WHEN CAST(NEW.rating AS INTEGER) BETWEEN 1 AND 5 BEGIN
+        INSERT INTO listing_ratings (listing, n, rating_sum)
+        VALUES (NEW.listing, 1, CAST(NEW.rating AS INTEGER))
+        ON CONFLICT (listing) DO UPDATE
+        SET n = n + 1, rating_sum = rating_sum + excluded.rating_sum;
+    END;
+    CREATE TRIGGER IF NOT EXISTS listing_ratings_delete
+    AFTER DELETE ON reviews
+    WHEN CAST(OLD.rating AS INTEGER) BETWEEN 1 AND 5 BEGIN
+        UPDATE listing_ratings
+        SET n = n - 1, rating_sum = rating_sum - CAST(OLD.rating AS INTEGER)
+        WHERE listing = OLD.listing;
+        DELETE FROM listing_ratings WHERE listing = OLD.listing AND n <= 0;
+    END;
+'''
+
+
+# Reviews refer to listings by name, so every listing row carrying a name
+# shares that name's ratings; {row}.listing is the listing_ratings row.
+_SHARE = ("(SELECT COUNT(*) FROM listings l WHERE l.name = {row}.listing "
+          "AND l.category = category_ratings.category)")
+_NAME_RATING = "COALESCE((SELECT {col} FROM listing_ratings WHERE listing = {row}.name), 0)"
+
+CATEGORY_SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS category_ratings (
+        category TEXT PRIMARY KEY,
+        listings INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        rating_sum INTEGER NOT NULL
+    );
+    CREATE TRIGGER IF NOT EXISTS category_ratings_rated_insert
+    AFTER INSERT ON listing_ratings BEGIN
+        UPDATE category_ratings
+        SET n = n + NEW.n * {_SHARE.format(row="NEW")},
+            rating_sum = rating_sum + NEW.rating_sum * {_SHARE.format(row="NEW")}
+        WHERE category IN (SELECT category FROM listings WHERE name = NEW.listing);
+    END;
+    CREATE TRIGGER IF NOT EXISTS category_ratings_rated_update
+    AFTER UPDATE ON listing_ratings BEGIN
+        UPDATE category_ratings
+        SET n = n + (NEW.n - OLD.n) * {_SHARE.format(row="NEW")},
+            rating_sum = rating_sum + (NEW.rating_sum - OLD.rating_sum) * {_SHARE.format(row="NEW")}
+        WHERE category IN (SELECT category FROM listings WHERE name = NEW.listing);
+    END;
+    CREATE TRIGGER IF NOT EXISTS category_ratings_rated_delete
+    AFTER DELETE ON listing_ratings BEGIN
+        UPDATE category_ratings
+        SET n = n - OLD.n * {_SHARE.format(row="OLD")},
+            rating_sum = rating_sum - OLD.rating_sum * {_SHARE.format(row="OLD")}
+        WHERE category IN (SELECT category FROM listings WHERE name = OLD.listing);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS category_ratings_listing_insert
+    AFTER INSERT ON listings BEGIN
+        INSERT INTO category_ratings (category, listings, n, rating_sum)
+        SELECT NEW.category, 1, {_NAME_RATING.format(col="n", row="NEW")},
+               {_NAME_RATING.format(col="rating_sum", row="NEW")}
+        WHERE true
+        ON CONFLICT (category) DO UPDATE
+        SET listings = listings + 1, n = n + excluded.n, rating_sum = rating_sum + excluded.rating_sum;
+    END;
+    CREATE TRIGGER IF NOT EXISTS category_ratings_listing_delete
+    AFTER DELETE ON listings BEGIN
+        UPDATE category_ratings
+        SET listings = listings - 1,
+            n = n - {_NAME_RATING.format(col="n", row="OLD")},
+            rating_sum = rating_sum - {_NAME_RATING.format(col="rating_sum", row="OLD")}
+        WHERE category = OLD.category;
+        DELETE FROM category_ratings WHERE category = OLD.category AND listings <= 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS category_ratings_listing_update
+    AFTER UPDATE OF name, category ON listings BEGIN
+        UPDATE category_ratings
+        SET listings = listings - 1,
+            n = n - {_NAME_RATING.format(col="n", row="OLD")},
+            rating_sum = rating_sum - {_NAME_RATING.format(col="rating_sum", row="OLD")}
+        WHERE category = OLD.category;
+        DELETE FROM category_ratings WHERE category = OLD.category AND listings <= 0;
+        INSERT INTO category_ratings (category, listings, n, rating_sum)
+        SELECT NEW.category, 1, {_NAME_RATING.format(col="n", row="NEW")},
+               {_NAME_RATING.format(col="rating_sum", row="NEW")}
+        WHERE true
+        ON CONFLICT (category) DO UPDATE
+        SET listings = listings + 1, n = n + excluded.n, rating_sum = rating_sum + excluded.rating_sum;
+    END;
+'''
+
+CATEGORY_RESCAN = '''
+    SELECT l.category, COUNT(*), COALESCE(SUM(r.n), 0), COALESCE(SUM(r.rating_sum), 0)
+    FROM listings l LEFT JOIN listing_ratings r ON r.listing = l.name
+    GROUP BY l.category
+'''
+
+
+def init_ratings(conn):
+    """Create the rating rollups and backfill them if reviews predate them."""
+    conn.executescript(RATINGS_SCHEMA + CATEGORY_SCHEMA)
+    rolled = conn.execute("SELECT COALESCE(SUM(n), 0) FROM listing_ratings").fetchone()[0]
+    rated = conn.execute(
+        "SELECT COUNT(*) FROM reviews WHERE CAST(rating AS INTEGER) BETWEEN 1 AND 5"
+    ).fetchone()[0]
+    if rolled != rated:
+        conn.execute("DELETE FROM listing_ratings")
+        conn.execute('''
+            INSERT INTO listing_ratings (listing, n, rating_sum)
+            SELECT listing, COUNT(*), SUM(CAST(rating AS INTEGER))
+            FROM reviews
+            WHERE CAST(rating AS INTEGER) BETWEEN 1 AND 5
+            GROUP BY listing
+        ''')
+    expected = set(map(tuple, conn.execute(CATEGORY_RESCAN)))
+    rolled = set(map(tuple, conn.execute(
+        "SELECT category, listings, n, rating_sum FROM category_ratings"
+    )))
+    if rolled != expected:
+        conn.execute("DELETE FROM category_ratings")
+        conn.executemany(
+            "INSERT INTO category_ratings (category, listings, n, rating_sum) VALUES (?, ?, ?, ?)",
+            expected
+        )
+    conn.commit()
+
+
+def _getlist(args, name):
+    if hasattr(args, 'getlist'):
+        values = args.getlist(name)
+    else:
+        value = args.get(name)
+        values = value if isinstance(value, (list, tuple)) else [value]
+    return [v.strip() for v in values if v and v.strip()]
+
+
+def _number(args, name):
+    value = (args.get(name) or "").strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+
+def encode_cursor(sort, order, key, last_id):
+    raw = json.dumps([sort, order, key, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, sort, order):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        c_sort, c_order, key, last_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    # Only values encode_cursor writes; anything else would reach SQLite
+    # as a parameter (bool is an int subclass, so excluded explicitly)
+    if (isinstance(key, bool) or not isinstance(key, (str, int, float))
+            or isinstance(last_id, bool) or not isinstance(last_id, int)):
+        raise ValueError("invalid cursor")
+    if (c_sort, c_order) != (sort, order):
+        raise ValueError("cursor does not match sort and order")
+    return key, last_id
+
+
+def parse_args(args):
+    """Validate request args into a query dict; raises ValueError."""
+    sort = (args.get("sort") or "id").strip()
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+    order = (args.get("order") or "asc").strip().lower()
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be asc or desc")
+    try:
+        limit = int(args.get("limit") or DEFAULT_LIMIT)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    cursor = (args.get("cursor") or "").strip()
+    return {
+        "categories": _getlist(args, "category"),
+        "min_price": _number(args, "min_price"),
+        "max_price": _number(args, "max_price"),
+        "facilities": _getlist(args, "facility"),
+        "sort": sort,
+        "order": order,
+        "limit": limit,
+        "after": decode_cursor(cursor, sort, order) if cursor else None,
+    }
+
+
+def _like(text):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def build_sql(q, columns=PUBLIC_COLUMNS):
+    """(sql, params) for one page; fetches limit + 1 rows to detect more."""
+    key = SORT_KEYS[q["sort"]]
+    where, params = [], []
+    if q["categories"]:
+        where.append(f"l.category IN ({','.join('?' * len(q['categories']))})")
+        params += q["categories"]
+    if q["min_price"] is not None:
+        where.append("l.price >= ?")
+        params.append(q["min_price"])
+    if q["max_price"] is not None:
+        where.append("l.price <= ?")
+        params.append(q["max_price"])
+    for facility in q["facilities"]:
+        where.append("l.facilities LIKE ? ESCAPE '\\'")
+        params.append(_like(facility))
+
+    cmp = ">" if q["order"] == "asc" else "<"
+    if q["after"] is not None:
+        after_key, after_id = q["after"]
+        if q["sort"] == "id":
+            where.append(f"l.id {cmp} ?")
+            params.append(after_id)
+        else:
+            # Same as (key, id) > (after_key, after_id), written so the
+            # leading range on key can be served by an index
+            where.append(f"{key} {cmp}= ? AND ({key} {cmp} ? OR l.id {cmp} ?)")
+            params += [after_key, after_key, after_id]
+
+    direction = q["order"].upper()
+    order_by = f"l.id {direction}" if q["sort"] == "id" else f"{key} {direction}, l.id {direction}"
+    sql = f'''
+        SELECT {", ".join("l." + c for c in columns)},
+               ROUND({RATING}, 2) AS rating, COALESCE(r.n, 0) AS reviews,
+               {key} AS sort_key
+        FROM listings l
+        LEFT JOIN listing_ratings r ON r.listing = l.name
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {order_by}
+        LIMIT ?
+    '''
+    params.append(q["limit"] + 1)
+    return sql, params
+
+
+def query_listings(conn, args, columns=PUBLIC_COLUMNS):
+    """One page of listings as {"listings": [...], "next_cursor": str|None}."""
+    q = parse_args(args)
+    sql, params = build_sql(q, columns)
+    rows = conn.execute(sql, params).fetchall()
+    more = len(rows) > q["limit"]
+    rows = rows[:q["limit"]]
+    next_cursor = None
+    if more:
+        last = rows[-1]
+        next_cursor = encode_cursor(q["sort"], q["order"], last["sort_key"], last["id"])
+    listings = []
+    for row in rows:
+        item = {c: row[c] for c in columns}
+        item["rating"] = row["rating"]
+        item["reviews"] = row["reviews"]
+        listings.append(item)
+    return {"listings": listings, "next_cursor": next_cursor}
@@ -0,0 +1,65 @@
+"""
+Schema of listings.db, which the chs, chb and admin apps share.
+
+chb writes listings, chs writes reviews and chat events, and chb and
+admin read both. Whichever app starts first creates the tables, so chs
+and chb both call init(). Tables derived from them (rollups, ratings,
+search index, version counters) are created by the modules that own
+them.
+"""
+from common import cache, listing_query, periods, search
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS listings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        name TEXT NOT NULL,
+        address TEXT,
+        facilities TEXT,
+        cuisine TEXT,
+        price REAL NOT NULL,
+        image TEXT
+    );
+    -- the student index filters on category, the business dashboard and
+    -- analytics on user_id; reviews and chat events refer to listings by name
+    CREATE INDEX IF NOT EXISTS idx_listings_category ON listings(category);
+    CREATE INDEX IF NOT EXISTS idx_listings_user ON listings(user_id);
+    CREATE INDEX IF NOT EXISTS idx_listings_name ON listings(name);
+    -- student listings API sorted by price within a category
+    CREATE INDEX IF NOT EXISTS idx_listings_category_price ON listings(category, price);
+
+    CREATE TABLE IF NOT EXISTS reviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        listing TEXT NOT NULL,
+        review TEXT NOT NULL,
+        rating TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_reviews_listing_time
+        ON reviews(listing, created_at);
+    -- admin review viewer: newest first, optionally by date range
+    CREATE INDEX IF NOT EXISTS idx_reviews_time ON reviews(created_at);
+
+    CREATE TABLE IF NOT EXISTS chat_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        listing TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        intent TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_chat_events_listing_time
+        ON chat_events(listing, created_at);
+    CREATE INDEX IF NOT EXISTS idx_chat_events_listing_intent
+        ON chat_events(listing, intent);
+'''
+
+
+def init(conn):
+    """Create the shared tables and everything derived from them."""
+    conn.executescript(SCHEMA)
+    # Daily chat rollup and its month partitions (see common/periods.py)
+    periods.init_chat_rollup(conn)
+    listing_query.init_ratings(conn)
+    search.init_search(conn)
+    cache.init_versions(conn)
+    conn.commit()
@@ -0,0 +1,252 @@
+"""
+Request timing and profiling shared by the chs, chb and admin apps.
+
+Every request's latency goes into a histogram per route. The work inside
+a request is split into stages by `span` blocks:
+
+  db         pooled SQLite calls (common/db.py): execute, fetch, commit
+  template   Jinja rendering, including streamed pages
+  intent     chatbot intent classification (chs)
+  sentiment  review classification (chb)
+  pdf        PDF report output (chb job workers)
+
+Each span is recorded twice: in a histogram per stage, and in the time
+per route and stage, which shows where a slow route's time goes. Stages
+can nest, e.g. DB reads made while a streamed page renders count as db
+and as template. Background jobs run in other processes. They return
+their stage times with the result, and this process records them.
+
+GET /metrics serves all of it in the Prometheus text format. Each process
+keeps its own numbers, so scrape every worker process.
+
+To profile a single request, send the header X-Profile: 1 (or add
+?profile=1) while PROFILE_DIR is set, in the environment or app.config.
+Its cProfile stats are written to PROFILE_DIR/<app>-<route>-<time>.prof,
+which can be read with pstats or snakeviz. Only one request per process
+is profiled at a time; other flagged requests are served normally.
+"""
+import os
+import re
+import time
+import bisect
+import cProfile
+import threading
+
+# Prometheus' default buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_local = threading.local()
+_profiling = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> per-bucket counts (last: +Inf), then sum
+
+    def observe(self, values, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with _lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for values, counts in series:
+            total = 0
+            for le, n in zip(self.buckets + (float("inf"),), counts[:-1]):
+                total += n
+                bound = 'le="+Inf"' if le == float("inf") else f'le="{le!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, bound)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {counts[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+
+    def add(self, values, amount):
+        with _lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value:.6f}")
+        return lines
+
+
+REQUESTS = Histogram("http_request_duration_seconds",
+                     "Time from the start of a request until its response was sent.",
+                     ("method", "route", "status"))
+STAGES = Histogram("stage_duration_seconds", "Duration of each timed stage (span).", ("stage",))
+ROUTE_STAGES = Counter("http_request_stage_seconds_total",
+                       "Time spent in each stage while serving a route.", ("route", "stage"))
+JOBS = Histogram("job_duration_seconds", "Run time of background jobs (chb).", ("kind",))
+METRICS = (REQUESTS, ROUTE_STAGES, STAGES, JOBS)
+
+
+# ——— Spans ———
+
+def record(stage, seconds):
+    STAGES.observe((stage,), seconds)
+    stages = getattr(_local, 'stages', None)
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+class span:
+    """Time a block as one stage: `with metrics.span("db"): ...`."""
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class capture:
+    """Collect this thread's stage totals in a dict (used by job workers)."""
+
+    def __enter__(self):
+        self.outer = getattr(_local, 'stages', None)
+        _local.stages = self.totals = {}
+        return self.totals
+
+    def __exit__(self, *exc):
+        _local.stages = self.outer
+        if self.outer is not None:
+            for stage, seconds in self.totals.items():
+                self.outer[stage] = self.outer.get(stage, 0.0) + seconds
+        return False
+
+
+def observe_job(kind, seconds, stages):
+    """Record a finished job's run time and the stage times it captured."""
+    JOBS.observe((kind,), seconds)
+    for stage, spent in stages.items():
+        STAGES.observe((stage,), spent)
+
+
+def render():
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+# ——— Flask integration ———
+
+def _profile_path(app, name, route):
+    directory = app.config.get('PROFILE_DIR') or os.environ.get('PROFILE_DIR')
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+    stamp = time.strftime('%Y%m%d-%H%M%S') + f"-{time.time_ns() % 10**9:09d}"
+    return os.path.join(directory, f"{name}-{slug}-{stamp}.prof")
+
+
+def init_app(app, name):
+    """Time every request of app, serve /metrics, and honour X-Profile."""
+    from flask import request, Response
+    from flask.signals import before_render_template, template_rendered
+
+    def start():
+        _local.stages = {}
+        _local.start = time.perf_counter()
+        _local.profile = None
+        flagged = request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+        if flagged and _profiling.acquire(blocking=False):
+            route = request.url_rule.rule if request.url_rule else request.path
+            path = _profile_path(app, name, route)
+            if path is None:
+                _profiling.release()
+                return
+            profile = cProfile.Profile()
+            _local.profile = (profile, path)
+            profile.enable()
+
+    def finish(response):
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        key = (request.method, route, str(response.status_code))
+        started, stages, profile = _local.start, _local.stages, _local.profile
+        _local.profile = None
+        if profile:
+            response.headers['X-Profile-File'] = os.path.basename(profile[1])
+
+        def done():
+            # After the last byte, so streamed pages are timed in full
+            REQUESTS.observe(key, time.perf_counter() - started)
+            for stage, seconds in stages.items():
+                ROUTE_STAGES.add((route, stage), seconds)
+            if profile:
+                _stop_profile(profile)
+
+        response.call_on_close(done)
+        return response
+
+    def abandon(exc=None):
+        # finish() never ran (the request failed before a response existed)
+        profile = getattr(_local, 'profile', None)
+        _local.profile = None
+        if profile:
+            _stop_profile(profile)
+
+    def render_start(sender, template, **extra):
+        _local.rendering = time.perf_counter()
+
+    def render_done(sender, template, **extra):
+        started = getattr(_local, 'rendering', None)
+        if started is not None:
+            record("template", time.perf_counter() - started)
+            _local.rendering = None
+
+    app.before_request(start)
+    app.after_request(finish)
+    app.teardown_request(abandon)
+    before_render_template.connect(render_start, app, weak=False)
+    template_rendered.connect(render_done, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def _stop_profile(profile):
+    profiler, path = profile
+    profiler.disable()
+    try:
+        profiler.dump_stats(path)
+    finally:
+        _profiling.release()
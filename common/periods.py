@@ -0,0 +1,220 @@
+"""
+Date windows over the analytics rollups, and month partitions for old data.
+
+Chat events are rolled up per listing, day and intent (chat_daily) by
+triggers, so every writer (chs, migrate_logs.py) maintains the rollup for
+free; chb keeps review_daily the same way for reviews. Both are keyed by
+(listing, day, ...), so a window such as "last 30 days" is an index range
+per listing and costs the same however long the history grows.
+
+Days before the rollup horizon (always the first of a month) are
+compacted: their daily rows are folded into one summary row per listing,
+month and intent in chat_monthly (review_monthly for reviews) and the
+daily rows dropped. Writers route rows to the month partition themselves,
+so a late event for a compacted month still lands in the right place.
+Windowed reads take daily rows inside the window plus month rows for the
+months it touches, which means a compacted month counts in full once a
+window reaches into it. align_window widens the window to match, so
+reads of per-review or per-event rows for the same window (percentiles,
+review logs, reports) cover the same days as the totals.
+
+The raw chat_events and reviews tables are never compacted; their
+(listing, created_at) indexes keep windowed reads of them to the window.
+"""
+import calendar
+from datetime import date, datetime
+
+HORIZON_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS rollup_horizon (
+        name TEXT PRIMARY KEY,
+        day TEXT NOT NULL
+    );
+    -- '' sorts before every day: nothing is compacted yet
+    INSERT OR IGNORE INTO rollup_horizon (name, day) VALUES ('daily', '');
+'''
+
+HORIZON = "(SELECT day FROM rollup_horizon WHERE name = 'daily')"
+
+# Triggers are recreated on every start so an older definition (from
+# before routing by horizon) never lingers in a shared database.
+CHAT_SCHEMA = f'''
+    CREATE TABLE IF NOT EXISTS chat_daily (
+        listing TEXT NOT NULL,
+        day TEXT NOT NULL,
+        intent TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (listing, day, intent)
+    );
+    CREATE INDEX IF NOT EXISTS idx_chat_daily_day ON chat_daily(day);
+    CREATE TABLE IF NOT EXISTS chat_monthly (
+        listing TEXT NOT NULL,
+        month TEXT NOT NULL,
+        intent TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (listing, month, intent)
+    );
+    -- newest-first paging in the admin chat-log viewer
+    CREATE INDEX IF NOT EXISTS idx_chat_monthly_month ON chat_monthly(month);
+
+    DROP TRIGGER IF EXISTS chat_daily_insert;
+    CREATE TRIGGER chat_daily_insert
+    AFTER INSERT ON chat_events BEGIN
+        INSERT INTO chat_daily (listing, day, intent, n)
+        SELECT NEW.listing, NEW.created_at, NEW.intent, 1
+        WHERE NEW.created_at >= {HORIZON}
+        ON CONFLICT (listing, day, intent) DO UPDATE SET n = n + 1;
+        INSERT INTO chat_monthly (listing, month, intent, n)
+        SELECT NEW.listing, substr(NEW.created_at, 1, 7), NEW.intent, 1
+        WHERE NEW.created_at < {HORIZON}
+        ON CONFLICT (listing, month, intent) DO UPDATE SET n = n + 1;
+    END;
+    DROP TRIGGER IF EXISTS chat_daily_delete;
+    CREATE TRIGGER chat_daily_delete
+    AFTER DELETE ON chat_events BEGIN
+        UPDATE chat_daily SET n = n - 1
+        WHERE listing = OLD.listing AND day = OLD.created_at AND intent = OLD.intent;
+        DELETE FROM chat_daily
+        WHERE listing = OLD.listing AND day = OLD.created_at AND intent = OLD.intent
+          AND n <= 0;
+        UPDATE chat_monthly SET n = n - 1
+        WHERE listing = OLD.listing AND month = substr(OLD.created_at, 1, 7)
+          AND intent = OLD.intent;
+        DELETE FROM chat_monthly
+        WHERE listing = OLD.listing AND month = substr(OLD.created_at, 1, 7)
+          AND intent = OLD.intent AND n <= 0;
+    END;
+'''
+
+
+def init_chat_rollup(conn):
+    """Create the horizon and chat rollups; backfill if they have drifted."""
+    conn.executescript(HORIZON_SCHEMA + CHAT_SCHEMA)
+    rolled = conn.execute('''
+        SELECT (SELECT COALESCE(SUM(n), 0) FROM chat_daily)
+             + (SELECT COALESCE(SUM(n), 0) FROM chat_monthly)
+    ''').fetchone()[0]
+    events = conn.execute("SELECT COUNT(*) FROM chat_events").fetchone()[0]
+    if rolled != events:
+        rebuild_chat(conn)
+    conn.commit()
+
+
+def rebuild_chat(conn):
+    """Recompute chat_daily and chat_monthly from chat_events."""
+    conn.execute("DELETE FROM chat_daily")
+    conn.execute("DELETE FROM chat_monthly")
+    conn.execute(f'''
+        INSERT INTO chat_daily (listing, day, intent, n)
+        SELECT listing, created_at, intent, COUNT(*)
+        FROM chat_events
+        WHERE created_at >= {HORIZON}
+        GROUP BY listing, created_at, intent
+    ''')
+    conn.execute(f'''
+        INSERT INTO chat_monthly (listing, month, intent, n)
+        SELECT listing, substr(created_at, 1, 7), intent, COUNT(*)
+        FROM chat_events
+        WHERE created_at < {HORIZON}
+        GROUP BY listing, substr(created_at, 1, 7), intent
+    ''')
+
+
+def horizon(conn):
+    """First day still kept at daily resolution ('' if none compacted)."""
+    return conn.execute(f"SELECT {HORIZON}").fetchone()[0]
+
+
+def bucket(day, horizon):
+    """Rollup key for a day: the day itself, or its month once compacted."""
+    return day if day >= horizon else day[:7]
+
+
+def month_start(months_ago, today=None):
+    """First day of the month `months_ago` months before today's."""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months_ago
+    return date(index // 12, index % 12 + 1, 1).isoformat()
+
+
+def compact_chat(conn, new_horizon):
+    """Fold chat_daily rows before new_horizon into chat_monthly."""
+    conn.execute('''
+        INSERT INTO chat_monthly (listing, month, intent, n)
+        SELECT listing, substr(day, 1, 7), intent, SUM(n)
+        FROM chat_daily
+        WHERE day < ?
+        GROUP BY listing, substr(day, 1, 7), intent
+        ON CONFLICT (listing, month, intent) DO UPDATE SET n = n + excluded.n
+    ''', (new_horizon,))
+    conn.execute("DELETE FROM chat_daily WHERE day < ?", (new_horizon,))
+
+
+def set_horizon(conn, new_horizon):
+    conn.execute("UPDATE rollup_horizon SET day = ? WHERE name = 'daily'", (new_horizon,))
+
+
+# ——— Date windows ———
+
+def _parse_day(value, name):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+
+
+def parse_window(args):
+    """
+    (first, last) day from the `from` / `to` request args, both inclusive,
+    or None for the whole history. Raises ValueError on a bad date.
+    """
+    start = (args.get("from") or "").strip()
+    end = (args.get("to") or "").strip()
+    if not start and not end:
+        return None
+    start = _parse_day(start, "from") if start else ""
+    end = _parse_day(end, "to") if end else "9999-12-31"
+    if start > end:
+        raise ValueError("from must not be after to")
+    return start, end
+
+
+def window_args(window):
+    """Request args that reproduce a window, for building links."""
+    if window is None:
+        return {}
+    args = {}
+    if window[0]:
+        args["from"] = window[0]
+    if window[1] != "9999-12-31":
+        args["to"] = window[1]
+    return args
+
+
+def day_range(column, window):
+    """(" AND column BETWEEN ? AND ?", params) for a day column, or no-op."""
+    if window is None:
+        return "", []
+    return f" AND {column} BETWEEN ? AND ?", list(window)
+
+
+def align_window(window, horizon):
+    """
+    The window widened to whole months where it lies before the horizon,
+    i.e. the days its month rows actually cover.
+    """
+    if window is None:
+        return None
+    start, end = window
+    if start and start < horizon:
+        start = start[:8] + "01"
+    if end < horizon:
+        year, month = int(end[:4]), int(end[5:7])
+        end = date(year, month, calendar.monthrange(year, month)[1]).isoformat()
+    return start, end
+
+
+def month_range(column, window):
+    """The same window over a month column, whole months at either end."""
+    if window is None:
+        return "", []
+    return f" AND {column} BETWEEN ? AND ?", [window[0][:7], window[1][:7]]
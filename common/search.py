@@ -0,0 +1,202 @@
+"""
+Full-text search over listings and reviews (SQLite FTS5).
+
+listings_fts indexes name, address, facilities and cuisine; reviews_fts
+indexes the review text. Both are external-content tables: they store
+only the index and read the text back from listings / reviews, and they
+are kept in sync by triggers, so every writer (chb add/edit/delete_listing,
+chs review(), admin deletes) maintains them without code changes.
+
+Results carry a highlighted snippet. Earlier words of the query must
+match whole words and the last one, still being typed, matches as a
+prefix, so "wifi colle" finds "WiFi ... College Road". FTS5 answers a
+prefix from its prefix index only up to MAX_PREFIX letters; anything
+longer would merge the doclists of every matching term in memory, so a
+longer last word is matched exactly and, if that finds nothing, by its
+first MAX_PREFIX letters.
+
+Ranking is BM25 (a name match outweighs a facilities match), but BM25
+scores every matching row (about 3 us each) and, for IDF, counts every row
+containing each query word. Cheap probes count matches inside SQLite
+first: if the query matches more than RANK_CAP rows, or one of its words
+is in more than TERM_CAP rows, it is too broad to rank within the latency
+budget and the newest matches are returned instead. Review search within
+one listing is driven from the listing's reviews and is always newest
+first.
+"""
+import re
+from html import escape
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+RANK_CAP = 1000  # most matches ranked by BM25 (~3 ms); above this, newest first
+TERM_CAP = 10000  # rows per word BM25 may count for IDF (~1 ms)
+MIN_PREFIX = 2   # shorter prefixes expand to too many terms
+MAX_PREFIX = 6   # longest prefix with its own index (see SCHEMA)
+
+# Snippet markers; control characters can't occur in escaped user text, so
+# they are swapped for <mark> only after the snippet is HTML-escaped.
+_OPEN, _CLOSE = "\x02", "\x03"
+SNIPPET_TOKENS = 12
+
+SCHEMA = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+        name, address, facilities, cuisine,
+        content='listings', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6'
+    );
+    CREATE TRIGGER IF NOT EXISTS listings_fts_insert AFTER INSERT ON listings BEGIN
+        INSERT INTO listings_fts (rowid, name, address, facilities, cuisine)
+        VALUES (NEW.id, NEW.name, NEW.address, NEW.facilities, NEW.cuisine);
+    END;
+    CREATE TRIGGER IF NOT EXISTS listings_fts_delete AFTER DELETE ON listings BEGIN
+        INSERT INTO listings_fts (listings_fts, rowid, name, address, facilities, cuisine)
+        VALUES ('delete', OLD.id, OLD.name, OLD.address, OLD.facilities, OLD.cuisine);
+    END;
+    CREATE TRIGGER IF NOT EXISTS listings_fts_update AFTER UPDATE ON listings BEGIN
+        INSERT INTO listings_fts (listings_fts, rowid, name, address, facilities, cuisine)
+        VALUES ('delete', OLD.id, OLD.name, OLD.address, OLD.facilities, OLD.cuisine);
+        INSERT INTO listings_fts (rowid, name, address, facilities, cuisine)
+        VALUES (NEW.id, NEW.name, NEW.address, NEW.facilities, NEW.cuisine);
+    END;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+        review,
+        content='reviews', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6'
+    );
+    CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN
+        INSERT INTO reviews_fts (rowid, review) VALUES (NEW.id, NEW.review);
+    END;
+    CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN
+        INSERT INTO reviews_fts (reviews_fts, rowid, review) VALUES ('delete', OLD.id, OLD.review);
+    END;
+    CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF review ON reviews BEGIN
+        INSERT INTO reviews_fts (reviews_fts, rowid, review) VALUES ('delete', OLD.id, OLD.review);
+        INSERT INTO reviews_fts (rowid, review) VALUES (NEW.id, NEW.review);
+    END;
+
+    -- Column weights for ORDER BY rank: name, address, facilities, cuisine
+    INSERT INTO listings_fts (listings_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 4.0, 4.0)');
+'''
+
+
+def init_search(conn):
+    """Create the FTS tables and triggers; index existing rows if needed."""
+    conn.executescript(SCHEMA)
+    # The docsize shadow tables hold one row per indexed document
+    for fts, table in (("listings_fts", "listings"), ("reviews_fts", "reviews")):
+        indexed = conn.execute(f"SELECT COUNT(*) FROM {fts}_docsize").fetchone()[0]
+        rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if indexed != rows:
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.commit()
+
+
+def match_terms(text):
+    """FTS5 term lists for free text, to be tried in order until one matches."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return []
+    head = [f'"{w}"' for w in words[:-1]]
+    last = words[-1]
+    if len(last) < MIN_PREFIX:
+        tails = [f'"{last}"']
+    elif len(last) <= MAX_PREFIX:
+        tails = [f'"{last}"*']
+    else:
+        tails = [f'"{last}"', f'"{last[:MAX_PREFIX]}"*']
+    return [head + [tail] for tail in tails]
+
+
+def _snippet(raw):
+    if raw is None:
+        return ""
+    return escape(raw).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def _limit(limit):
+    return max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+
+
+def _count(conn, fts, expr, cap):
+    """Rows matching expr, counting no further than cap + 1."""
+    return conn.execute(
+        f"SELECT COUNT(*) FROM (SELECT rowid FROM {fts} WHERE {fts} MATCH ? LIMIT ?)",
+        (expr, cap + 1)
+    ).fetchone()[0]
+
+
+def _probe(conn, fts, candidates):
+    """(expr, ranked): the first query with matches, and whether to rank."""
+    for terms in candidates:
+        expr = " ".join(terms)
+        found = _count(conn, fts, expr, RANK_CAP)
+        if found:
+            break
+    ranked = found <= RANK_CAP and (
+        len(terms) == 1 or all(_count(conn, fts, t, TERM_CAP) <= TERM_CAP for t in terms)
+    )
+    return expr, ranked
+
+
+def _page(rows, ranked):
+    return {
+        "results": [dict(row, snippet=_snippet(row['snippet'])) for row in rows],
+        "order": "relevance" if ranked else "newest",
+    }
+
+
+def search_listings(conn, text, limit=DEFAULT_LIMIT, category=None):
+    """{"results": [...], "order": ...}; snippets are HTML-safe."""
+    candidates = match_terms(text)
+    if not candidates:
+        return _page([], True)
+    expr, ranked = _probe(conn, "listings_fts", candidates)
+    where, params = ["listings_fts MATCH ?"], [expr]
+    if category:
+        where.append("l.category = ?")
+        params.append(category)
+    params.append(_limit(limit))
+    rows = conn.execute(f'''
+        SELECT l.id, l.category, l.name, l.price, l.address, l.facilities, l.image,
+               snippet(listings_fts, -1, '{_OPEN}', '{_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM listings_fts
+        JOIN listings l ON l.id = listings_fts.rowid
+        WHERE {" AND ".join(where)}
+        ORDER BY {"rank" if ranked else "listings_fts.rowid DESC"}
+        LIMIT ?
+    ''', params).fetchall()
+    return _page(rows, ranked)
+
+
+def search_reviews(conn, text, limit=DEFAULT_LIMIT, listing=None):
+    """{"results": [...], "order": ...}; snippets are HTML-safe."""
+    candidates = match_terms(text)
+    if not candidates:
+        return _page([], True)
+    columns = f'''r.id, r.listing, r.rating, r.created_at,
+               snippet(reviews_fts, 0, '{_OPEN}', '{_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet'''
+    if listing:
+        # A listing has few reviews: walk them by index and test each one
+        for terms in candidates:
+            rows = conn.execute(f'''
+                SELECT {columns}
+                FROM reviews r CROSS JOIN reviews_fts ON reviews_fts.rowid = r.id
+                WHERE r.listing = ? AND reviews_fts MATCH ?
+                ORDER BY r.id DESC
+                LIMIT ?
+            ''', (listing, " ".join(terms), _limit(limit))).fetchall()
+            if rows:
+                break
+        return _page(rows, False)
+    expr, ranked = _probe(conn, "reviews_fts", candidates)
+    rows = conn.execute(f'''
+        SELECT {columns}
+        FROM reviews_fts
+        JOIN reviews r ON r.id = reviews_fts.rowid
+        WHERE reviews_fts MATCH ?
+        ORDER BY {"rank" if ranked else "reviews_fts.rowid DESC"}
+        LIMIT ?
+    ''', (expr, _limit(limit))).fetchall()
+    return _page(rows, ranked)
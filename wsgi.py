@@ -0,0 +1,87 @@
+"""
+chs, chb and admin served by one Flask app in one process.
+
+    python wsgi.py          # development server
+    gunicorn wsgi:app       # or any WSGI server, from this directory
+
+Each app's blueprint is mounted under its prefix in MOUNTS. In one
+process the three share one connection pool per database file
+(common/db.py), one copy of each in-process cache, one chat-event
+flusher, one memory-mapped intent model and one chb job pool, and
+/metrics covers all of them. Database and output paths come from
+common/config.py, as when the apps run on their own (python chs/app.py
+etc., which still works).
+
+Every app keeps its own session cookie, scoped to its prefix: chs and
+chb both keep the logged-in user in session['user_id'], and a student
+account must not count as logged in to the business app. Set SECRET_KEY
+in the environment for anything but local testing.
+"""
+import os
+import sys
+import importlib.util
+
+from flask import Flask, request
+from flask.sessions import SecureCookieSessionInterface
+
+from common import db, metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# app directory -> URL prefix ('' is the site root)
+MOUNTS = {"chs": "", "chb": "/business", "admin": "/admin"}
+
+
+def load_app_module(name):
+    """Import <name>/app.py as <name>_app: all three files are called app.py."""
+    module_name = f"{name}_app"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    app_dir = os.path.join(ROOT, name)
+    if app_dir not in sys.path:
+        sys.path.insert(0, app_dir)  # the app's own modules (chatlog, jobs, ...)
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(app_dir, "app.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class MountedSessionInterface(SecureCookieSessionInterface):
+    """A session cookie per mounted app, named after it and limited to its prefix."""
+
+    def __init__(self, mounts):
+        # Longest prefix first, so /business/... is not taken for chs at ''
+        self.mounts = sorted(mounts.items(), key=lambda m: len(m[1]), reverse=True)
+
+    def _mount(self):
+        # Sessions are opened before the URL is matched, so the app is
+        # told by the path, not by request.blueprint
+        path = request.path
+        for name, prefix in self.mounts:
+            if path == prefix or path.startswith(prefix + "/"):
+                return name, prefix or "/"
+        return "site", "/"
+
+    def get_cookie_name(self, app):
+        return f"{self._mount()[0]}_session"
+
+    def get_cookie_path(self, app):
+        return self._mount()[1]
+
+
+def create_app(settings=None):
+    app = Flask(__name__, static_folder=None)
+    app.secret_key = os.environ.get('SECRET_KEY', 'site_secret')
+    app.config.update(settings or {})
+    app.session_interface = MountedSessionInterface(MOUNTS)
+    db.init_app(app)
+    metrics.init_app(app, 'site')
+    for name, prefix in MOUNTS.items():
+        app.register_blueprint(load_app_module(name).bp, url_prefix=prefix or None)
+    return app
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    app.run(debug=True)